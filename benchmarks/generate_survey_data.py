@@ -0,0 +1,298 @@
+"""
+ベンチマーク用の合成アンケートデータの生成
+
+元データと同じヘッダーのTSVを、指定した行数・月数・チーム数で生成する。
+- リッカート尺度の回答は config.py の回答ラベル（月ごとに分布を変えて推移を作る）
+- 複数選択の設問は元データの選択肢を「, 」区切りで組み合わせる
+- 自由記述は日本語の文を組み合わせて作成する
+- 上流工程の設問はディレクターチーム、開発工程の設問はエンジニアリングチームのみが回答する
+  （追加のチームは両方に回答する）
+
+使い方:
+    python benchmarks/generate_survey_data.py --rows 100000 --months 12
+    python benchmarks/generate_survey_data.py --rows 1000000 --split-by-month --output benchmarks/data/survey_1m
+"""
+
+import argparse
+import itertools
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from config import *
+from survey_schema import SurveySchema
+
+BENCHMARK_DATA_PATH = os.path.join(PROJECT_ROOT, 'benchmarks', 'data')
+
+# 1回に生成・書き込みする最大行数（100万行でもメモリに全行を保持しない）
+CHUNK_ROWS = 100_000
+
+# 自由記述・リッカート尺度の設問の未回答率
+FREE_TEXT_MISSING_RATE = 0.6
+LIKERT_MISSING_RATE = 0.05
+
+# 自由記述の文の部品
+TEXT_SUBJECTS = [
+    '議事録の要約', '仕様書のドラフト作成', '提案資料の構成検討', 'テストケースの洗い出し', '既存コードの調査',
+    'エラーログの解析', 'SQLの作成', 'リファクタリング', 'レビューコメントの整理', '顧客要望の整理',
+    '画面イメージの作成', '技術調査', '見積もりの根拠整理', '社内向け説明資料の作成', 'ユニットテストの作成',
+]
+TEXT_ACTIONS = [
+    'をAIに任せたところ', 'でAIを使ったことで', 'をAIと相談しながら進めたので', 'にAIを取り入れた結果',
+    'の下書きをAIで作成したことで',
+]
+TEXT_RESULTS = [
+    '作業時間が半分程度になった', '抜け漏れに気づけるようになった', '最初の一歩が早くなった',
+    '確認と修正に時間がかかった', '品質にばらつきがあった', '以前より説明がしやすくなった',
+    '1日かかっていた作業が1時間で終わった', '前提条件を伝えるのに苦労した',
+]
+TEXT_FOLLOWUPS = [
+    '', '', '引き続き活用していきたい。', 'チーム内でも共有したい。', '出力の確認は必要だと感じた。',
+    'プロンプトの工夫が重要だと思う。', '社内の知識に対応してほしい。',
+]
+
+
+def month_labels(start_month, n_months):
+    """開始月から n_months か月分の (年, 月) のリスト"""
+    start = pd.Period(start_month, freq='M')
+    return [(period.year, period.month) for period in pd.period_range(start, periods=n_months, freq='M')]
+
+
+def team_labels(n_teams):
+    """チーム名のリスト（先頭の2チームは元データと同じ名前）"""
+    teams = list(TEAM_NAMES)
+    return teams[:n_teams] + [f'チーム{i + 1}' for i in range(len(teams), n_teams)]
+
+
+def make_free_texts(rng, n):
+    """日本語の自由記述を n 件作成"""
+    return [
+        f"{rng.choice(TEXT_SUBJECTS)}{rng.choice(TEXT_ACTIONS)}{rng.choice(TEXT_RESULTS)}。{rng.choice(TEXT_FOLLOWUPS)}"
+        for _ in range(n)
+    ]
+
+
+def make_multi_select_answers(rng, options, weights, free_texts, n):
+    """選択肢を1〜4個組み合わせた回答を n 件作成（一部は自由記述を含む「その他」回答）"""
+    answers = []
+    for _ in range(n):
+        k = min(int(rng.integers(1, 5)), len(options))
+        chosen = list(rng.choice(options, size=k, replace=False, p=weights))
+        if rng.random() < 0.05:
+            chosen.append(rng.choice(free_texts))
+        answers.append(', '.join(chosen))
+    return answers
+
+
+class SurveyGenerator:
+    """テンプレートのTSVのヘッダーと回答の傾向に沿って合成データを生成する"""
+
+    def __init__(self, template_path=DATA_PATH, seed=0):
+        self.rng = np.random.default_rng(seed)
+        template = pd.read_csv(template_path, sep='\t', encoding='utf-8')
+        self.columns = list(template.columns)
+        schema = SurveySchema.from_columns(self.columns)
+
+        # リッカート尺度の列 → 回答ラベル
+        value_maps = {
+            'frequency': FREQUENCY_MAP, 'contribution': CONTRIBUTION_MAP, 'time_reduction': TIME_REDUCTION_MAP,
+        }
+        self.likert_levels = {}
+        for section in QUESTION_ITEMS:
+            levels = [label for label in value_maps[section.split('_', 1)[1]] if label != '']
+            for position in schema.item_positions(section).values():
+                self.likert_levels[position] = levels
+
+        self.timestamp_position = self.columns.index('タイムスタンプ')
+        self.month_position = self.columns.index('年月')
+        self.team_position = schema.column_index('team')
+
+        # 自由記述と組み合わせる文の候補（重複の多い現実的な分布にするため件数を絞る）
+        self.free_texts = make_free_texts(self.rng, 2000)
+
+        # その他の列は元データの回答から、複数選択・自由記述・単一選択を判定する
+        self.multi_select = {}    # 列の位置 → (選択肢, 重み)
+        self.free_text_positions = []
+        self.single_choice = {}   # 列の位置 → 回答の候補
+        fixed = set(self.likert_levels) | {self.timestamp_position, self.month_position, self.team_position}
+        for position, header in enumerate(self.columns):
+            if position in fixed:
+                continue
+            values = template.iloc[:, position].dropna().astype(str)
+            if '複数選択可' in header:
+                options = pd.Series([o.strip() for v in values for o in v.split(',') if o.strip()])
+                # 自由記述で書かれた選択肢（1件のみの長い回答）は選択肢の候補から除く
+                counts = options.value_counts()
+                counts = counts[(counts > 1) | (counts.index.str.len() <= 30)]
+                self.multi_select[position] = (counts.index.to_numpy(), (counts / counts.sum()).to_numpy())
+            elif values.str.len().max() > 30 or values.empty:
+                self.free_text_positions.append(position)
+            else:
+                self.single_choice[position] = values.unique()
+
+        # 工程ごとの列（上流工程はディレクターチーム、開発工程はエンジニアリングチームのみ回答）
+        self.upstream_positions = [p for p, h in enumerate(self.columns) if '上流工程' in h]
+        self.development_positions = [p for p, h in enumerate(self.columns) if '開発工程' in h]
+
+    def level_probabilities(self, levels, month_index, n_months):
+        """月が進むほど上位の回答（ラベルの先頭側）が増える回答分布"""
+        progress = month_index / max(n_months - 1, 1)
+        base = self.rng.dirichlet(np.ones(len(levels)))
+        trend = np.linspace(1 + progress, 1, len(levels))
+        p = base * trend
+        return p / p.sum()
+
+    def generate_rows(self, year, month, seconds, teams, likert_probabilities, multi_select_patterns):
+        """その年月の回答期間の初めからの経過秒数（昇順）ごとに1行の回答を生成
+
+        回答期間は SURVEY_PERIOD_CUTOFF_DAY 日から翌月の同じ日の前日まで（元データと同じく、
+        翌月初めの回答もその年月の回答とする）。
+        """
+        rng = self.rng
+        n_rows = len(seconds)
+        data = {}
+
+        # タイムスタンプは元データと同じ「5/30/2025 12:29:07」形式
+        period_start = np.datetime64(f'{year}-{month:02d}-{SURVEY_PERIOD_CUTOFF_DAY:02d}', 's')
+        dates = (period_start + seconds).astype('datetime64[D]')
+        calendar_months = dates.astype('datetime64[M]')
+        days = (dates - calendar_months.astype('datetime64[D]')).astype(np.int64) + 1
+        calendar_months = calendar_months.astype(np.int64)
+        hours, rest = np.divmod(seconds % 86400, 3600)
+        minutes, secs = np.divmod(rest, 60)
+        data[self.timestamp_position] = (
+            pd.Series(calendar_months % 12 + 1).astype(str) + '/' + pd.Series(days).astype(str) + '/'
+            + pd.Series(calendar_months // 12 + 1970).astype(str) + ' '
+            + pd.Series(hours).astype(str) + ':'
+            + pd.Series(minutes).astype(str).str.zfill(2) + ':'
+            + pd.Series(secs).astype(str).str.zfill(2)
+        ).to_numpy(dtype=object)
+        data[self.month_position] = np.full(n_rows, f'{year}年{month}月', dtype=object)
+
+        team_values = rng.choice(np.array(teams, dtype=object), size=n_rows)
+        data[self.team_position] = team_values
+
+        for position, levels in self.likert_levels.items():
+            values = rng.choice(np.array(levels, dtype=object), size=n_rows, p=likert_probabilities[position])
+            values[rng.random(n_rows) < LIKERT_MISSING_RATE] = None
+            data[position] = values
+
+        for position, patterns in multi_select_patterns.items():
+            data[position] = rng.choice(patterns, size=n_rows)
+
+        for position in self.free_text_positions:
+            values = rng.choice(np.array(self.free_texts, dtype=object), size=n_rows)
+            values[rng.random(n_rows) < FREE_TEXT_MISSING_RATE] = None
+            data[position] = values
+
+        for position, choices in self.single_choice.items():
+            data[position] = rng.choice(np.array(choices, dtype=object), size=n_rows)
+
+        df = pd.DataFrame({self.columns[p]: data[p] for p in range(len(self.columns))})
+
+        # 担当外の工程の設問は未回答にする
+        engineering_team, director_team = list(TEAM_NAMES)
+        df.iloc[team_values == engineering_team, self.upstream_positions] = None
+        df.iloc[team_values == director_team, self.development_positions] = None
+        return df
+
+    def month_chunks(self, n_rows, n_months, n_teams, start_month):
+        """((年, 月), DataFrame) を月ごと・CHUNK_ROWS 行ごとにタイムスタンプ順に生成"""
+        months = month_labels(start_month, n_months)
+        teams = team_labels(n_teams)
+        rows_per_month = np.full(n_months, n_rows // n_months)
+        rows_per_month[:n_rows % n_months] += 1
+
+        for month_index, ((year, month), month_rows) in enumerate(zip(months, rows_per_month)):
+            # 回答分布と複数選択の組み合わせは月ごとに決め、同じ月のチャンクで共有する
+            likert_probabilities = {
+                position: self.level_probabilities(levels, month_index, n_months)
+                for position, levels in self.likert_levels.items()
+            }
+            # 組み合わせの種類を絞り、行ごとにその中から選ぶ（100万行でも高速に生成できる）
+            multi_select_patterns = {
+                position: np.array(
+                    make_multi_select_answers(self.rng, options, weights, self.free_texts, 500), dtype=object
+                )
+                for position, (options, weights) in self.multi_select.items()
+            }
+
+            days_in_month = pd.Timestamp(year=year, month=month, day=1).days_in_month
+            seconds = np.sort(self.rng.integers(0, days_in_month * 86400, size=int(month_rows)))
+            for start in range(0, len(seconds), CHUNK_ROWS):
+                chunk = self.generate_rows(
+                    year, month, seconds[start:start + CHUNK_ROWS], teams,
+                    likert_probabilities, multi_select_patterns
+                )
+                yield (year, month), chunk
+
+
+def write_tsv_chunks(chunks, path):
+    """DataFrameのチャンクを1つのTSVに書き出す（一時ファイルに書いてから置き換える）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, sep='\t', index=False, header=(i == 0))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def generate_survey_data(output, n_rows, n_months=12, n_teams=2, start_month='2025-05',
+                         split_by_month=False, seed=0, template_path=DATA_PATH):
+    """合成データを生成し、出力先のパス（split_by_month の場合はディレクトリ）を返す"""
+    generator = SurveyGenerator(template_path, seed=seed)
+    chunks = generator.month_chunks(n_rows, n_months, n_teams, start_month)
+
+    if not split_by_month:
+        write_tsv_chunks((chunk for _, chunk in chunks), output)
+        return output
+
+    # 月ごとに別ファイルに出力（月別のエクスポートを想定）
+    os.makedirs(output, exist_ok=True)
+    for (year, month), month_chunks in itertools.groupby(chunks, key=lambda item: item[0]):
+        write_tsv_chunks(
+            (chunk for _, chunk in month_chunks), os.path.join(output, f'survey_{year}{month:02d}.tsv')
+        )
+    return output
+
+
+def default_output_path(n_rows, split_by_month=False):
+    """行数に応じた既定の出力先（例: benchmarks/data/survey_100k.tsv）"""
+    if n_rows % 1_000_000 == 0:
+        label = f'{n_rows // 1_000_000}m'
+    elif n_rows % 1000 == 0:
+        label = f'{n_rows // 1000}k'
+    else:
+        label = str(n_rows)
+    name = f'survey_{label}' if split_by_month else f'survey_{label}.tsv'
+    return os.path.join(BENCHMARK_DATA_PATH, name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ベンチマーク用の合成アンケートデータを生成")
+    parser.add_argument('--rows', type=int, default=10_000, help="生成する行数")
+    parser.add_argument('--months', type=int, default=12, help="年月の数")
+    parser.add_argument('--teams', type=int, default=2, help="チーム数（3以上は追加のチームを作成）")
+    parser.add_argument('--start-month', default='2025-05', help="最初の年月（YYYY-MM）")
+    parser.add_argument('--split-by-month', action='store_true', help="月ごとに別のTSVファイルに出力")
+    parser.add_argument('--seed', type=int, default=0, help="乱数のシード")
+    parser.add_argument('--template', default=DATA_PATH, help="ヘッダーと回答の候補を取得するTSV")
+    parser.add_argument('--output', help="出力先（省略時は benchmarks/data/ 以下）")
+    args = parser.parse_args()
+
+    output = args.output or default_output_path(args.rows, args.split_by_month)
+    started = datetime.now()
+    generate_survey_data(
+        output, args.rows, args.months, args.teams, args.start_month,
+        split_by_month=args.split_by_month, seed=args.seed, template_path=args.template
+    )
+    print(f"{args.rows}行のデータを生成しました: {output}（{(datetime.now() - started).total_seconds():.1f}秒）")
@@ -0,0 +1,228 @@
+"""
+データ処理とダッシュボードの指標計算のベンチマーク
+
+合成データ（generate_survey_data.py）の行数ごとに、load_data・各 process_* メソッド・
+save_processed_data とダッシュボードの指標計算（survey_metrics）の実行時間を計測し、
+結果をJSONに保存する。--compare で以前の結果と比較し、遅くなった処理を報告する。
+
+各行数の計測は別プロセスで行う（最大RSSが前の行数の計測の影響を受けないようにするため）。
+
+使い方:
+    python benchmarks/run_benchmarks.py --rows 10000 100000 1000000
+    python benchmarks/run_benchmarks.py --rows 10000 --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), 'src'))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from config import *
+from generate_survey_data import default_output_path, generate_survey_data
+
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'results')
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+# 比較時にこの時間より短い処理は誤差が大きいため判定しない
+MIN_COMPARE_SECONDS = 0.005
+
+
+def ensure_dataset(n_rows, n_months, n_teams, seed=0):
+    """行数・月数・チーム数に対応する合成データのパス（なければ生成）"""
+    path = default_output_path(n_rows)
+    if (n_months, n_teams, seed) != (12, 2, 0):
+        path = path.replace('.tsv', f'_m{n_months}_t{n_teams}_s{seed}.tsv')
+    if not os.path.exists(path):
+        print(f"{n_rows}行の合成データを生成しています: {path}")
+        generate_survey_data(path, n_rows, n_months, n_teams, seed=seed)
+    return path
+
+
+def run_metrics(recorder, likert_cubes):
+    """ダッシュボードの指標計算を計測"""
+    from survey_metrics import (
+        average_monthly_score, calculate_time_reduction_metrics, calculate_tool_metrics, compute_period_metrics
+    )
+
+    months = likert_cubes['upstream_frequency'].months
+    baseline, comparison = months[0], months[-1]
+
+    with recorder.stage('metrics.average_monthly_score'):
+        for section, team in (('upstream_frequency', 'ディレクターチーム'),
+                              ('development_frequency', 'エンジニアリングチーム')):
+            cube = likert_cubes[section]
+            for item in cube.items:
+                average_monthly_score(cube, item, team)
+    with recorder.stage('metrics.calculate_tool_metrics'):
+        for process_type in ('upstream', 'development'):
+            calculate_tool_metrics(
+                likert_cubes[f'{process_type}_frequency'], likert_cubes[f'{process_type}_contribution'],
+                process_type, baseline, comparison
+            )
+    with recorder.stage('metrics.calculate_time_reduction_metrics'):
+        for process_type in ('upstream', 'development'):
+            calculate_time_reduction_metrics(
+                likert_cubes[f'{process_type}_time_reduction'], process_type, baseline, comparison
+            )
+    with recorder.stage('metrics.compute_period_metrics'):
+        compute_period_metrics(likert_cubes, baseline, comparison)
+
+
+def run_scale(data_path, repeat, stage_workers=1, shard_workers=None, stream=False):
+    """1つのデータセットで全ての処理を repeat 回計測し、処理ごとの最短時間などを返す
+
+    別プロセスで実行される。stage_workers が2以上の場合は集計処理が並行して実行されるため、
+    処理ごとの時間には他の処理との競合が含まれる（全体の時間は process_loaded_data）。
+    shard_workers が2以上の場合、回答数・件数の集計は aggregate_shards にまとめて計上される。
+    stream=True の場合は load_data の代わりに load_streaming（一定の行数ずつ集計）を計測する。
+    """
+    from data_processor import AIUsageSurveyProcessor
+    from instrumentation import StageRecorder
+
+    recorder = StageRecorder()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for run in range(repeat):
+            # 解析済みデータのキャッシュは使わず、毎回TSVを解析する（自由記述のストアも毎回作成する）
+            processor = AIUsageSurveyProcessor(
+                data_path, use_cache=False, verbose=False, instrumentation=recorder,
+                store_path=os.path.join(tmp_dir, 'survey_aggregates.sqlite'),
+                text_store_path=os.path.join(tmp_dir, f'survey_free_text_{run}.sqlite'),
+                stage_workers=stage_workers, shard_workers=shard_workers
+            )
+            recorder.row_counter = processor._row_count
+            if stream:
+                with recorder.stage('load_streaming'):
+                    processor.load_streaming()
+            else:
+                with recorder.stage('load_data'):
+                    processor.load_data()
+            with recorder.stage('process_loaded_data'):
+                processor.process_loaded_data()
+            run_metrics(recorder, processor.processed_data['likert_cubes'])
+
+    results = {}
+    for record in recorder.records:
+        result = results.setdefault(record['stage'], {'wall_seconds': [], 'cpu_seconds': []})
+        result['wall_seconds'].append(record['wall_seconds'])
+        result['cpu_seconds'].append(record['cpu_seconds'])
+        result['rows'] = record['rows']
+        result['peak_rss_bytes'] = record['peak_rss_bytes']
+    for result in results.values():
+        result['runs'] = result['wall_seconds']
+        result['wall_seconds'] = min(result['wall_seconds'])
+        result['cpu_seconds'] = min(result['cpu_seconds'])
+    return results
+
+
+def get_git_revision():
+    """現在のコミット（取得できない場合はNone）"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline, threshold):
+    """以前の結果と比較して表示し、threshold 倍以上遅くなった処理の数を返す"""
+    regressions = 0
+    for rows, stages in current['results'].items():
+        baseline_stages = baseline['results'].get(rows)
+        if baseline_stages is None:
+            continue
+        print(f"\n{rows}行（基準: {baseline['meta'].get('git_revision')}）")
+        for stage, result in stages.items():
+            base = baseline_stages.get(stage)
+            if base is None:
+                continue
+            ratio = result['wall_seconds'] / base['wall_seconds'] if base['wall_seconds'] > 0 else float('inf')
+            regressed = ratio >= threshold and base['wall_seconds'] >= MIN_COMPARE_SECONDS
+            regressions += regressed
+            mark = ' ⚠️ 遅くなりました' if regressed else ''
+            print(f"  {stage:45s} {base['wall_seconds']:9.4f}s → {result['wall_seconds']:9.4f}s ({ratio:5.2f}x){mark}")
+    return regressions
+
+
+def print_results(results):
+    """計測結果を表示"""
+    for rows, stages in results.items():
+        print(f"\n{rows}行")
+        for stage, result in stages.items():
+            rss = result['peak_rss_bytes'] / (1024 * 1024) if result['peak_rss_bytes'] else float('nan')
+            print(f"  {stage:45s} {result['wall_seconds']:9.4f}s  CPU {result['cpu_seconds']:9.4f}s  最大RSS {rss:8.1f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="データ処理とダッシュボードの指標計算のベンチマーク")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="計測する行数（複数指定可）")
+    parser.add_argument('--months', type=int, default=12, help="合成データの年月の数")
+    parser.add_argument('--teams', type=int, default=2, help="合成データのチーム数")
+    parser.add_argument('--repeat', type=int, default=3, help="各処理の計測回数（最短時間を記録）")
+    parser.add_argument('--stage-workers', type=int, default=1,
+                        help="集計処理を並行して実行するスレッド数（1の場合は順に実行し、処理ごとの時間を比較できる）")
+    parser.add_argument('--output', help="結果を保存するJSONファイル（省略時は benchmarks/results/ 以下）")
+    parser.add_argument('--compare', help="比較する以前の結果のJSONファイル")
+    parser.add_argument('--threshold', type=float, default=1.2, help="この倍率以上遅くなった処理を報告")
+    parser.add_argument('--shard-workers', type=int, default=None,
+                        help="2以上を指定すると、年月ごとに分割してこの数のプロセスで集計する")
+    parser.add_argument('--stream', action='store_true',
+                        help="全件を読み込まずに一定の行数ずつ集計するストリーミング処理を計測（最大RSSの比較用）")
+    args = parser.parse_args()
+
+    revision = get_git_revision()
+    output = args.output or os.path.join(
+        RESULTS_PATH, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{revision or 'unknown'}.json"
+    )
+
+    results = {}
+    for n_rows in args.rows:
+        data_path = ensure_dataset(n_rows, args.months, args.teams)
+        print(f"{n_rows}行のデータで計測しています...")
+        # 行数ごとに新しいプロセスで計測する
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results[str(n_rows)] = executor.submit(
+                run_scale, data_path, args.repeat, args.stage_workers, args.shard_workers, args.stream
+            ).result()
+
+    current = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': revision,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'months': args.months,
+            'teams': args.teams,
+            'repeat': args.repeat,
+            'stage_workers': args.stage_workers,
+            'shard_workers': args.shard_workers,
+            'stream': args.stream,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+
+    print_results(results)
+    print(f"\n結果を保存しました: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{regressions}件の処理が{args.threshold}倍以上遅くなりました")
+            sys.exit(1)
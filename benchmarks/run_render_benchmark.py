@@ -0,0 +1,396 @@
+"""
+ダッシュボードの描画ベンチマーク
+
+合成データ（generate_survey_data.py）の行数ごとに、次の2種類の計測を行う。
+
+1. Streamlit のテストハーネス（AppTest）で streamlit_app.py を実行し、
+   初回表示・再実行・タブごとの表示・ツール選択（selectbox）の応答時間を計測
+2. ローカルで起動した Streamlit サーバーに複数のセッションを同時に接続し、
+   タブを切り替えながら再実行したときの応答時間（p50/p95）とセッションあたりのメモリを計測
+
+いずれも環境変数 SURVEY_DATA_PATH などで合成データを指定した別プロセスで実行するため、
+data/ 以下の集計結果やキャッシュは変更しない。
+
+使い方:
+    python benchmarks/run_render_benchmark.py --rows 10000 100000 --sessions 1 10 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), 'src'))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from config import *
+from run_benchmarks import RESULTS_PATH, ensure_dataset, get_git_revision
+
+APP_PATH = os.path.join(PROJECT_ROOT, 'streamlit_app.py')
+TOOL_SELECT_KEYS = ['upstream_tool_select', 'development_tool_select']
+
+# サーバーの起動・1回の再実行を待つ最大秒数
+SERVER_START_TIMEOUT = 120
+RERUN_TIMEOUT = 600
+
+
+def dataset_env(data_path, work_dir):
+    """合成データを読み込み、集計結果とキャッシュを work_dir に保存する環境変数"""
+    env = dict(os.environ)
+    env['SURVEY_DATA_PATH'] = data_path
+    env['SURVEY_PROCESSED_DATA_PATH'] = os.path.join(work_dir, 'processed')
+    env['SURVEY_CACHE_PATH'] = os.path.join(work_dir, 'cache')
+    return env
+
+
+def summarize(latencies):
+    """応答時間のリストの要約（秒）"""
+    if not latencies:
+        return None
+    values = np.array(latencies)
+    return {
+        'count': len(values),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'max': float(values.max()),
+    }
+
+
+def get_process_rss(pid):
+    """プロセスの現在のRSS（バイト）。/proc がない環境ではNone"""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# AppTest による計測（環境変数を設定した子プロセスで実行）
+# ---------------------------------------------------------------------------
+
+def timed_run(app_test):
+    """AppTest を1回実行し、(経過秒数, 例外の数) を返す"""
+    start = time.perf_counter()
+    app_test.run()
+    return time.perf_counter() - start, len(app_test.exception)
+
+
+def run_apptest(repeat):
+    """streamlit_app.py を AppTest で実行し、初回表示・再実行・タブ・selectbox の応答時間を計測"""
+    from streamlit.testing.v1 import AppTest
+
+    errors = 0
+    app_test = AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT)
+    first_run, n_errors = timed_run(app_test)
+    errors += n_errors
+
+    # 同じ画面のままの再実行（集計結果・図は共有モデルから再利用される）
+    reruns = []
+    for _ in range(repeat):
+        elapsed, n_errors = timed_run(app_test)
+        reruns.append(elapsed)
+        errors += n_errors
+
+    # タブごとの初回表示（セクションの集計・図の作成を含む）と2回目以降の表示
+    tabs = {}
+    radio = app_test.radio(key='active_tab')
+    for label in radio.options:
+        start = time.perf_counter()
+        app_test.radio(key='active_tab').set_value(label).run()
+        first_visit = time.perf_counter() - start
+        errors += len(app_test.exception)
+        visits = []
+        for _ in range(repeat):
+            elapsed, n_errors = timed_run(app_test)
+            visits.append(elapsed)
+            errors += n_errors
+        tabs[label] = {'first_visit_seconds': first_visit, 'rerun': summarize(visits)}
+
+    # 利用頻度・生産性分析タブのツール選択（クロス集計の切り替え）
+    app_test.radio(key='active_tab').set_value(radio.options[1]).run()
+    selectboxes = {}
+    for key in TOOL_SELECT_KEYS:
+        options = app_test.selectbox(key=key).options
+        latencies = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            app_test.selectbox(key=key).set_value(options[(i + 1) % len(options)]).run()
+            latencies.append(time.perf_counter() - start)
+            errors += len(app_test.exception)
+        selectboxes[key] = summarize(latencies)
+
+    return {
+        'first_run_seconds': first_run,
+        'rerun': summarize(reruns),
+        'tabs': tabs,
+        'tool_select': selectboxes,
+        'errors': errors,
+    }
+
+
+def measure_apptest(data_path, repeat):
+    """合成データを指定した子プロセスで AppTest の計測を行い、結果を返す"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        result_path = os.path.join(work_dir, 'result.json')
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--apptest-worker', result_path, '--repeat', str(repeat)],
+            env=dataset_env(data_path, work_dir), check=True
+        )
+        with open(result_path, encoding='utf-8') as f:
+            return json.load(f)
+
+
+# ---------------------------------------------------------------------------
+# ローカルサーバーへの同時接続による計測
+# ---------------------------------------------------------------------------
+
+def find_free_port():
+    """空いているTCPポートを取得"""
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_path, work_dir, port):
+    """合成データを読み込む Streamlit サーバーを起動し、応答するまで待つ"""
+    server = subprocess.Popen(
+        [
+            sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+            '--server.headless', 'true', '--server.port', str(port),
+            '--browser.gatherUsageStats', 'false', '--server.fileWatcherType', 'none',
+        ],
+        env=dataset_env(data_path, work_dir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Streamlit サーバーが起動しませんでした")
+
+
+class BrowserSession:
+    """ブラウザの代わりに WebSocket で接続し、スクリプトの再実行を要求するセッション"""
+
+    def __init__(self, port):
+        self.url = f'ws://localhost:{port}/_stcore/stream'
+        self.connection = None
+        self.tab_widget_id = None
+        self.tab_count = 0
+        self.errors = 0
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+        self.connection = await websocket_connect(self.url, subprotocols=['streamlit'])
+
+    async def rerun(self, tab_index=None):
+        """再実行を要求し、スクリプトが終了するまでの秒数を返す（tab_index を指定するとそのタブを表示）"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.page_script_hash = ''
+        if tab_index is not None and self.tab_widget_id is not None:
+            widget = message.rerun_script.widget_states.widgets.add()
+            widget.id = self.tab_widget_id
+            widget.int_value = tab_index
+
+        start = time.perf_counter()
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+        while True:
+            payload = await asyncio.wait_for(self.connection.read_message(), RERUN_TIMEOUT)
+            if payload is None:
+                raise RuntimeError("サーバーとの接続が切断されました")
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'radio' and self.tab_widget_id is None:
+                    # タブ切り替えのラジオボタンの ID を記録し、以降の再実行でタブを指定する
+                    self.tab_widget_id = element.radio.id
+                    self.tab_count = len(element.radio.options)
+                elif element_type == 'exception':
+                    self.errors += 1
+            elif kind == 'script_finished':
+                if forward.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    self.errors += 1
+                return time.perf_counter() - start
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+async def run_session(port, reruns, offset):
+    """1つのセッションで初回表示の後、タブを順に切り替えながら再実行する"""
+    session = BrowserSession(port)
+    await session.connect()
+    initial = await session.rerun()
+    latencies = []
+    for i in range(reruns):
+        latencies.append(await session.rerun((offset + i) % max(session.tab_count, 1)))
+    return session, initial, latencies
+
+
+async def run_concurrent_sessions(port, n_sessions, reruns, server_pid=None):
+    """n_sessions 個のセッションを同時に実行した結果を返す
+
+    全セッションの再実行が終わり、接続したままの状態でサーバーのRSSを計測してから切断する。
+    """
+    start = time.perf_counter()
+    sessions = await asyncio.gather(*[run_session(port, reruns, offset) for offset in range(n_sessions)])
+    elapsed = time.perf_counter() - start
+    rss = get_process_rss(server_pid) if server_pid is not None else None
+    for session, _, _ in sessions:
+        session.close()
+    return {
+        'initial': [initial for _, initial, _ in sessions],
+        'latencies': [latency for _, _, latencies in sessions for latency in latencies],
+        'elapsed_seconds': elapsed,
+        'rss': rss,
+        'errors': sum(session.errors for session, _, _ in sessions),
+    }
+
+
+def measure_server(data_path, session_counts, reruns):
+    """ローカルサーバーに同時に接続するセッション数ごとに、再実行の応答時間とメモリを計測"""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        port = find_free_port()
+        server = start_server(data_path, work_dir, port)
+        try:
+            # 1つのセッションで全てのタブを表示し、共有モデルの集計・図を作成済みにする
+            asyncio.run(run_concurrent_sessions(port, 1, 4))
+            time.sleep(1)
+            baseline_rss = get_process_rss(server.pid)
+
+            for n_sessions in session_counts:
+                run = asyncio.run(run_concurrent_sessions(port, n_sessions, reruns, server.pid))
+                rss = run['rss']
+                results[str(n_sessions)] = {
+                    'initial': summarize(run['initial']),
+                    'rerun': summarize(run['latencies']),
+                    'reruns_per_second': len(run['latencies']) / run['elapsed_seconds'],
+                    'server_rss_bytes': rss,
+                    'rss_per_session_bytes': (
+                        (rss - baseline_rss) / n_sessions if rss is not None and baseline_rss is not None else None
+                    ),
+                    'errors': run['errors'],
+                }
+                # 切断したセッションの後片付けを待ってから次のセッション数を計測
+                time.sleep(1)
+            results['baseline_rss_bytes'] = baseline_rss
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+# ---------------------------------------------------------------------------
+
+def format_seconds(summary):
+    if summary is None:
+        return '-'
+    return f"p50 {summary['p50'] * 1000:7.1f}ms  p95 {summary['p95'] * 1000:7.1f}ms"
+
+
+def print_results(results):
+    """計測結果を表示"""
+    for rows, result in results.items():
+        print(f"\n{rows}行")
+        apptest = result.get('apptest')
+        if apptest:
+            print(f"  初回表示        {apptest['first_run_seconds'] * 1000:9.1f}ms")
+            print(f"  再実行          {format_seconds(apptest['rerun'])}")
+            for label, tab in apptest['tabs'].items():
+                print(f"  {label}  初回 {tab['first_visit_seconds'] * 1000:7.1f}ms  {format_seconds(tab['rerun'])}")
+            for key, summary in apptest['tool_select'].items():
+                print(f"  {key}  {format_seconds(summary)}")
+            if apptest['errors']:
+                print(f"  ⚠️ 例外 {apptest['errors']}件")
+        for n_sessions, server in result.get('server', {}).items():
+            if n_sessions == 'baseline_rss_bytes':
+                continue
+            per_session = server['rss_per_session_bytes']
+            memory = f"{per_session / (1024 * 1024):6.1f}MB/セッション" if per_session is not None else '-'
+            errors = f"  ⚠️ エラー {server['errors']}件" if server['errors'] else ''
+            print(f"  同時{n_sessions:>3}セッション  {format_seconds(server['rerun'])}  "
+                  f"{server['reruns_per_second']:6.1f}回/秒  {memory}{errors}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ダッシュボードの描画ベンチマーク")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000], help="計測する行数（複数指定可）")
+    parser.add_argument('--months', type=int, default=12, help="合成データの年月の数")
+    parser.add_argument('--teams', type=int, default=2, help="合成データのチーム数")
+    parser.add_argument('--repeat', type=int, default=5, help="AppTest での各操作の計測回数")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10], help="同時に接続するセッション数（複数指定可）")
+    parser.add_argument('--reruns', type=int, default=8, help="各セッションの再実行の回数")
+    parser.add_argument('--skip-apptest', action='store_true', help="AppTest による計測を行わない")
+    parser.add_argument('--skip-server', action='store_true', help="サーバーへの同時接続による計測を行わない")
+    parser.add_argument('--output', help="結果を保存するJSONファイル（省略時は benchmarks/results/ 以下）")
+    parser.add_argument('--apptest-worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.apptest_worker:
+        # 子プロセス: 環境変数で指定された合成データで AppTest の計測を行い、結果をファイルに書き出す
+        with open(args.apptest_worker, 'w', encoding='utf-8') as f:
+            json.dump(run_apptest(args.repeat), f, ensure_ascii=False)
+        sys.exit(0)
+
+    revision = get_git_revision()
+    output = args.output or os.path.join(
+        RESULTS_PATH, f"render-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{revision or 'unknown'}.json"
+    )
+
+    results = {}
+    for n_rows in args.rows:
+        data_path = ensure_dataset(n_rows, args.months, args.teams)
+        result = results.setdefault(str(n_rows), {})
+        if not args.skip_apptest:
+            print(f"{n_rows}行のデータで AppTest の計測をしています...")
+            result['apptest'] = measure_apptest(data_path, args.repeat)
+        if not args.skip_server:
+            print(f"{n_rows}行のデータでサーバーへの同時接続の計測をしています...")
+            result['server'] = measure_server(data_path, args.sessions, args.reruns)
+
+    current = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': revision,
+            'cpu_count': os.cpu_count(),
+            'months': args.months,
+            'teams': args.teams,
+            'repeat': args.repeat,
+            'reruns': args.reruns,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+
+    print_results(results)
+    print(f"\n結果を保存しました: {output}")
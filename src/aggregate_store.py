@@ -0,0 +1,307 @@
+"""
+集計結果の単一ファイルストア（SQLite）
+
+processed_data のすべての集計結果を、年月・チーム・項目をキーとするテーブルとして1つのファイルに保存する。
+元データの内容ハッシュを記録し、一致する場合はこのファイルから集計結果を復元して再計算を省略する。
+"""
+
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from survey_cube import CrossTabCube, LikertCube, encode_count_index
+
+# ストアの形式を変更した場合はこの値を上げる（古いストアは読み込まずに再計算する）
+STORE_FORMAT_VERSION = 4
+
+LIKERT_AXES = ['month', 'team', 'item', 'level']
+CROSS_AXES = ['month', 'team', 'item', 'row_level', 'column_level']
+
+# 選択肢の件数（全期間・月別）を保持する processed_data のキー
+CHOICE_TOTAL_KEYS = ['upstream_challenges', 'development_challenges', 'training_needs']
+MONTHLY_CHOICE_KEYS = ['monthly_challenges', 'monthly_training_needs']
+
+# 検索用のインデックス（テーブル名: 列）
+INDEXES = {
+    'likert_counts': ['section', 'month', 'team', 'item'],
+    'likert_means': ['section', 'item', 'month', 'team'],
+    'cross_counts': ['process_type', 'item', 'team', 'month'],
+    'choice_counts': ['key', 'month', 'team'],
+    'choice_totals': ['aggregate', 'month', 'key'],
+}
+
+
+def _nullable(value):
+    """欠損値をSQLiteのNULLとして保存できるようにNoneに変換"""
+    return None if pd.isna(value) else value
+
+
+class AggregateStore:
+    """processed_data を1つのSQLiteファイルとして保存・復元するストア"""
+
+    def __init__(self, path=AGGREGATE_STORE_PATH):
+        self.path = path
+
+    def save(self, processed_data, source_hash):
+        """集計結果を保存（一時ファイルに書き出してから置き換える）"""
+        tables = self._to_tables(processed_data, source_hash)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp-{uuid.uuid4().hex}'
+        try:
+            with closing(sqlite3.connect(tmp_path)) as conn:
+                for name, frame in tables.items():
+                    frame.to_sql(name, conn, index=False)
+                for name, columns in INDEXES.items():
+                    conn.execute(f"CREATE INDEX idx_{name} ON {name} ({', '.join(columns)})")
+                conn.commit()
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def load(self, source_hash):
+        """元データのハッシュが一致する集計結果を復元（存在しない・古い場合はNone）"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with closing(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)) as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                if meta.get('version') != str(STORE_FORMAT_VERSION) or meta.get('source_hash') != source_hash:
+                    return None
+                tables = {
+                    name: pd.read_sql(f"SELECT * FROM {name} ORDER BY rowid", conn)
+                    for name in ['likert_axes', 'likert_counts', 'likert_group_sizes', 'likert_means',
+                                 'cross_axes', 'cross_counts',
+                                 'choice_counts', 'choice_series', 'choice_totals', 'feedback']
+                }
+        except (sqlite3.Error, pd.errors.DatabaseError):
+            # 破損・旧形式のストアは無視して再計算させる
+            return None
+
+        return self._from_tables(tables, json.loads(meta['periods']))
+
+    def _to_tables(self, processed_data, source_hash):
+        """processed_data を年月・チーム・項目をキーとするテーブル群に変換"""
+        meta = pd.DataFrame({
+            'key': ['version', 'source_hash', 'periods'],
+            'value': [str(STORE_FORMAT_VERSION), source_hash,
+                      json.dumps(processed_data['periods'], ensure_ascii=False)],
+        })
+
+        # リッカート設問: 回答数テンソル（0件のセルは省略）と軸の順序
+        axes_rows, count_frames, size_frames, mean_frames = [], [], [], []
+        for section, cube in processed_data['likert_cubes'].items():
+            for axis, labels in zip(LIKERT_AXES, [cube.months, cube.teams, cube.items, cube.levels]):
+                for position, label in enumerate(labels):
+                    score = cube.scores[position] if axis == 'level' else np.nan
+                    axes_rows.append([section, axis, position, label, _nullable(score)])
+
+            m, t, i, l = np.nonzero(cube.counts)
+            count_frames.append(pd.DataFrame({
+                'section': section,
+                'month': np.array(cube.months, dtype=object)[m],
+                'team': np.array(cube.teams, dtype=object)[t],
+                'item': np.array(cube.items, dtype=object)[i],
+                'level': np.array(cube.levels, dtype=object)[l],
+                'count': cube.counts[m, t, i, l],
+            }))
+
+            m, t = np.nonzero(cube.group_sizes)
+            size_frames.append(pd.DataFrame({
+                'section': section,
+                'month': np.array(cube.months, dtype=object)[m],
+                'team': np.array(cube.teams, dtype=object)[t],
+                'respondents': cube.group_sizes[m, t],
+            }))
+
+            # 項目ごとの月別・チーム別平均スコア（ダッシュボードが参照する形式）
+            for item, frame in processed_data.get(section, {}).items():
+                mean_frames.append(pd.DataFrame({
+                    'section': section,
+                    'item': item,
+                    'column_name': frame.columns[2],
+                    'month': frame['年月'].to_numpy(dtype=object),
+                    'team': frame[TEAM_COLUMN].to_numpy(dtype=object),
+                    'mean': frame.iloc[:, 2].to_numpy(dtype=float),
+                }))
+
+        likert_axes = pd.DataFrame(axes_rows, columns=['section', 'axis', 'position', 'label', 'score'])
+
+        # 利用頻度×貢献度のクロス集計テンソル（0件のセルは省略）と軸の順序
+        cross_axes_rows, cross_frames = [], []
+        for process_type, cube in processed_data.get('cross_tables', {}).items():
+            axis_labels = [cube.months, cube.teams, cube.items, cube.row_levels, cube.column_levels]
+            for axis, labels in zip(CROSS_AXES, axis_labels):
+                for position, label in enumerate(labels):
+                    cross_axes_rows.append([process_type, axis, position, label])
+
+            nonzero = np.nonzero(cube.counts)
+            frame = pd.DataFrame({
+                axis: np.array(labels, dtype=object)[codes]
+                for axis, labels, codes in zip(CROSS_AXES, axis_labels, nonzero)
+            })
+            frame.insert(0, 'process_type', process_type)
+            frame['count'] = cube.counts[nonzero]
+            cross_frames.append(frame)
+
+        cross_axes = pd.DataFrame(cross_axes_rows, columns=['process_type', 'axis', 'position', 'label'])
+        cross_counts = pd.concat(cross_frames, ignore_index=True) if cross_frames else pd.DataFrame(
+            columns=['process_type'] + CROSS_AXES + ['count'])
+
+        # 複数選択の設問: 年月×チーム×選択肢の件数
+        choice_counts = pd.DataFrame(
+            [
+                [key] + [_nullable(v) for v in index] + [int(count)]
+                for key, counts in processed_data.get('multiselect_counts', {}).items()
+                for index, count in counts.items()
+            ],
+            columns=['key', 'month', 'team', 'choice', 'count'],
+        )
+
+        # 選択肢ごとの集計（全期間・月別）。0件の集計も復元できるよう、集計の一覧を別に保存
+        series_rows, total_rows = [], []
+        for aggregate, month, key, series in self._iter_choice_series(processed_data):
+            series_rows.append([aggregate, month, key])
+            for rank, (choice, count) in enumerate(series.items()):
+                total_rows.append([aggregate, month, key, rank, choice, int(count)])
+        choice_series = pd.DataFrame(series_rows, columns=['aggregate', 'month', 'key'])
+        choice_totals = pd.DataFrame(total_rows, columns=['aggregate', 'month', 'key', 'rank', 'choice', 'count'])
+
+        feedback = pd.DataFrame({'text': processed_data.get('feedback', [])}, dtype=object)
+
+        return {
+            'meta': meta,
+            'likert_axes': likert_axes,
+            'likert_counts': pd.concat(count_frames, ignore_index=True),
+            'likert_group_sizes': pd.concat(size_frames, ignore_index=True),
+            'likert_means': pd.concat(mean_frames, ignore_index=True) if mean_frames else pd.DataFrame(
+                columns=['section', 'item', 'column_name', 'month', 'team', 'mean']),
+            'cross_axes': cross_axes,
+            'cross_counts': cross_counts,
+            'choice_counts': choice_counts,
+            'choice_series': choice_series,
+            'choice_totals': choice_totals,
+            'feedback': feedback,
+        }
+
+    @staticmethod
+    def _iter_choice_series(processed_data):
+        """選択肢ごとの集計を (集計名, 年月, 設問キー, Series) として列挙（全期間の年月はNone）"""
+        for key in CHOICE_TOTAL_KEYS:
+            if key in processed_data:
+                yield 'total', None, key, processed_data[key]
+        for aggregate in MONTHLY_CHOICE_KEYS:
+            for month, value in processed_data.get(aggregate, {}).items():
+                if isinstance(value, dict):
+                    for key, series in value.items():
+                        yield aggregate, month, key, series
+                else:
+                    yield aggregate, month, None, value
+
+    @staticmethod
+    def _to_series(rows):
+        """選択肢の件数行を件数順のSeriesに変換"""
+        if rows.empty:
+            return pd.Series(dtype=int)
+        return pd.Series(rows['count'].to_numpy(dtype=np.int64), index=rows['choice'].tolist(), name='count')
+
+    def _from_tables(self, tables, periods):
+        """テーブル群から processed_data を復元"""
+        processed_data = {'periods': periods}
+
+        # リッカート設問の回答数テンソル
+        axes = tables['likert_axes']
+        likert_cubes = {}
+        for section, section_axes in axes.groupby('section', sort=False):
+            labels = {axis: rows.sort_values('position')['label'].tolist()
+                      for axis, rows in section_axes.groupby('axis', sort=False)}
+            labels = {axis: labels.get(axis, []) for axis in LIKERT_AXES}
+            level_rows = section_axes[section_axes['axis'] == 'level'].sort_values('position')
+            scores = level_rows['score'].to_numpy(dtype=float)
+
+            shape = tuple(len(labels[axis]) for axis in LIKERT_AXES)
+            counts = np.zeros(shape, dtype=np.int64)
+            rows = tables['likert_counts'][tables['likert_counts']['section'] == section]
+            if len(rows):
+                index = tuple(pd.Index(labels[axis]).get_indexer(rows[axis]) for axis in LIKERT_AXES)
+                counts[index] = rows['count'].to_numpy(dtype=np.int64)
+
+            group_sizes = np.zeros(shape[:2], dtype=np.int64)
+            rows = tables['likert_group_sizes'][tables['likert_group_sizes']['section'] == section]
+            if len(rows):
+                index = tuple(pd.Index(labels[axis]).get_indexer(rows[axis]) for axis in ['month', 'team'])
+                group_sizes[index] = rows['respondents'].to_numpy(dtype=np.int64)
+
+            likert_cubes[section] = LikertCube(
+                counts, group_sizes, labels['month'], labels['team'], labels['item'], labels['level'], scores
+            )
+        processed_data['likert_cubes'] = likert_cubes
+
+        # 項目ごとの平均スコア
+        for section, cube in likert_cubes.items():
+            means = tables['likert_means'][tables['likert_means']['section'] == section]
+            processed_data[section] = {}
+            for item, rows in means.groupby('item', sort=False):
+                processed_data[section][item] = pd.DataFrame({
+                    '年月': rows['month'].to_numpy(dtype=object),
+                    TEAM_COLUMN: rows['team'].to_numpy(dtype=object),
+                    rows['column_name'].iloc[0]: rows['mean'].to_numpy(dtype=float),
+                })
+
+        # 利用頻度×貢献度のクロス集計テンソル
+        cross_tables = {}
+        for process_type, process_axes in tables['cross_axes'].groupby('process_type', sort=False):
+            labels = {axis: rows.sort_values('position')['label'].tolist()
+                      for axis, rows in process_axes.groupby('axis', sort=False)}
+            labels = {axis: labels.get(axis, []) for axis in CROSS_AXES}
+
+            counts = np.zeros(tuple(len(labels[axis]) for axis in CROSS_AXES), dtype=np.int64)
+            rows = tables['cross_counts'][tables['cross_counts']['process_type'] == process_type]
+            if len(rows):
+                index = tuple(pd.Index(labels[axis]).get_indexer(rows[axis]) for axis in CROSS_AXES)
+                counts[index] = rows['count'].to_numpy(dtype=np.int64)
+
+            cross_tables[process_type] = CrossTabCube(
+                counts, labels['month'], labels['team'], labels['item'], labels['row_level'], labels['column_level']
+            )
+        processed_data['cross_tables'] = cross_tables
+
+        # 複数選択の設問の件数（年月・チームは集計した場合と同じカテゴリ型に戻す）
+        teams = sorted(set(sum((cube.teams for cube in likert_cubes.values()), [])))
+        processed_data['multiselect_counts'] = {
+            key: encode_count_index(
+                rows.set_index(['month', 'team', 'choice'])['count'].rename_axis(['年月', TEAM_COLUMN, '選択肢']),
+                periods, teams
+            )
+            for key, rows in tables['choice_counts'].groupby('key', sort=False)
+        }
+
+        # 選択肢ごとの集計（全期間・月別）
+        totals = tables['choice_totals']
+        processed_data['monthly_challenges'] = {month: {} for month in periods}
+        processed_data['monthly_training_needs'] = {}
+        for row in tables['choice_series'].itertuples(index=False):
+            rows = totals[
+                (totals['aggregate'] == row.aggregate)
+                & (totals['month'].isna() if row.month is None else totals['month'] == row.month)
+                & (totals['key'].isna() if row.key is None else totals['key'] == row.key)
+            ].sort_values('rank')
+            series = self._to_series(rows)
+
+            if row.aggregate == 'total':
+                processed_data[row.key] = series
+            elif row.key is None:
+                processed_data[row.aggregate][row.month] = series
+            else:
+                processed_data[row.aggregate].setdefault(row.month, {})[row.key] = series
+
+        processed_data['feedback'] = tables['feedback']['text'].tolist()
+        return processed_data
@@ -5,8 +5,20 @@ import os
 
 # プロジェクトルートディレクトリを動的に取得
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_PATH = os.path.join(PROJECT_ROOT, 'data', 'AI活用アンケートデータ.tsv')
-PROCESSED_DATA_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed')
+# 元データ・集計結果・キャッシュの場所は環境変数で変更できる（ベンチマークで合成データを使う場合など）
+DATA_PATH = os.environ.get('SURVEY_DATA_PATH') or os.path.join(PROJECT_ROOT, 'data', 'AI活用アンケートデータ.tsv')
+PROCESSED_DATA_PATH = os.environ.get('SURVEY_PROCESSED_DATA_PATH') or os.path.join(PROJECT_ROOT, 'data', 'processed')
+AGGREGATE_STORE_PATH = os.path.join(PROCESSED_DATA_PATH, 'survey_aggregates.sqlite')
+SNAPSHOT_PATH = os.path.join(PROCESSED_DATA_PATH, 'dashboard_snapshot.pkl')
+FREE_TEXT_STORE_PATH = os.path.join(PROCESSED_DATA_PATH, 'survey_free_text.sqlite')
+CACHE_PATH = os.environ.get('SURVEY_CACHE_PATH') or os.path.join(PROJECT_ROOT, 'data', 'cache')
+INCREMENTAL_STATE_PATH = os.path.join(PROJECT_ROOT, 'data', 'incremental')
+PROFILE_PATH = os.path.join(PROJECT_ROOT, 'data', 'profiles')
+
+TEAM_COLUMN = 'あなたが所属するチームはどちらですか？'
+
+# アンケートは月末から翌月初めにかけて回答を受け付けるため、この日より前の日の回答は前月分の年月とする
+SURVEY_PERIOD_CUTOFF_DAY = 16
 
 TEAM_NAMES = {
     'エンジニアリングチーム': 'Engineering',
@@ -62,6 +74,25 @@ DEVELOPMENT_TOOLS = [
     'その他'
 ]
 
+UPSTREAM_TASKS = [
+    '企画・提案の骨子検討',
+    '提案資料作成',
+    '仕様・要件整理（UI含む）',
+    '概要設計・システム構成検討',
+    'プレゼン・説明内容の整理',
+    '事務作業',
+    'その他'
+]
+
+DEVELOPMENT_TASKS = [
+    '技術的な調査、問題解決のための情報収集',
+    '設計作業（検討・整理含む）',
+    'コーディング作業',
+    '単体テスト作業（テストケース作成・実行）',
+    'レビュー（コードや設計）',
+    'その他'
+]
+
 # 表示用の短縮ラベル
 TOOL_DISPLAY_NAMES = {
     'ChatGPT / Gemini / Claude（会話）': '汎用AI（会話）',
@@ -79,4 +110,32 @@ TOOL_DISPLAY_NAMES = {
     'Notebook LM': 'Notebook LM',
     'Devin Search': 'Devin Search',
     'その他のAIツール': 'その他のAIツール'
-}
\ No newline at end of file
+}
+
+# アンケートの設問文（項目付きの設問は列名の「 [項目]」より前の部分）
+QUESTIONS = {
+    'team': TEAM_COLUMN,
+    'upstream_frequency': '先月で、上流工程の作業において、以下のAIツールをどのくらいの頻度で利用しましたか？',
+    'upstream_contribution': '上流工程の作業において、それぞれのAIツールは担当された作業の生産性向上にどの程度貢献したと感じますか？',
+    'upstream_episodes': '上流工程でAIツールを活用したことで、特に効果を実感した作業や具体的なエピソードがあれば教えてください。',
+    'upstream_time_reduction': '上流工程において、AIツールを活用することで、担当作業について、おおよそどの程度の時間や労力が削減できたと感じますか？',
+    'upstream_challenges': '上流工程でAIツールを活用する上で、どのような課題を感じていますか？（複数選択可）',
+    'development_frequency': '先月、開発工程の作業において、以下のAIツールをどのくらいの頻度で利用しましたか？',
+    'development_contribution': '開発工程の作業において、それぞれのAIツールは担当された作業の生産性向上にどの程度貢献したと感じますか？',
+    'development_time_reduction': '開発工程において、AIツールを活用することで、おおよそどの程度の時間や労力が削減できたと感じますか？（可能な範囲で、具体的な作業とともにご記入ください）',
+    # 時間削減効果の設問と同じ設問文で、項目なしの列が具体的な作業内容の自由記述
+    'development_examples': '開発工程において、AIツールを活用することで、おおよそどの程度の時間や労力が削減できたと感じますか？（可能な範囲で、具体的な作業とともにご記入ください）',
+    'development_challenges': '開発工程でAIツールを活用する上で、どのような課題を感じていますか？（複数選択可）',
+    'training_needs': 'AIツールをより効果的に活用するために、どのようなトレーニングや情報共有があると役立ちますか？（複数選択可）',
+    'general_feedback': 'AIを活用した開発プロセス全体に関して、その他何か意見や要望があれば自由にご記入ください。',
+}
+
+# 項目付きの設問と、その項目の一覧
+QUESTION_ITEMS = {
+    'upstream_frequency': UPSTREAM_TOOLS,
+    'upstream_contribution': UPSTREAM_TOOLS,
+    'upstream_time_reduction': UPSTREAM_TASKS,
+    'development_frequency': DEVELOPMENT_TOOLS,
+    'development_contribution': DEVELOPMENT_TOOLS,
+    'development_time_reduction': DEVELOPMENT_TASKS,
+}
@@ -12,7 +12,15 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 import os
 
-from data_processor import AIUsageSurveyProcessor
+from data_processor import AIUsageSurveyProcessor, resolve_source_files
+from data_cache import compute_sources_hash, get_sources_version
+from data_refresh import StaleWhileRevalidateLoader
+from dashboard_snapshot import load_snapshot
+from free_text_store import FreeTextStore
+from instrumentation import StageRecorder
+from render_profiler import plotly_chart, profile_section, profiled, start_render_profiler
+from survey_metrics import average_monthly_score
+from survey_model import SurveyModel
 from config import *
 
 def get_display_name(tool_name):
@@ -20,6 +28,19 @@ def get_display_name(tool_name):
     return TOOL_DISPLAY_NAMES.get(tool_name, tool_name)
 
 
+def format_period_range(start, end, separator='→'):
+    """期間の表示用ラベルを作成（同じ年の場合は後側の年を省略）"""
+    if start[:5] == end[:5] and start[4:5] == '年':
+        return f"{start}{separator}{end[5:]}"
+    return f"{start}{separator}{end}"
+
+
+def select_periods(periods, baseline, comparison):
+    """比較元から比較先までの期間を取得"""
+    start, end = sorted([periods.index(baseline), periods.index(comparison)])
+    return periods[start:end + 1]
+
+
 st.set_page_config(
     page_title="AI活用状況ダッシュボード",
     page_icon="🤖",
@@ -28,15 +49,48 @@ st.set_page_config(
 )
 
 
-@st.cache_data
-def load_and_process_data():
-    """データの読み込みと処理"""
-    processor = AIUsageSurveyProcessor()
-    processor.process_all()
-    return processor.df, processor.processed_data
+def get_data_version():
+    """元データのバージョン（ファイルの更新日時・サイズ）"""
+    return get_sources_version(resolve_source_files(DATA_PATH))
+
+
+def read_survey_model():
+    """データを読み込み、集計モデルを作成（元データと一致するスナップショットがあればそれを読み込む）"""
+    recorder = StageRecorder()
+    paths = resolve_source_files(DATA_PATH)
+    with recorder.stage('load_snapshot'):
+        source_hash = compute_sources_hash(paths)
+        snapshot = load_snapshot(source_hash)
+    if snapshot is not None:
+        return SurveyModel(
+            snapshot['df'], snapshot['processed_data'], instrumentation=recorder,
+            text_store=FreeTextStore(paths, source_hash)
+        )
+    
+    # 集計は各セクションの初回参照時に行う（概要タブの表示に不要な集計を待たない）
+    processor = AIUsageSurveyProcessor(verbose=False, instrumentation=recorder)
+    recorder.row_counter = processor._row_count
+    processed_data = processor.load_lazy_processed_data()
+    return SurveyModel(processor.df, processed_data, instrumentation=recorder, text_store=processor.get_text_store())
+
+
+@st.cache_resource
+def get_data_loader():
+    """全セッションで共有する集計モデルのローダー（データの更新はバックグラウンドで再読み込み）"""
+    return StaleWhileRevalidateLoader(get_data_version, read_survey_model)
 
 
-def create_frequency_heatmap(data, title, process_type):
+def load_survey_model():
+    """現在のデータの集計モデルを取得し、(モデル, 更新中かどうか) を返す
+    
+    元データが更新された場合は、再読み込みが終わるまで前回のモデルを表示する。
+    モデルは全セッションで共有されるため、取得した結果は変更しないこと。
+    """
+    return get_data_loader().get()
+
+
+@profiled
+def create_frequency_heatmap(cube, title, process_type):
     """利用頻度のヒートマップを作成"""
     tools = UPSTREAM_TOOLS if process_type == 'upstream' else DEVELOPMENT_TOOLS
     
@@ -48,21 +102,8 @@ def create_frequency_heatmap(data, title, process_type):
         target_team = 'エンジニアリングチーム'
         display_label = '開発工程（エンジニアリングチーム）'
     
-    # データを整形
-    row_data = []
-    for tool in tools:
-        if tool in data:
-            tool_data = data[tool]
-            team_data = tool_data[tool_data['あなたが所属するチームはどちらですか？'] == target_team]
-            if not team_data.empty:
-                # 3列目の列名を取得して平均を計算
-                score_column = team_data.columns[2]
-                avg_freq = team_data[score_column].mean()
-                row_data.append(avg_freq if pd.notna(avg_freq) else 0)
-            else:
-                row_data.append(0)
-        else:
-            row_data.append(0)
+    # 回答数テンソルから各ツールの平均頻度を取得
+    row_data = [average_monthly_score(cube, tool, target_team) for tool in tools]
     
     matrix_data = [row_data]
     
@@ -88,6 +129,7 @@ def create_frequency_heatmap(data, title, process_type):
     return fig
 
 
+@profiled
 def create_time_series_chart(data, title, metric_type, process_type):
     """時系列推移グラフを作成"""
     fig = go.Figure()
@@ -143,6 +185,7 @@ def create_time_series_chart(data, title, metric_type, process_type):
     return fig
 
 
+@profiled
 def create_time_reduction_chart(data, title):
     """時間削減効果の棒グラフを作成"""
     all_data = []
@@ -180,30 +223,22 @@ def create_time_reduction_chart(data, title):
     return None
 
 
-def get_time_reduction_examples(raw_df, process_type):
-    """時間削減効果の具体的な事例を取得"""
+def get_time_reduction_examples(text_store, process_type, limit=None, offset=0):
+    """時間削減効果の具体的な事例を取得（limit・offset で表示する件数だけを読み込む）"""
     if process_type == 'upstream':
         target_team = 'ディレクターチーム'
         # 上流工程の具体的事例列
-        example_col = '上流工程でAIツールを活用したことで、特に効果を実感した作業や具体的なエピソードがあれば教えてください。'
+        section = 'upstream_episodes'
     else:
         target_team = 'エンジニアリングチーム'
         # 開発工程の具体的事例列
-        example_col = '開発工程において、AIツールを活用することで、おおよそどの程度の時間や労力が削減できたと感じますか？（可能な範囲で、具体的な作業とともにご記入ください）'
-    
-    if example_col not in raw_df.columns:
-        return []
-    
-    # 対象チームのデータでフィルタリング
-    team_data = raw_df[raw_df['あなたが所属するチームはどちらですか？'] == target_team]
-    
-    # 具体的な事例を取得（空でない回答のみ）
-    examples = team_data[example_col].dropna()
-    examples = examples[examples.str.strip() != '']
+        section = 'development_examples'
     
-    return examples.tolist()
+    # 対象チームの空でない回答のみ
+    return text_store.fetch(section, team=target_team, limit=limit, offset=offset, skip_blank=True)
 
 
+@profiled
 def create_time_reduction_trend_chart(data, title, process_type):
     """時間削減効果の推移グラフを作成"""
     fig = go.Figure()
@@ -260,229 +295,104 @@ def create_time_reduction_trend_chart(data, title, process_type):
     return fig
 
 
-def calculate_time_reduction_metrics(data, process_type):
-    """工程別の時間削減効果指標を計算"""
+@profiled
+def create_frequency_contribution_cross_table(cross_cube, schema, tool_name, process_type):
+    """利用頻度×貢献度のクロス集計表を、処理済みのクロス集計テンソルから作成"""
     if process_type == 'upstream':
         target_team = 'ディレクターチーム'
     else:
         target_team = 'エンジニアリングチーム'
     
-    # 各作業の月別削減率を収集
-    task_scores = {}
+    counts = cross_cube.table(tool_name, target_team)
+    if counts is None or counts.sum() == 0:
+        return None
     
-    for task, task_data in data.items():
-        team_data = task_data[task_data['あなたが所属するチームはどちらですか？'] == target_team]
-        
-        if not team_data.empty:
-            # 月別の平均削減率を計算（3列目のデータを使用）
-            score_column = team_data.columns[2]  # 3列目の列名を取得
-            monthly_scores = team_data.groupby('年月')[score_column].mean().to_dict()
-            task_scores[task] = monthly_scores
-    
-    # 1. 最高削減効果作業（全期間の平均）
-    overall_avg = {}
-    for task, scores in task_scores.items():
-        if scores:
-            valid_scores = [v for v in scores.values() if pd.notna(v)]
-            if valid_scores:
-                overall_avg[task] = sum(valid_scores) / len(valid_scores)
-    
-    best_task = max(overall_avg, key=overall_avg.get) if overall_avg else None
-    best_score = overall_avg.get(best_task, 0) if best_task else 0
-    
-    # 2. 5月から7月で最も改善した作業
-    # 3. 平均削減効果
-    improvements = {}
-    all_scores = []
-    
-    for task, scores in task_scores.items():
-        if '2025年5月' in scores and '2025年7月' in scores:
-            may_score = scores['2025年5月']
-            jul_score = scores['2025年7月']
-            if pd.notna(may_score) and pd.notna(jul_score):
-                improvement = jul_score - may_score
-                improvements[task] = {
-                    'improvement': improvement,
-                    'may_score': may_score,
-                    'jul_score': jul_score
-                }
-        
-        # 全スコアを収集（平均計算用）
-        for score in scores.values():
-            if pd.notna(score):
-                all_scores.append(score)
-    
-    # 最高改善作業
-    improved_task = None
-    max_improvement = 0
-    for task, improvement_data in improvements.items():
-        if improvement_data['improvement'] > max_improvement:
-            max_improvement = improvement_data['improvement']
-            improved_task = task
-    
-    # 平均削減効果
-    avg_reduction = sum(all_scores) / len(all_scores) if all_scores else 0
-    
-    # 4. 効果的作業割合（削減効果 > 0の作業数）
-    effective_tasks = sum(1 for avg in overall_avg.values() if avg > 0)
-    total_tasks = len(overall_avg)
-    effective_ratio = (effective_tasks / total_tasks * 100) if total_tasks > 0 else 0
-    
-    return {
-        'best_task': best_task,
-        'best_score': best_score,
-        'improved_task': improved_task,
-        'improvement': max_improvement,
-        'avg_reduction': avg_reduction,
-        'effective_ratio': effective_ratio,
-        'effective_count': effective_tasks,
-        'total_count': total_tasks
-    }
-
-
-def calculate_tool_metrics(frequency_data, contribution_data, process_type):
-    """工程別のAIツール指標を計算"""
-    if process_type == 'upstream':
-        target_team = 'ディレクターチーム'
-        tools = UPSTREAM_TOOLS
-    else:
-        target_team = 'エンジニアリングチーム'
-        tools = DEVELOPMENT_TOOLS
+    table = pd.DataFrame(counts, index=cross_cube.row_levels, columns=cross_cube.column_levels)
     
-    # 利用頻度データの処理
-    freq_tool_scores = {}
-    for tool in tools:
-        if tool in frequency_data:
-            tool_data = frequency_data[tool]
-            team_data = tool_data[tool_data['あなたが所属するチームはどちらですか？'] == target_team]
-            
-            if not team_data.empty:
-                score_column = team_data.columns[2]
-                monthly_scores = team_data.groupby('年月')[score_column].mean().to_dict()
-                freq_tool_scores[tool] = monthly_scores
+    # 順序を定義
+    freq_order = ['利用したことがない', 'ほとんど利用しない', '月に数回', '週に数回', '毎日']
+    contrib_order = ['1:全く貢献しなかった', '2:あまり貢献しなかった', '3:どちらともいえない', '4:貢献した', '5:非常に貢献した', '利用していない/判断できない']
     
-    # 貢献度データの処理
-    contrib_tool_scores = {}
-    for tool in tools:
-        if tool in contribution_data:
-            tool_data = contribution_data[tool]
-            team_data = tool_data[tool_data['あなたが所属するチームはどちらですか？'] == target_team]
-            
-            if not team_data.empty:
-                score_column = team_data.columns[2]
-                monthly_scores = team_data.groupby('年月')[score_column].mean().to_dict()
-                contrib_tool_scores[tool] = monthly_scores
-    
-    # 1. 最高利用ツール（利用頻度平均が最高）
-    freq_overall_avg = {}
-    for tool, scores in freq_tool_scores.items():
-        if scores:
-            valid_scores = [v for v in scores.values() if pd.notna(v)]
-            if valid_scores:
-                freq_overall_avg[tool] = sum(valid_scores) / len(valid_scores)
-    
-    most_used_tool = max(freq_overall_avg, key=freq_overall_avg.get) if freq_overall_avg else None
-    most_used_score = freq_overall_avg.get(most_used_tool, 0) if most_used_tool else 0
-    
-    # 2. 最高貢献ツール（貢献度平均が最高）
-    contrib_overall_avg = {}
-    for tool, scores in contrib_tool_scores.items():
-        if scores:
-            valid_scores = [v for v in scores.values() if pd.notna(v)]
-            if valid_scores:
-                contrib_overall_avg[tool] = sum(valid_scores) / len(valid_scores)
-    
-    best_contrib_tool = max(contrib_overall_avg, key=contrib_overall_avg.get) if contrib_overall_avg else None
-    best_contrib_score = contrib_overall_avg.get(best_contrib_tool, 0) if best_contrib_tool else 0
-    
-    # 3. 総合評価最高（利用頻度×貢献度が最高）
-    combined_scores = {}
-    for tool in tools:
-        freq_avg = freq_overall_avg.get(tool, 0)
-        contrib_avg = contrib_overall_avg.get(tool, 0)
-        if freq_avg > 0 and contrib_avg > 0:
-            combined_scores[tool] = freq_avg * contrib_avg
-    
-    best_combined_tool = max(combined_scores, key=combined_scores.get) if combined_scores else None
-    best_combined_score = combined_scores.get(best_combined_tool, 0) if best_combined_tool else 0
-    
-    # 4. 最高改善ツール（5月→7月で利用頻度が最も向上）
-    improvements = {}
-    for tool, scores in freq_tool_scores.items():
-        if '2025年5月' in scores and '2025年7月' in scores:
-            may_score = scores['2025年5月']
-            jul_score = scores['2025年7月']
-            if pd.notna(may_score) and pd.notna(jul_score) and may_score > 0:
-                improvement = jul_score - may_score
-                improvements[tool] = improvement
-    
-    improved_tool = max(improvements, key=improvements.get) if improvements else None
-    improvement_value = improvements.get(improved_tool, 0) if improved_tool else 0
-    
-    return {
-        'most_used_tool': most_used_tool,
-        'most_used_score': most_used_score,
-        'best_contrib_tool': best_contrib_tool,
-        'best_contrib_score': best_contrib_score,
-        'best_combined_tool': best_combined_tool,
-        'best_combined_score': best_combined_score,
-        'improved_tool': improved_tool,
-        'improvement_value': improvement_value
-    }
-
-
-def create_frequency_contribution_cross_table(frequency_data, contribution_data, tool_name, process_type):
-    """利用頻度×貢献度のクロス集計表を作成"""
-    if process_type == 'upstream':
-        target_team = 'ディレクターチーム'
-    else:
-        target_team = 'エンジニアリングチーム'
+    # 回答のある項目のみを順序に従って並べ、合計行・列を追加
+    existing_freq = [f for f in freq_order if f in table.index and table.loc[f].sum() > 0]
+    existing_contrib = [c for c in contrib_order if c in table.columns and table[c].sum() > 0]
     
-    # 生データを取得
-    raw_df = AIUsageSurveyProcessor().load_data()
-    team_data = raw_df[raw_df['あなたが所属するチームはどちらですか？'] == target_team]
+    cross_table = table.loc[existing_freq, existing_contrib]
+    cross_table['合計'] = table.sum(axis=1)[existing_freq]
+    cross_table.loc['合計'] = list(table.sum(axis=0)[existing_contrib]) + [counts.sum()]
     
-    # 列名を構築
-    if process_type == 'upstream':
-        freq_col = f'先月で、上流工程の作業において、以下のAIツールをどのくらいの頻度で利用しましたか？ [{tool_name}]'
-        contrib_col = f'上流工程の作業において、それぞれのAIツールは担当された作業の生産性向上にどの程度貢献したと感じますか？ [{tool_name}]'
-    else:
-        freq_col = f'先月、開発工程の作業において、以下のAIツールをどのくらいの頻度で利用しましたか？ [{tool_name}]'
-        contrib_col = f'開発工程の作業において、それぞれのAIツールは担当された作業の生産性向上にどの程度貢献したと感じますか？ [{tool_name}]'
+    # 行・列の見出しは元データの列名
+    cross_table.index.name = schema.column_name(f'{process_type}_frequency', tool_name)
+    cross_table.columns.name = schema.column_name(f'{process_type}_contribution', tool_name)
     
-    if freq_col not in team_data.columns or contrib_col not in team_data.columns:
+    return cross_table
+
+
+@profiled
+def create_cross_table_heatmap(cross_table, tool_name):
+    """クロス集計表から合計行・列を除いたヒートマップを作成（データがない場合はNone）"""
+    heatmap_data = cross_table.iloc[:-1, :-1]  # 合計行・列を除外
+    if heatmap_data.empty:
         return None
     
-    # データをフィルタリング（空値を除外）
-    valid_data = team_data[[freq_col, contrib_col]].dropna()
-    valid_data = valid_data[(valid_data[freq_col] != '') & (valid_data[contrib_col] != '')]
-    
-    if len(valid_data) == 0:
-        return None
+    fig = go.Figure(data=go.Heatmap(
+        z=heatmap_data.values,
+        x=heatmap_data.columns,
+        y=heatmap_data.index,
+        colorscale='Blues',
+        text=heatmap_data.values,
+        texttemplate='%{text}',
+        textfont={"size": 12},
+        colorbar=dict(title="回答数")
+    ))
     
-    # クロス集計表を作成
-    cross_table = pd.crosstab(
-        valid_data[freq_col], 
-        valid_data[contrib_col], 
-        margins=True, 
-        margins_name="合計"
+    fig.update_layout(
+        title=f"{get_display_name(tool_name)} 利用頻度×貢献度",
+        xaxis_title="生産性貢献度",
+        yaxis_title="利用頻度",
+        height=400,
+        xaxis={'tickangle': -45}
     )
     
-    # 順序を定義
-    freq_order = ['利用したことがない', 'ほとんど利用しない', '月に数回', '週に数回', '毎日']
-    contrib_order = ['1:全く貢献しなかった', '2:あまり貢献しなかった', '3:どちらともいえない', '4:貢献した', '5:非常に貢献した', '利用していない/判断できない']
-    
-    # 存在する項目のみでフィルタリング
-    existing_freq = [f for f in freq_order if f in cross_table.index]
-    existing_contrib = [c for c in contrib_order if c in cross_table.columns]
-    
-    # 順序に従って並び替え
-    cross_table = cross_table.reindex(index=existing_freq + ['合計'], columns=existing_contrib + ['合計'], fill_value=0)
+    return fig
+
+
+@st.fragment
+def render_cross_table_panel(model, process_type, tools, select_key):
+    """ツール別クロス集計表のパネル（ツールの選択を変更した場合はこのパネルのみを再実行）"""
+    selected_tool = st.selectbox(
+        "詳細を確認するツールを選択",
+        tools,
+        key=select_key
+    )
+    if not selected_tool:
+        return
+    
+    # 処理済みのクロス集計テンソルから表を作成（ツールごとに初回のみ）
+    cross_table = model.memoize(('cross_table', process_type, selected_tool), lambda: create_frequency_contribution_cross_table(
+        model.processed_data['cross_tables'][process_type],
+        model.processed_data['schema'],
+        selected_tool,
+        process_type
+    ))
     
-    return cross_table
+    if cross_table is not None:
+        st.markdown(f"**{get_display_name(selected_tool)}の利用頻度×生産性貢献度クロス集計**")
+        st.dataframe(cross_table, use_container_width=True)
+        
+        # 合計行・列を除いたヒートマップ
+        fig_cross = model.memoize(
+            ('cross_table_heatmap', process_type, selected_tool),
+            lambda: create_cross_table_heatmap(cross_table, selected_tool)
+        )
+        if fig_cross is not None:
+            plotly_chart(fig_cross, use_container_width=True)
+    else:
+        st.info(f"{get_display_name(selected_tool)}のデータが不足しています。")
 
 
-def create_frequency_contribution_heatmap(frequency_data, contribution_data, title, process_type):
+@profiled
+def create_frequency_contribution_heatmap(frequency_cube, contribution_cube, title, process_type, target_months=None):
     """利用頻度×貢献度の組み合わせヒートマップを作成"""
     tools = UPSTREAM_TOOLS if process_type == 'upstream' else DEVELOPMENT_TOOLS
     
@@ -494,59 +404,22 @@ def create_frequency_contribution_heatmap(frequency_data, contribution_data, tit
         target_team = 'エンジニアリングチーム'
         display_label = '開発工程（エンジニアリングチーム）'
     
-    # 5月から7月のデータを結合
-    target_months = ['2025年5月', '2025年6月', '2025年7月']
+    # 対象期間の指定がない場合は全期間のデータを結合
+    if target_months is None:
+        target_months = frequency_cube.months
     
     combined_scores = []
     tool_labels = []
     
     for tool in tools:
-        # 利用頻度の平均を算出
-        freq_scores = []
-        if tool in frequency_data:
-            freq_tool_data = frequency_data[tool]
-            freq_team_data = freq_tool_data[freq_tool_data['あなたが所属するチームはどちらですか？'] == target_team]
-            
-            if not freq_team_data.empty:
-                score_column = freq_team_data.columns[2]
-                for month in target_months:
-                    month_data = freq_team_data[freq_team_data['年月'] == month]
-                    if not month_data.empty:
-                        # 空文字やNaNを除外して数値のみを収集
-                        valid_scores = month_data[score_column].dropna()
-                        valid_scores = valid_scores[valid_scores != '']
-                        if len(valid_scores) > 0:
-                            freq_scores.extend(valid_scores.tolist())
-        
-        # 貢献度の平均を算出
-        contrib_scores = []
-        if tool in contribution_data:
-            contrib_tool_data = contribution_data[tool]
-            contrib_team_data = contrib_tool_data[contrib_tool_data['あなたが所属するチームはどちらですか？'] == target_team]
-            
-            if not contrib_team_data.empty:
-                score_column = contrib_team_data.columns[2]
-                for month in target_months:
-                    month_data = contrib_team_data[contrib_team_data['年月'] == month]
-                    if not month_data.empty:
-                        # 空文字やNaNを除外して数値のみを収集
-                        valid_scores = month_data[score_column].dropna()
-                        valid_scores = valid_scores[valid_scores != '']
-                        if len(valid_scores) > 0:
-                            contrib_scores.extend(valid_scores.tolist())
-        
-        # 平均を算出し、掛け算
-        freq_avg = sum(freq_scores) / len(freq_scores) if freq_scores else 0
-        contrib_avg = sum(contrib_scores) / len(contrib_scores) if contrib_scores else 0
+        # 利用頻度・貢献度の平均を回答数テンソルから算出し、掛け算
+        freq_avg = average_monthly_score(frequency_cube, tool, target_team, target_months)
+        contrib_avg = average_monthly_score(contribution_cube, tool, target_team, target_months)
         combined_score = freq_avg * contrib_avg
         
         combined_scores.append(combined_score)
         tool_labels.append(get_display_name(tool))
     
-    # デバッグ情報をStreamlitに表示
-    if len(combined_scores) == 0 or all(score == 0 for score in combined_scores):
-        st.warning(f"⚠️ {process_type}工程のヒートマップデータが不足しています。利用頻度または貢献度のデータを確認してください。")
-    
     # ヒートマップ用のデータを整形
     matrix_data = [combined_scores]
     
@@ -574,7 +447,13 @@ def create_frequency_contribution_heatmap(frequency_data, contribution_data, tit
     return fig
 
 
-def create_time_reduction_metrics_cards(metrics, process_label):
+def has_heatmap_scores(fig):
+    """利用頻度×貢献度ヒートマップに0以外のスコアが含まれるか"""
+    return any(score != 0 for row in fig.data[0].z for score in row)
+
+
+@profiled
+def create_time_reduction_metrics_cards(metrics, process_label, period_label):
     """時間削減効果の指標カードを作成"""
     col1, col2, col3, col4 = st.columns(4)
     
@@ -596,13 +475,13 @@ def create_time_reduction_metrics_cards(metrics, process_label):
         if metrics['improved_task']:
             task_name = metrics['improved_task'][:15] + '...' if len(metrics['improved_task']) > 15 else metrics['improved_task']
             st.metric(
-                label=f"📈 5月→7月 最高改善",
+                label=f"📈 {period_label} 最高改善",
                 value=task_name,
                 delta=f"+{metrics['improvement']:.1f}pt改善"
             )
         else:
             st.metric(
-                label=f"📈 5月→7月 最高改善",
+                label=f"📈 {period_label} 最高改善",
                 value="データなし"
             )
     
@@ -621,7 +500,8 @@ def create_time_reduction_metrics_cards(metrics, process_label):
         )
 
 
-def create_metrics_cards(metrics, process_label):
+@profiled
+def create_metrics_cards(metrics, process_label, period_label):
     """指標カードを作成"""
     col1, col2, col3, col4 = st.columns(4)
     
@@ -671,18 +551,19 @@ def create_metrics_cards(metrics, process_label):
         if metrics['improved_tool']:
             tool_name = get_display_name(metrics['improved_tool'])
             st.metric(
-                label=f"📈 5月→7月 最高改善",
+                label=f"📈 {period_label} 最高改善",
                 value=tool_name,
                 delta=f"+{metrics['improvement_value']:.1f}pt"
             )
         else:
             st.metric(
-                label=f"📈 5月→7月 最高改善",
+                label=f"📈 {period_label} 最高改善",
                 value="データなし"
             )
 
 
-def create_monthly_comparison_table(monthly_data, data_type, process_type=None):
+@profiled
+def create_monthly_comparison_table(monthly_data, data_type, process_type=None, baseline=None, comparison=None):
     """月別比較表を作成"""
     if data_type == 'challenges':
         if process_type == 'upstream':
@@ -721,8 +602,11 @@ def create_monthly_comparison_table(monthly_data, data_type, process_type=None):
     if not all_items:
         return None
     
-    # 月別比較表を作成
-    months = ['2025年5月', '2025年6月', '2025年7月']
+    # 月別比較表を作成（比較期間の指定がない場合は最初と最後の月を比較）
+    months = list(comparison_data.keys())
+    baseline = baseline or months[0]
+    comparison = comparison or months[-1]
+    change_column = f"{format_period_range(baseline, comparison)}の変化"
     result_data = []
     
     for item in sorted(all_items):
@@ -733,18 +617,18 @@ def create_monthly_comparison_table(monthly_data, data_type, process_type=None):
             else:
                 row[month] = 0
         
-        # 5月→7月の変化を計算
-        may_count = row['2025年5月']
-        july_count = row['2025年7月']
+        # 比較元→比較先の変化を計算
+        baseline_count = row.get(baseline, 0)
+        comparison_count = row.get(comparison, 0)
         
-        if may_count == 0 and july_count == 0:
+        if baseline_count == 0 and comparison_count == 0:
             change = "変化なし"
-        elif may_count == 0:
-            change = f"新規 (+{july_count})"
-        elif july_count == 0:
-            change = f"解消 (-{may_count})"
+        elif baseline_count == 0:
+            change = f"新規 (+{comparison_count})"
+        elif comparison_count == 0:
+            change = f"解消 (-{baseline_count})"
         else:
-            diff = july_count - may_count
+            diff = comparison_count - baseline_count
             if diff > 0:
                 change = f"増加 (+{diff})"
             elif diff < 0:
@@ -752,15 +636,15 @@ def create_monthly_comparison_table(monthly_data, data_type, process_type=None):
             else:
                 change = "変化なし"
         
-        row['5月→7月の変化'] = change
+        row[change_column] = change
         result_data.append(row)
     
     if not result_data:
         return None
     
-    # DataFrameを作成して7月の件数で降順ソート
+    # DataFrameを作成して比較先の月の件数で降順ソート
     df = pd.DataFrame(result_data)
-    df = df.sort_values('2025年7月', ascending=False)
+    df = df.sort_values(comparison, ascending=False)
     
     return df
 
@@ -779,11 +663,57 @@ def style_change_column(df):
         else:
             return 'color: #7f7f7f'  # グレー
     
-    # スタイルを適用
-    styled = df.style.map(color_change, subset=['5月→7月の変化'])
+    # スタイルを適用（変化列は比較期間によって列名が変わる）
+    change_columns = [col for col in df.columns if str(col).endswith('の変化')]
+    styled = df.style.map(color_change, subset=change_columns)
     return styled
 
 
+@profiled
+def create_monthly_counts_chart(df):
+    """月別・チーム別の回答数グラフを作成"""
+    monthly_counts = df.groupby(['年月', 'あなたが所属するチームはどちらですか？'], observed=True).size().reset_index(name='回答数')
+    
+    return px.bar(
+        monthly_counts,
+        x='年月',
+        y='回答数',
+        color='あなたが所属するチームはどちらですか？',
+        title="月別回答数",
+        barmode='group'
+    )
+
+
+def render_diagnostics_panel(model):
+    """読み込み・集計の処理ステージごとの計測結果を表示（URLに ?diagnostics=1 を付けた場合のみ）"""
+    if st.query_params.get('diagnostics') != '1' or model.instrumentation is None:
+        return
+    
+    recorder = model.instrumentation
+    with st.sidebar.expander("🩺 診断情報", expanded=False):
+        records = recorder.latest()
+        if not records:
+            st.caption("計測結果はまだありません")
+            return
+        
+        stages = pd.DataFrame(records).set_index('stage')
+        stages['peak_rss_mb'] = stages['peak_rss_bytes'] / (1024 * 1024)
+        st.dataframe(
+            stages[['wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rows', 'started_at']],
+            use_container_width=True
+        )
+        st.caption("セクションの集計は初回参照時に行われるため、未表示のタブの処理は記録されません")
+        st.download_button(
+            "JSONで保存", recorder.to_json(),
+            file_name="survey_stage_metrics.json", mime="application/json"
+        )
+        st.download_button(
+            "Prometheus形式で保存", recorder.to_prometheus(),
+            file_name="survey_stage_metrics.prom", mime="text/plain"
+        )
+
+
+@profiled
 def create_wordcloud(text_list):
     """ワードクラウドを作成"""
     if not text_list:
@@ -819,6 +749,19 @@ def create_wordcloud(text_list):
 
 
 def main():
+    # ?profile=1 の場合はセクション・図ごとの処理時間を計測してサイドバーに表示
+    profiler = start_render_profiler()
+    try:
+        render_dashboard()
+    finally:
+        if profiler is not None:
+            profiler.finish()
+    if profiler is not None:
+        profiler.render_sidebar()
+
+
+def render_dashboard():
+    profile_section("ページ設定")
     # カスタムCSSで最大幅を拡張
     st.markdown("""
     <style>
@@ -835,12 +778,6 @@ def main():
         width: 100%;
     }
     
-    /* タブコンテンツの幅を最大化 */
-    .stTabs [data-baseweb="tab-panel"] {
-        padding-right: 1rem;
-        padding-left: 1rem;
-    }
-    
     /* サイドバーのデフォルト幅を狭める */
     section[data-testid="stSidebar"] {
         width: 280px !important;
@@ -849,20 +786,29 @@ def main():
     """, unsafe_allow_html=True)
     
     st.title("🤖 AI活用状況分析ダッシュボード")
-    st.markdown("### 3ヶ月間のAIツール利用傾向と効果分析")
     
     # データ読み込み
+    profile_section("データ読み込み")
     with st.spinner('データを読み込んでいます...'):
-        df, processed_data = load_and_process_data()
+        model, is_stale = load_survey_model()
+    df = model.df
+    processed_data = model.processed_data
+    if is_stale:
+        st.info("🔄 新しいデータを集計中です。完了するまで前回のデータを表示しています（ページを再読み込みすると反映されます）。")
+    
+    # 年月はデータから日付順に取得
+    available_months = processed_data['periods']
+    st.markdown(f"### {len(available_months)}ヶ月間のAIツール利用傾向と効果分析")
     
     # サイドバー - 調査情報パネル
+    profile_section("サイドバー")
     st.sidebar.header("📊 調査情報")
     
     # 基本情報
-    available_months = sorted(df['年月'].unique())
     total_responses = len(df)
-    eng_responses = len(df[df['あなたが所属するチームはどちらですか？'] == 'エンジニアリングチーム'])
-    dir_responses = len(df[df['あなたが所属するチームはどちらですか？'] == 'ディレクターチーム'])
+    team_counts = model.memoize('team_counts', lambda: df['あなたが所属するチームはどちらですか？'].value_counts())
+    eng_responses = int(team_counts.get('エンジニアリングチーム', 0))
+    dir_responses = int(team_counts.get('ディレクターチーム', 0))
     
     st.sidebar.markdown(f"""
     **調査期間**: {available_months[0]} 〜 {available_months[-1]}
@@ -878,6 +824,26 @@ def main():
     
     st.sidebar.markdown("---")
     
+    # 比較期間の選択（初期値は最初の月と最新の月）
+    st.sidebar.subheader("📅 比較期間")
+    baseline_month = st.sidebar.selectbox(
+        "比較元（基準月）",
+        available_months,
+        index=0,
+        key="baseline_month"
+    )
+    comparison_month = st.sidebar.selectbox(
+        "比較先",
+        available_months,
+        index=len(available_months) - 1,
+        key="comparison_month"
+    )
+    period_label = format_period_range(baseline_month, comparison_month)
+    target_months = select_periods(available_months, baseline_month, comparison_month)
+    target_period_label = format_period_range(target_months[0], target_months[-1], '〜')
+    
+    st.sidebar.markdown("---")
+    
     # データ更新情報
     st.sidebar.subheader("📈 データ情報")
     st.sidebar.markdown(f"""
@@ -940,12 +906,23 @@ def main():
     - 事例から具体的な使い方を学習
     """)
     
+    render_diagnostics_panel(model)
+    
     # メインコンテンツ
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "📊 概要", "📈 利用頻度・生産性分析", "⏱️ 時間削減効果", "📝 課題・フィードバック"
-    ])
+    # 表示中のタブの内容のみを計算・描画する。st.tabs は選択中のタブをブラウザ側でのみ切り替え、
+    # スクリプトからは選択中のタブを取得できないため、再実行のたびに全タブの内容を計算・描画してしまう。
+    # そのため、選択状態をセッションに保持できる横並びのラジオボタンをタブとして使う
+    tab_labels = ["📊 概要", "📈 利用頻度・生産性分析", "⏱️ 時間削減効果", "📝 課題・フィードバック"]
+    active_tab = st.radio(
+        "表示するタブ",
+        tab_labels,
+        horizontal=True,
+        key="active_tab",
+        label_visibility="collapsed"
+    )
+    profile_section(active_tab)
     
-    with tab1:
+    if active_tab == tab_labels[0]:
         st.header("概要")
         
         # 調査概要
@@ -1043,31 +1020,23 @@ def main():
             st.metric("総回答数", len(df))
         
         with col2:
-            eng_count = len(df[df['あなたが所属するチームはどちらですか？'] == 'エンジニアリングチーム'])
-            st.metric("エンジニアリング", eng_count)
+            st.metric("エンジニアリング", eng_responses)
         
         with col3:
-            dir_count = len(df[df['あなたが所属するチームはどちらですか？'] == 'ディレクターチーム'])
-            st.metric("ディレクター", dir_count)
+            st.metric("ディレクター", dir_responses)
         
         with col4:
             st.metric("調査期間", f"{len(available_months)}ヶ月")
         
         # 回答数の推移
         st.subheader("月別回答数の推移")
-        monthly_counts = df.groupby(['年月', 'あなたが所属するチームはどちらですか？']).size().reset_index(name='回答数')
-        
-        fig = px.bar(
-            monthly_counts,
-            x='年月',
-            y='回答数',
-            color='あなたが所属するチームはどちらですか？',
-            title="月別回答数",
-            barmode='group'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = model.memoize('monthly_counts_chart', lambda: create_monthly_counts_chart(df))
+        plotly_chart(fig, use_container_width=True)
     
-    with tab2:
+    elif active_tab == tab_labels[1]:
+        likert_cubes = processed_data['likert_cubes']
+        period_metrics = model.period_metrics(baseline_month, comparison_month)
+        
         st.header("利用頻度・生産性分析")
         
         # 上流工程のセクション
@@ -1087,20 +1056,15 @@ def main():
             
             if 'upstream_frequency' in processed_data:
                 # 指標カードを表示
-                upstream_metrics = calculate_tool_metrics(
-                    processed_data['upstream_frequency'], 
-                    processed_data.get('upstream_contribution', {}), 
-                    'upstream'
-                )
-                create_metrics_cards(upstream_metrics, "上流工程")
+                create_metrics_cards(period_metrics['upstream_tool'], "上流工程", period_label)
             
             st.markdown("---")  # 区切り線
-            fig = create_frequency_heatmap(
-                processed_data['upstream_frequency'],
+            fig = model.memoize(('frequency_heatmap', 'upstream'), lambda: create_frequency_heatmap(
+                likert_cubes['upstream_frequency'],
                 "AIツール利用頻度",
                 'upstream'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            ))
+            plotly_chart(fig, use_container_width=True)
             
             # 時系列推移
             st.markdown("### 利用頻度の推移")
@@ -1121,13 +1085,13 @@ def main():
             **計算方法:** 各月のディレクターチームの回答者の平均スコアを表示。高いほど頻繁に利用されていることを示す。
             """)
             
-            fig = create_time_series_chart(
+            fig = model.memoize(('time_series_chart', 'frequency', 'upstream'), lambda: create_time_series_chart(
                 processed_data['upstream_frequency'],
                 "利用頻度の推移",
                 'frequency',
                 'upstream'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            ))
+            plotly_chart(fig, use_container_width=True)
             
             # 貢献度の推移
             st.markdown("### 生産性への貢献度の推移")
@@ -1150,20 +1114,20 @@ def main():
             """)
             
             if 'upstream_contribution' in processed_data:
-                fig = create_time_series_chart(
+                fig = model.memoize(('time_series_chart', 'contribution', 'upstream'), lambda: create_time_series_chart(
                     processed_data['upstream_contribution'],
                     "貢献度の推移",
                     'contribution',
                     'upstream'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                ))
+                plotly_chart(fig, use_container_width=True)
             
             # 利用頻度×貢献度の組み合わせ
             st.markdown("### 利用頻度×生産性貢献度")
             
             # 説明文を追加
-            st.markdown("""
-            **計算方法:** 5月から7月の各ツールの利用頻度平均と貢献度平均を掛け合わせたスコア。
+            st.markdown(f"""
+            **計算方法:** {target_period_label}の各ツールの利用頻度平均と貢献度平均を掛け合わせたスコア。
             
             **意味:** 高いスコアは「頻繁に使われており、かつ生産性向上に貢献している」ツールであることを示し、実際の業務インパクトが高いツールを特定できます。
             
@@ -1172,13 +1136,19 @@ def main():
             
             if 'upstream_frequency' in processed_data and 'upstream_contribution' in processed_data:
                 try:
-                    fig = create_frequency_contribution_heatmap(
-                        processed_data['upstream_frequency'],
-                        processed_data['upstream_contribution'],
-                        "利用頻度×貢献度組み合わせ",
-                        'upstream'
+                    fig = model.memoize(
+                        ('frequency_contribution_heatmap', 'upstream', tuple(target_months)),
+                        lambda: create_frequency_contribution_heatmap(
+                            likert_cubes['upstream_frequency'],
+                            likert_cubes['upstream_contribution'],
+                            "利用頻度×貢献度組み合わせ",
+                            'upstream',
+                            target_months
+                        )
                     )
-                    st.plotly_chart(fig, use_container_width=True)
+                    if not has_heatmap_scores(fig):
+                        st.warning("⚠️ upstream工程のヒートマップデータが不足しています。利用頻度または貢献度のデータを確認してください。")
+                    plotly_chart(fig, use_container_width=True)
                 except Exception as e:
                     st.error(f"上流工程のヒートマップ表示エラー: {e}")
             else:
@@ -1188,50 +1158,8 @@ def main():
             st.markdown("#### ツール別クロス集計表")
             st.markdown("利用頻度と生産性貢献度の詳細な関係を確認できます。")
             
-            # ツール選択
-            selected_tool = st.selectbox(
-                "詳細を確認するツールを選択",
-                UPSTREAM_TOOLS,
-                key="upstream_tool_select"
-            )
-            
-            if selected_tool:
-                cross_table = create_frequency_contribution_cross_table(
-                    processed_data['upstream_frequency'],
-                    processed_data['upstream_contribution'],
-                    selected_tool,
-                    'upstream'
-                )
-                
-                if cross_table is not None:
-                    st.markdown(f"**{get_display_name(selected_tool)}の利用頻度×生産性貢献度クロス集計**")
-                    st.dataframe(cross_table, use_container_width=True)
-                    
-                    # 合計行・列を除いたヒートマップ
-                    heatmap_data = cross_table.iloc[:-1, :-1]  # 合計行・列を除外
-                    if not heatmap_data.empty:
-                        fig_cross = go.Figure(data=go.Heatmap(
-                            z=heatmap_data.values,
-                            x=heatmap_data.columns,
-                            y=heatmap_data.index,
-                            colorscale='Blues',
-                            text=heatmap_data.values,
-                            texttemplate='%{text}',
-                            textfont={"size": 12},
-                            colorbar=dict(title="回答数")
-                        ))
-                        
-                        fig_cross.update_layout(
-                            title=f"{get_display_name(selected_tool)} 利用頻度×貢献度",
-                            xaxis_title="生産性貢献度",
-                            yaxis_title="利用頻度",
-                            height=400,
-                            xaxis={'tickangle': -45}
-                        )
-                        
-                        st.plotly_chart(fig_cross, use_container_width=True)
-                else:
-                    st.info(f"{get_display_name(selected_tool)}のデータが不足しています。")
+            # ツール選択（選択を変更した場合はこのパネルのみを再実行）
+            render_cross_table_panel(model, 'upstream', UPSTREAM_TOOLS, "upstream_tool_select")
             
         
         # 開発工程のセクション
@@ -1250,20 +1178,15 @@ def main():
         with st.container():
             if 'development_frequency' in processed_data:
                 # 指標カードを表示
-                development_metrics = calculate_tool_metrics(
-                    processed_data['development_frequency'], 
-                    processed_data.get('development_contribution', {}), 
-                    'development'
-                )
-                create_metrics_cards(development_metrics, "開発工程")
+                create_metrics_cards(period_metrics['development_tool'], "開発工程", period_label)
             
                 st.markdown("---")  # 区切り線
-                fig = create_frequency_heatmap(
-                    processed_data['development_frequency'],
+                fig = model.memoize(('frequency_heatmap', 'development'), lambda: create_frequency_heatmap(
+                    likert_cubes['development_frequency'],
                     "AIツール利用頻度",
                     'development'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                ))
+                plotly_chart(fig, use_container_width=True)
             
                 # 時系列推移
                 st.markdown("### 利用頻度の推移")
@@ -1284,13 +1207,13 @@ def main():
                 **計算方法:** 各月のエンジニアリングチームの回答者の平均スコアを表示。高いほど頻繁に利用されていることを示す。
                 """)
                 
-                fig = create_time_series_chart(
+                fig = model.memoize(('time_series_chart', 'frequency', 'development'), lambda: create_time_series_chart(
                     processed_data['development_frequency'],
                     "利用頻度の推移",
                     'frequency',
                     'development'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                ))
+                plotly_chart(fig, use_container_width=True)
             
                 # 貢献度の推移
                 st.markdown("### 生産性への貢献度の推移")
@@ -1313,20 +1236,20 @@ def main():
                 """)
                 
                 if 'development_contribution' in processed_data:
-                    fig = create_time_series_chart(
+                    fig = model.memoize(('time_series_chart', 'contribution', 'development'), lambda: create_time_series_chart(
                         processed_data['development_contribution'],
                         "貢献度の推移",
                         'contribution',
                         'development'
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    ))
+                    plotly_chart(fig, use_container_width=True)
             
                 # 利用頻度×貢献度の組み合わせ
                 st.markdown("### 利用頻度×生産性貢献度")
                 
                 # 説明文を追加
-                st.markdown("""
-                **計算方法:** 5月から7月の各ツールの利用頻度平均と貢献度平均を掛け合わせたスコア。
+                st.markdown(f"""
+                **計算方法:** {target_period_label}の各ツールの利用頻度平均と貢献度平均を掛け合わせたスコア。
                 
                 **意味:** 高いスコアは「頻繁に使われており、かつ生産性向上に貢献している」ツールであることを示し、実際の業務インパクトが高いツールを特定できます。
                 
@@ -1335,13 +1258,19 @@ def main():
                 
                 if 'development_frequency' in processed_data and 'development_contribution' in processed_data:
                     try:
-                        fig = create_frequency_contribution_heatmap(
-                            processed_data['development_frequency'],
-                            processed_data['development_contribution'],
-                            "利用頻度×貢献度組み合わせ",
-                            'development'
+                        fig = model.memoize(
+                            ('frequency_contribution_heatmap', 'development', tuple(target_months)),
+                            lambda: create_frequency_contribution_heatmap(
+                                likert_cubes['development_frequency'],
+                                likert_cubes['development_contribution'],
+                                "利用頻度×貢献度組み合わせ",
+                                'development',
+                                target_months
+                            )
                         )
-                        st.plotly_chart(fig, use_container_width=True)
+                        if not has_heatmap_scores(fig):
+                            st.warning("⚠️ development工程のヒートマップデータが不足しています。利用頻度または貢献度のデータを確認してください。")
+                        plotly_chart(fig, use_container_width=True)
                     except Exception as e:
                         st.error(f"開発工程のヒートマップ表示エラー: {e}")
                 else:
@@ -1351,53 +1280,13 @@ def main():
                 st.markdown("#### ツール別クロス集計表")
                 st.markdown("利用頻度と生産性貢献度の詳細な関係を確認できます。")
                 
-                # ツール選択
-                selected_dev_tool = st.selectbox(
-                    "詳細を確認するツールを選択",
-                    DEVELOPMENT_TOOLS,
-                    key="development_tool_select"
-                )
-                
-                if selected_dev_tool:
-                    cross_table = create_frequency_contribution_cross_table(
-                        processed_data['development_frequency'],
-                        processed_data['development_contribution'],
-                        selected_dev_tool,
-                        'development'
-                    )
-                    
-                    if cross_table is not None:
-                        st.markdown(f"**{get_display_name(selected_dev_tool)}の利用頻度×生産性貢献度クロス集計**")
-                        st.dataframe(cross_table, use_container_width=True)
-                        
-                        # 合計行・列を除いたヒートマップ
-                        heatmap_data = cross_table.iloc[:-1, :-1]  # 合計行・列を除外
-                        if not heatmap_data.empty:
-                            fig_cross = go.Figure(data=go.Heatmap(
-                                z=heatmap_data.values,
-                                x=heatmap_data.columns,
-                                y=heatmap_data.index,
-                                colorscale='Blues',
-                                text=heatmap_data.values,
-                                texttemplate='%{text}',
-                                textfont={"size": 12},
-                                colorbar=dict(title="回答数")
-                            ))
-                            
-                            fig_cross.update_layout(
-                                title=f"{get_display_name(selected_dev_tool)} 利用頻度×貢献度",
-                                xaxis_title="生産性貢献度",
-                                yaxis_title="利用頻度",
-                                height=400,
-                                xaxis={'tickangle': -45}
-                            )
-                            
-                            st.plotly_chart(fig_cross, use_container_width=True)
-                    else:
-                        st.info(f"{get_display_name(selected_dev_tool)}のデータが不足しています。")
+                # ツール選択（選択を変更した場合はこのパネルのみを再実行）
+                render_cross_table_panel(model, 'development', DEVELOPMENT_TOOLS, "development_tool_select")
             
     
-    with tab3:
+    elif active_tab == tab_labels[2]:
+        period_metrics = model.period_metrics(baseline_month, comparison_month)
+        
         st.header("時間・労力削減効果")
         
         # 上流工程のタイトル
@@ -1414,31 +1303,30 @@ def main():
         """, unsafe_allow_html=True)
         if 'upstream_time_reduction' in processed_data:
             # 指標カードを表示
-            upstream_time_metrics = calculate_time_reduction_metrics(processed_data['upstream_time_reduction'], 'upstream')
-            create_time_reduction_metrics_cards(upstream_time_metrics, "上流工程")
+            create_time_reduction_metrics_cards(period_metrics['upstream_time'], "上流工程", period_label)
             
             st.markdown("---")  # 区切り線
             
             # 平均削減率（棒グラフ）
-            fig = create_time_reduction_chart(
+            fig = model.memoize(('time_reduction_chart', 'upstream'), lambda: create_time_reduction_chart(
                 processed_data['upstream_time_reduction'],
                 "作業別時間削減率（上流工程・平均値）"
-            )
+            ))
             if fig:
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
             
             # 推移グラフ
-            fig_trend = create_time_reduction_trend_chart(
+            fig_trend = model.memoize(('time_reduction_trend_chart', 'upstream'), lambda: create_time_reduction_trend_chart(
                 processed_data['upstream_time_reduction'],
-                "時間削減効果の推移（上流工程・5月〜7月）",
+                f"時間削減効果の推移（上流工程・{format_period_range(available_months[0], available_months[-1], '〜')}）",
                 'upstream'
-            )
+            ))
             if fig_trend:
-                st.plotly_chart(fig_trend, use_container_width=True)
+                plotly_chart(fig_trend, use_container_width=True)
             
             # 具体的な事例
             st.markdown("### 具体的な削減効果事例")
-            examples = get_time_reduction_examples(df, 'upstream')
+            examples = get_time_reduction_examples(model.text_store, 'upstream', limit=5)
             if examples:
                 st.markdown("**上流工程でAIツールを活用して効果を実感した具体的なエピソード:**")
                 
@@ -1484,31 +1372,30 @@ def main():
         """, unsafe_allow_html=True)
         if 'development_time_reduction' in processed_data:
             # 指標カードを表示
-            development_time_metrics = calculate_time_reduction_metrics(processed_data['development_time_reduction'], 'development')
-            create_time_reduction_metrics_cards(development_time_metrics, "開発工程")
+            create_time_reduction_metrics_cards(period_metrics['development_time'], "開発工程", period_label)
             
             st.markdown("---")  # 区切り線
             
             # 平均削減率（棒グラフ）
-            fig = create_time_reduction_chart(
+            fig = model.memoize(('time_reduction_chart', 'development'), lambda: create_time_reduction_chart(
                 processed_data['development_time_reduction'],
                 "作業別時間削減率（開発工程・平均値）"
-            )
+            ))
             if fig:
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
             
             # 推移グラフ
-            fig_trend = create_time_reduction_trend_chart(
+            fig_trend = model.memoize(('time_reduction_trend_chart', 'development'), lambda: create_time_reduction_trend_chart(
                 processed_data['development_time_reduction'],
-                "時間削減効果の推移（開発工程・5月〜7月）",
+                f"時間削減効果の推移（開発工程・{format_period_range(available_months[0], available_months[-1], '〜')}）",
                 'development'
-            )
+            ))
             if fig_trend:
-                st.plotly_chart(fig_trend, use_container_width=True)
+                plotly_chart(fig_trend, use_container_width=True)
             
             # 具体的な事例
             st.markdown("### 具体的な削減効果事例")
-            examples = get_time_reduction_examples(df, 'development')
+            examples = get_time_reduction_examples(model.text_store, 'development', limit=5)
             if examples:
                 st.markdown("**開発工程でAIツールを活用した具体的な作業内容と削減効果:**")
                 
@@ -1540,7 +1427,7 @@ def main():
             else:
                 st.info("具体的な事例が記載されていません。")
     
-    with tab4:
+    elif active_tab == tab_labels[3]:
         st.header("課題とフィードバック")
         
         # 上流工程の課題
@@ -1560,7 +1447,12 @@ def main():
             monthly_challenges = processed_data['monthly_challenges']
             
             # 月別変化表を作成
-            upstream_table = create_monthly_comparison_table(monthly_challenges, 'challenges', 'upstream')
+            upstream_table = model.memoize(
+                ('monthly_comparison_table', 'challenges', 'upstream', baseline_month, comparison_month),
+                lambda: create_monthly_comparison_table(
+                    monthly_challenges, 'challenges', 'upstream', baseline_month, comparison_month
+                )
+            )
             if upstream_table is not None and not upstream_table.empty:
                 st.markdown("**上流工程の課題（月別変化表）:**")
                 styled_table = style_change_column(upstream_table)
@@ -1587,7 +1479,12 @@ def main():
             monthly_challenges = processed_data['monthly_challenges']
             
             # 月別変化表を作成
-            development_table = create_monthly_comparison_table(monthly_challenges, 'challenges', 'development')
+            development_table = model.memoize(
+                ('monthly_comparison_table', 'challenges', 'development', baseline_month, comparison_month),
+                lambda: create_monthly_comparison_table(
+                    monthly_challenges, 'challenges', 'development', baseline_month, comparison_month
+                )
+            )
             if development_table is not None and not development_table.empty:
                 st.markdown("**開発工程の課題（月別変化表）:**")
                 styled_table = style_change_column(development_table)
@@ -1614,7 +1511,12 @@ def main():
             monthly_training_needs = processed_data['monthly_training_needs']
             
             # 月別変化表を作成
-            training_table = create_monthly_comparison_table(monthly_training_needs, 'training')
+            training_table = model.memoize(
+                ('monthly_comparison_table', 'training', baseline_month, comparison_month),
+                lambda: create_monthly_comparison_table(
+                    monthly_training_needs, 'training', baseline=baseline_month, comparison=comparison_month
+                )
+            )
             if training_table is not None and not training_table.empty:
                 st.markdown("**トレーニング・学習ニーズ（月別変化表）:**")
                 styled_table = style_change_column(training_table)
@@ -0,0 +1,80 @@
+"""
+ダッシュボード用の事前計算スナップショット
+
+読み込み済みのデータ・集計結果・比較期間ごとのサマリー指標を1つのファイルにまとめて保存する。
+ダッシュボードは元データの内容ハッシュが一致する場合にこのファイルを読み込み、起動時の集計を省略する。
+
+使い方（デプロイ前に実行）:
+    python src/dashboard_snapshot.py
+"""
+
+import os
+import pickle
+import uuid
+from datetime import datetime
+
+from config import *
+from data_processor import AIUsageSurveyProcessor
+from survey_metrics import compute_period_metrics
+
+# スナップショットの形式を変更した場合はこの値を上げる（古いスナップショットは読み込まない）
+SNAPSHOT_FORMAT_VERSION = 5
+
+
+def build_snapshot(data_path=DATA_PATH, path=SNAPSHOT_PATH):
+    """全ての処理を実行し、ダッシュボードが必要とする状態をスナップショットとして保存"""
+    processor = AIUsageSurveyProcessor(data_path)
+    processed_data = processor.process_all()
+    
+    # 比較元・比較先のすべての組み合わせについてサマリー指標を事前計算
+    periods = processed_data['periods']
+    processed_data['period_metrics'] = {
+        (baseline, comparison): compute_period_metrics(processed_data['likert_cubes'], baseline, comparison)
+        for baseline in periods
+        for comparison in periods
+    }
+    
+    bundle = {
+        'version': SNAPSHOT_FORMAT_VERSION,
+        'source_hash': processor.source_hash,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'df': processor.df,
+        'processed_data': processed_data,
+    }
+    
+    # 一時ファイルに書き出してから置き換え、途中状態を読まれないようにする
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    return bundle
+
+
+def load_snapshot(source_hash, path=SNAPSHOT_PATH):
+    """元データのハッシュが一致するスナップショットを読み込む（存在しない・古い場合はNone）"""
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        with open(path, 'rb') as f:
+            bundle = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # 破損したスナップショットや、モジュール構成が変わった古いスナップショットは無視する
+        return None
+    
+    if bundle.get('version') != SNAPSHOT_FORMAT_VERSION or bundle.get('source_hash') != source_hash:
+        return None
+    return bundle
+
+
+if __name__ == "__main__":
+    bundle = build_snapshot()
+    print(f"スナップショットを作成しました: {SNAPSHOT_PATH}")
+    print(f"  回答数: {len(bundle['df'])}件 / 対象期間: {len(bundle['processed_data']['periods'])}ヶ月")
+    print(f"  ファイルサイズ: {os.path.getsize(SNAPSHOT_PATH) / 1024:.0f}KB")
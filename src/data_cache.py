@@ -0,0 +1,197 @@
+"""
+解析済みアンケートデータの列指向キャッシュ
+
+TSVの内容ハッシュをキーとして、型変換済みのDataFrameを列ごとの .npy ファイルに保存する。
+キャッシュヒット時は各列をメモリマップで読み込むため、TSVの再解析や日時変換を行わない。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import *
+
+# キャッシュ形式を変更した場合はこの値を上げる（古いキャッシュは自動的に無効になる）
+CACHE_FORMAT_VERSION = 5
+
+META_FILENAME = 'meta.json'
+
+
+def compute_file_hash(path, chunk_size=1 << 20):
+    """ファイル内容のSHA-256ハッシュを計算"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_appended(path, byte_offset, prefix_hash, chunk_size=1 << 20):
+    """先頭 byte_offset バイトの内容ハッシュが prefix_hash と一致すれば、(ヘッダー行, 追記分, ファイル全体のハッシュ) を返す
+
+    先頭の範囲が変更されている（ファイルが短くなった場合を含む）場合はNoneを返す。
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0)
+
+        remaining = byte_offset
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return None
+            digest.update(chunk)
+            remaining -= len(chunk)
+        if digest.hexdigest() != prefix_hash:
+            return None
+
+        appended = f.read()
+
+    digest.update(appended)
+    return header, appended, digest.hexdigest()
+
+
+def compute_sources_hash(paths):
+    """複数ファイルの内容とファイル名から1つのハッシュを計算（単一ファイルの場合はその内容ハッシュ）"""
+    if len(paths) == 1:
+        return compute_file_hash(paths[0])
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(compute_file_hash(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def get_sources_version(paths):
+    """ファイルの更新日時とサイズから、内容を読まずに求めるデータのバージョン"""
+    version = []
+    for path in paths:
+        stat = os.stat(path)
+        version.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(version)
+
+def write_frame(df, frame_dir):
+    """DataFrameを列ごとの .npy ファイルとして保存"""
+    os.makedirs(frame_dir, exist_ok=True)
+    columns = []
+
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        filename = f'col_{i}.npy'
+        entry = {'name': col, 'file': filename}
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # カテゴリ列はコードとカテゴリ一覧を保存
+            entry['kind'] = 'category'
+            entry['categories'] = series.cat.categories.tolist()
+            entry['ordered'] = bool(series.cat.ordered)
+            values = series.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_dtype(series.dtype):
+            # 日時列は int64 のナノ秒表現で保存
+            entry['kind'] = 'datetime'
+            entry['dtype'] = str(series.dtype)
+            values = series.to_numpy().view('i8')
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+            entry['kind'] = 'numeric'
+            values = series.to_numpy()
+        else:
+            # 文字列列は辞書符号化（欠損は -1）して保存
+            entry['kind'] = 'object'
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            entry['categories'] = uniques.tolist()
+            values = codes
+
+        np.save(os.path.join(frame_dir, filename), values, allow_pickle=False)
+        columns.append(entry)
+
+    return columns
+
+
+def read_frame(frame_dir, columns):
+    """列ごとの .npy ファイルをメモリマップで読み込み、DataFrameを復元"""
+    data = {}
+    for entry in columns:
+        values = np.load(os.path.join(frame_dir, entry['file']), mmap_mode='r', allow_pickle=False)
+        kind = entry['kind']
+
+        if kind == 'category':
+            data[entry['name']] = pd.Categorical.from_codes(
+                values, categories=entry['categories'], ordered=entry['ordered']
+            )
+        elif kind == 'datetime':
+            data[entry['name']] = values.view(entry['dtype'])
+        elif kind == 'numeric':
+            data[entry['name']] = values
+        else:
+            # 末尾にNaNを追加し、コード -1 が欠損値を指すようにする
+            lookup = np.empty(len(entry['categories']) + 1, dtype=object)
+            lookup[:-1] = entry['categories']
+            lookup[-1] = np.nan
+            data[entry['name']] = lookup[values]
+
+    return pd.DataFrame(data, columns=[entry['name'] for entry in columns], copy=False)
+
+
+class SurveyDataCache:
+    """内容ハッシュをキーとする解析済みDataFrameのキャッシュ"""
+
+    def __init__(self, cache_dir=CACHE_PATH):
+        self.cache_dir = cache_dir
+
+    def _entry_dir(self, source_hash):
+        return os.path.join(self.cache_dir, source_hash)
+
+    def load(self, source_hash):
+        """キャッシュ済みのDataFrameを読み込む（存在しない・無効な場合はNone）"""
+        entry_dir = self._entry_dir(source_hash)
+        meta_path = os.path.join(entry_dir, META_FILENAME)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != CACHE_FORMAT_VERSION or meta.get('source_hash') != source_hash:
+                return None
+            return read_frame(entry_dir, meta['columns'])
+        except (OSError, ValueError, KeyError):
+            # 破損したキャッシュは無視して再構築させる
+            return None
+
+    def store(self, source_hash, df):
+        """DataFrameをキャッシュに保存し、古いキャッシュを削除"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # 一時ディレクトリに書き出してから置き換え、途中状態を読まれないようにする
+        tmp_dir = os.path.join(self.cache_dir, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            columns = write_frame(df, tmp_dir)
+            meta = {
+                'version': CACHE_FORMAT_VERSION,
+                'source_hash': source_hash,
+                'rows': len(df),
+                'columns': columns,
+            }
+            with open(os.path.join(tmp_dir, META_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            entry_dir = self._entry_dir(source_hash)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._prune(keep=source_hash)
+
+    def _prune(self, keep):
+        """指定したハッシュ以外のキャッシュを削除"""
+        for name in os.listdir(self.cache_dir):
+            # 書き込み中の一時ディレクトリは残す
+            if name != keep and not name.startswith('.'):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
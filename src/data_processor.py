@@ -4,281 +4,973 @@ AI活用アンケートデータの処理・集計モジュール
 
 import pandas as pd
 import numpy as np
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import glob
+import hashlib
+import io
 import os
+import sqlite3
+import threading
 from config import *
+from aggregate_store import AggregateStore
+from data_cache import SurveyDataCache, compute_sources_hash
+from free_text_store import FREE_TEXT_SECTIONS, FreeTextStore, free_text_positions, read_header
+from incremental_state import IncrementalState
+from instrumentation import StageRecorder
+from shard_aggregation import ShardedAggregation
+from stage_scheduler import run_stages
+from survey_cube import CrossTabCube, LikertCube, encode_count_index, sort_periods
+from survey_schema import SurveySchema, align_columns
+from timestamp_parser import (
+    DAY_MONTH_SWAPS, DERIVED_TIME_COLUMNS, TimestampReport, add_day_month_evidence, day_month_decision,
+    parse_survey_timestamps,
+)
+
+# リッカート尺度の設問とスコアのマッピング（設問文・項目は config.py の QUESTIONS / QUESTION_ITEMS）
+LIKERT_SECTIONS = {
+    'upstream_frequency': FREQUENCY_MAP,
+    'development_frequency': FREQUENCY_MAP,
+    'upstream_contribution': CONTRIBUTION_MAP,
+    'development_contribution': CONTRIBUTION_MAP,
+    'upstream_time_reduction': TIME_REDUCTION_MAP,
+    'development_time_reduction': TIME_REDUCTION_MAP,
+}
+
+# 利用頻度×貢献度のクロス集計を作成する工程と、(行の設問, 列の設問)
+CROSS_TAB_SECTIONS = {
+    'upstream': ('upstream_frequency', 'upstream_contribution'),
+    'development': ('development_frequency', 'development_contribution'),
+}
+
+# 複数選択の設問
+MULTISELECT_SECTIONS = ['upstream_challenges', 'development_challenges', 'training_needs']
+
+# 自由記述のフィードバックの設問
+FEEDBACK_SECTIONS = ['upstream_episodes', 'general_feedback']
+
+# ストリーミング処理（load_streaming）で一度に読み込む行数
+STREAM_CHUNK_ROWS = 50_000
+
+# processed_data のキーと、そのキーを設定する処理（LazyProcessedData が参照時に呼び出す）
+SECTION_STEPS = {
+    'schema': 'get_schema',
+    'periods': 'discover_periods',
+    'likert_cubes': 'build_likert_cubes',
+    'upstream_frequency': 'process_frequency_data',
+    'development_frequency': 'process_frequency_data',
+    'upstream_contribution': 'process_contribution_data',
+    'development_contribution': 'process_contribution_data',
+    'upstream_time_reduction': 'process_time_reduction_data',
+    'development_time_reduction': 'process_time_reduction_data',
+    'cross_tables': 'process_cross_tables',
+    'upstream_challenges': 'process_challenges',
+    'development_challenges': 'process_challenges',
+    'monthly_challenges': 'process_challenges',
+    'training_needs': 'process_training_needs',
+    'monthly_training_needs': 'process_training_needs',
+    'feedback': 'process_text_feedback',
+}
+
+# process_all で実行する処理と進捗メッセージ（並行して実行可能になった処理はこの順に開始する）
+PIPELINE_STEPS = [
+    ('get_schema', "設問の定義を照合しています..."),
+    ('discover_periods', "年月を取得しています..."),
+    ('aggregate_shards', "年月ごとに分割して集計しています..."),
+    ('get_likert_cubes', "リッカート設問の回答数を集計しています..."),
+    ('process_frequency_data', "利用頻度データを処理しています..."),
+    ('process_contribution_data', "貢献度データを処理しています..."),
+    ('process_time_reduction_data', "時間削減効果データを処理しています..."),
+    ('process_cross_tables', "利用頻度×貢献度のクロス集計を処理しています..."),
+    ('process_challenges', "課題データを処理しています..."),
+    ('process_training_needs', "トレーニング・学習ニーズを処理しています..."),
+    ('process_text_feedback', "フィードバックを処理しています..."),
+    ('save_processed_data', "処理済みデータを保存しています..."),
+]
+
+# 各処理の依存関係（{処理: 先に完了している必要がある処理}）
+# 各処理は self.df を読み取り、processed_data の異なるキーに書き込むため、依存先が完了していれば並行して実行できる
+PIPELINE_DEPENDENCIES = {
+    'aggregate_shards': ['get_schema', 'discover_periods'],
+    'get_likert_cubes': ['aggregate_shards'],
+    'process_frequency_data': ['get_likert_cubes'],
+    'process_contribution_data': ['get_likert_cubes'],
+    'process_time_reduction_data': ['get_likert_cubes'],
+    'process_cross_tables': ['aggregate_shards'],
+    'process_challenges': ['aggregate_shards'],
+    'process_training_needs': ['aggregate_shards'],
+    'save_processed_data': [step for step, _ in PIPELINE_STEPS if step != 'save_processed_data'],
+}
+
+
+
+def to_categorical(series, categories):
+    """列を整数コードのカテゴリ型に変換（定義にない値はカテゴリの末尾に追加して保持）"""
+    extra = set(series.dropna().unique()) - set(categories)
+    categories = list(categories) + sorted(extra, key=str)
+    if isinstance(series.dtype, pd.CategoricalDtype) and list(series.cat.categories) == categories:
+        return series
+    return series.astype(pd.CategoricalDtype(categories))
+
+
+def encode_survey_columns(df, schema):
+    """リッカート設問・年月・チームの列をカテゴリ型に変換（コードは int8）
+    
+    回答レベルのカテゴリは config.py のマッピングの順序に合わせる。
+    """
+    for section, value_map in LIKERT_SECTIONS.items():
+        levels = [label for label in value_map if label != '']
+        for position in schema.item_positions(section).values():
+            df.isetitem(position, to_categorical(df.iloc[:, position], levels))
+    
+    df['年月'] = to_categorical(df['年月'], sort_periods(df['年月']))
+    if TEAM_COLUMN in df.columns:
+        df[TEAM_COLUMN] = to_categorical(df[TEAM_COLUMN], sorted(df[TEAM_COLUMN].dropna().unique()))
+    return df
+
+
+def resolve_source_files(data_path):
+    """データのパス（ファイル・ディレクトリ・globパターン）を読み込むTSVファイルの一覧に展開"""
+    if os.path.isdir(data_path):
+        paths = glob.glob(os.path.join(data_path, '*.tsv'))
+    elif glob.has_magic(data_path):
+        paths = glob.glob(data_path)
+    else:
+        paths = [data_path] if os.path.exists(data_path) else []
+    
+    if not paths:
+        raise FileNotFoundError(f"データファイルが見つかりません: {data_path}")
+    return sorted(paths)
+
+
+def survey_usecols(columns):
+    """集計用に読み込む列の位置（自由記述の列は FreeTextStore が必要になった時に別途読み込む）"""
+    text_positions = set(free_text_positions(columns).values())
+    return [position for position in range(len(columns)) if position not in text_positions]
+
+
+def parse_survey_file(source, day_month_evidence=None):
+    """TSVを1つ解析し、型変換を行う（プロセスプールから呼び出せるようにモジュール関数にしている）
+    
+    自由記述の列は読み込まない（FreeTextStore が必要になった時に別途読み込む）。
+    (DataFrame, タイムスタンプの解析結果の報告) を返す。
+    """
+    columns = read_header(source)
+    df = pd.read_csv(source, sep='\t', encoding='utf-8', usecols=survey_usecols(columns))
+    return prepare_survey_frame(df, source if isinstance(source, str) else None, day_month_evidence)
+
+
+def iter_survey_chunks(source, chunk_rows=STREAM_CHUNK_ROWS, day_month_evidence=None):
+    """TSVを chunk_rows 行ずつ解析し、型変換したDataFrameとタイムスタンプの解析結果の報告を順に返す
+    
+    行はレコード単位で数える（引用符で囲まれた改行を含むセルは途中で分割されない）。
+    """
+    columns = read_header(source)
+    with pd.read_csv(
+        source, sep='\t', encoding='utf-8', usecols=survey_usecols(columns), chunksize=chunk_rows
+    ) as reader:
+        for chunk in reader:
+            yield prepare_survey_frame(chunk, source if isinstance(source, str) else None, day_month_evidence)
+
+
+def prepare_survey_frame(df, source=None, day_month_evidence=None):
+    """解析したTSVの型変換を行う（タイムスタンプ・年月・回答ラベル）
+    
+    タイムスタンプは候補の形式を明示して解析し、年月・回答日・回答週はタイムスタンプから求める
+    （解析できない行の年月は元データの列の値を使う）。day_month_evidence は元データ全体の
+    月と日の解釈の根拠で、省略した場合は df の行だけで判断する（timestamp_parser.parse_timestamps を参照）。
+    (DataFrame, タイムスタンプの解析結果の報告) を返す。
+    """
+    report = parse_survey_timestamps(df, source, evidence=day_month_evidence)
+    
+    # 回答ラベルを読み込み時に一度だけ整数コードへ変換
+    return encode_survey_columns(df, SurveySchema.from_columns(df.columns)), report
+
+
+def survey_columns(paths):
+    """全ファイルを結合した場合の集計用の列名と、列名を揃える基準のスキーマ（ヘッダー行のみを読み込む）
+    
+    combine_survey_frames と同じく、列名は最初のファイルの表記に揃え、ファイル順に和集合をとる。
+    """
+    columns, reference = [], None
+    for path in paths:
+        header = read_header(path)
+        names = [header[position] for position in survey_usecols(header)]
+        if reference is None:
+            reference = SurveySchema.from_columns(names)
+        else:
+            names = align_columns(names, reference)
+        columns.extend(names)
+    # タイムスタンプから求める列（prepare_survey_frame で追加される）
+    columns.extend(DERIVED_TIME_COLUMNS)
+    return list(dict.fromkeys(columns)), reference
+
+
+def combine_survey_frames(frames):
+    """ファイルごとの解析結果を、ヘッダーを照合したうえで1つのDataFrameに結合
+    
+    列名は最初のファイルの表記に揃える。カテゴリが一致する列はコードのまま結合され、
+    一致しない列だけを結合後に再変換する。
+    """
+    if len(frames) == 1:
+        return frames[0]
+    
+    reference = SurveySchema.from_columns(frames[0].columns)
+    aligned = [frames[0]]
+    for df in frames[1:]:
+        df.columns = align_columns(df.columns, reference)
+        aligned.append(df)
+    
+    df = pd.concat(aligned, ignore_index=True)
+    return encode_survey_columns(df, SurveySchema.from_columns(df.columns))
+
+class LazyProcessedData(Mapping):
+    """processed_data の各セクションを初回の参照時に計算する読み取り専用のマッピング
+    
+    計算済みのセクションは processor.processed_data に保持され、以降は再計算しない。
+    複数のスレッドから参照されても同じセクションを重複して計算しない。
+    """
+    
+    def __init__(self, processor):
+        self._processor = processor
+        self._lock = threading.RLock()
+    
+    def __getitem__(self, key):
+        data = self._processor.processed_data
+        if key not in data:
+            step = SECTION_STEPS.get(key)
+            if step is None:
+                raise KeyError(key)
+            with self._lock:
+                if key not in data:
+                    with self._processor.instrumentation.stage(step):
+                        getattr(self._processor, step)()
+        return data[key]
+    
+    def __iter__(self):
+        return iter(dict.fromkeys(list(SECTION_STEPS) + list(self._processor.processed_data)))
+    
+    def __len__(self):
+        return sum(1 for _ in self)
 
 
 class AIUsageSurveyProcessor:
-    def __init__(self, data_path=DATA_PATH):
+    def __init__(self, data_path=DATA_PATH, use_cache=True, max_workers=None, verbose=True, instrumentation=None,
+                 store_path=AGGREGATE_STORE_PATH, text_store_path=FREE_TEXT_STORE_PATH, stage_workers=None,
+                 shard_workers=None):
+        # data_path には単一のTSVのほか、TSVを置いたディレクトリやglobパターンも指定できる
         self.data_path = data_path
+        self.store_path = store_path    # 集計結果を保存するSQLiteファイル
+        self.text_store_path = text_store_path    # 自由記述の回答を保存するSQLiteファイル
+        self._text_store = None
+        self.use_cache = use_cache
+        self.max_workers = max_workers
+        self.stage_workers = stage_workers    # 集計処理を並行して実行するスレッド数（None の場合はCPUコア数）
+        self.shard_workers = shard_workers    # 2以上の場合、年月ごとに分割してこの数のプロセスで集計する
+        self.verbose = verbose    # False の場合は進捗メッセージを表示しない（警告は常に表示）
+        # 処理ステージごとの実行時間・メモリ・行数の計測結果
+        self.instrumentation = instrumentation or StageRecorder(row_counter=self._row_count)
         self.df = None
+        self.streamed_rows = None    # load_streaming で集計した行数（self.df は保持しない）
+        self.source_hash = None    # 読み込んだ元データの内容ハッシュ
+        self.timestamp_report = None    # 最後に解析した元データのタイムスタンプの報告（キャッシュを使った場合はNone）
         self.processed_data = {}
+        self._likert_means = {}
+        self.periods = None
+        self.schema = None
         
+    def _row_count(self):
+        """読み込み済みのデータの行数（未読み込みの場合はNone）"""
+        return len(self.df) if self.df is not None else self.streamed_rows
+    
+    def _log(self, message):
+        """進捗メッセージを表示"""
+        if self.verbose:
+            print(message)
+    
+    def _reset_aggregates(self):
+        """読み込み済みデータに基づく集計結果を破棄"""
+        self._likert_means = {}
+        self._text_store = None
+        self.processed_data.pop('likert_cubes', None)
+        self.processed_data.pop('multiselect_counts', None)
+        self.processed_data.pop('cross_tables', None)
+        self.periods = None
+        self.schema = None
+    
     def load_data(self):
         """TSVファイルを読み込み、基本的な前処理を行う"""
-        self.df = pd.read_csv(self.data_path, sep='\t', encoding='utf-8')
+        self._reset_aggregates()
+        self.timestamp_report = None
+        source_hash = compute_sources_hash(resolve_source_files(self.data_path))
+        self.source_hash = source_hash
+        if not self.use_cache:
+            self.df = self._parse_data()
+            return self.df
+        
+        # TSVの内容が変わっていなければ、解析済みのキャッシュを利用
+        cache = SurveyDataCache()
+        cached_df = cache.load(source_hash)
+        if cached_df is not None:
+            self.df = cached_df
+            return self.df
+        
+        self.df = self._parse_data()
+        try:
+            cache.store(source_hash, self.df)
+        except OSError as e:
+            # 書き込めない環境（読み取り専用のファイルシステム等）ではキャッシュなしで続行
+            print(f"キャッシュを保存できませんでした: {e}")
         
-        # タイムスタンプを datetime 型に変換
-        self.df['タイムスタンプ'] = pd.to_datetime(self.df['タイムスタンプ'])
-        
-        # 年月列は既にデータに存在するので、そのまま使用
-        # 年月列の形式を確認し、必要に応じて調整
-        if '年月' in self.df.columns:
-            # すでに年月列が存在する場合はそのまま使用
-            pass
+        return self.df
+    
+    def _parse_data(self, source=None, day_month_evidence=None):
+        """TSVを解析し、型変換を行う（source を省略した場合は data_path の全ファイルを読み込む）
+        
+        タイムスタンプの解析結果の報告は self.timestamp_report に設定する。
+        day_month_evidence は source の月と日の解釈の根拠（省略した場合は source の行だけで判断する）。
+        """
+        if source is not None:
+            df, report = parse_survey_file(source, day_month_evidence)
         else:
-            # 年月列がない場合はタイムスタンプから生成
-            self.df['年月'] = self.df['タイムスタンプ'].dt.strftime('%Y年%m月')
-        
+            paths = resolve_source_files(self.data_path)
+            if len(paths) == 1:
+                df, report = parse_survey_file(paths[0])
+            else:
+                # 複数ファイルはプロセスプールで並列に解析し、ファイル順を保って結合
+                with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                    results = list(executor.map(parse_survey_file, paths))
+                    
+                    # 月と日の解釈は全ファイルの根拠から決める。ファイル単独の根拠では解釈が異なるファイルのみ解析し直す
+                    evidence = [[0, 0] for _ in DAY_MONTH_SWAPS]
+                    for _, file_report in results:
+                        evidence = add_day_month_evidence(evidence, file_report.day_month_evidence)
+                    reparse = [
+                        i for i, (_, file_report) in enumerate(results)
+                        if day_month_decision(file_report.day_month_evidence) != day_month_decision(evidence)
+                    ]
+                    reparsed = executor.map(parse_survey_file, [paths[i] for i in reparse], [evidence] * len(reparse))
+                    for i, result in zip(reparse, reparsed):
+                        results[i] = result
+                df = combine_survey_frames([frame for frame, _ in results])
+                report = TimestampReport()
+                for _, file_report in results:
+                    report = report.merge(file_report)
+        self._set_timestamp_report(report)
+        return df
+    
+    def _set_timestamp_report(self, report):
+        """タイムスタンプの解析結果の報告を保持し、問題のある行があれば警告する"""
+        self.timestamp_report = report
+        if report.has_problems:
+            print(report.summary())
+    
+    def load_incremental(self):
+        """前回の取り込み以降に追記された行のみを解析し、保存済みの集計状態に加算する
+        
+        取り込み済みの行が変更された場合や、ウォーターマークより古い回答が追記された場合、
+        追記された回答によって月/日と日/月の解釈が変わる場合は全件を再集計する。
+        追記分のみを取り込んだ場合は load_streaming と同様に self.df は None とし、
+        回答数テンソル・クロス集計・複数選択の件数のみを保持する。
+        """
+        self.timestamp_report = None
+        paths = resolve_source_files(self.data_path)
+        if len(paths) != 1:
+            self._log("増分取り込みは単一のTSVファイルのみに対応しているため、全件を読み込みます...")
+            return self.load_data()
+        source_path = paths[0]
+        
+        state = IncrementalState.load()
+        appended = state.read_appended(source_path) if state is not None else None
+        
+        if state is not None and appended is None:
+            self._log("取り込み済みの行が変更されたため、全件を再集計します...")
+        elif appended is not None:
+            header, appended_bytes, prefix_hash = appended
+            if not appended_bytes.strip():
+                self._log("新しい回答はありません。")
+                self._restore_state(state)
+                return self.df
+            
+            delta_df = self._parse_data(io.BytesIO(header + appended_bytes))
+            delta_evidence = self.timestamp_report.day_month_evidence
+            evidence = add_day_month_evidence(state.day_month_evidence, delta_evidence)
+            if day_month_decision(evidence) != day_month_decision(state.day_month_evidence):
+                # 取り込み済みの回答の解釈も変わるため、追記分のみの取り込みはできない
+                self._log("追記された回答によって月/日と日/月の解釈が変わるため、全件を再集計します...")
+            else:
+                if day_month_decision(delta_evidence) != day_month_decision(evidence):
+                    # 追記分だけの根拠では解釈が異なるため、取り込み済みの回答を含めた根拠で解析し直す
+                    delta_df = self._parse_data(io.BytesIO(header + appended_bytes), evidence)
+                
+                # 解析できないタイムスタンプ（NaT）はウォーターマークとの比較に含めない
+                if state.watermark is None or (delta_df['タイムスタンプ'].dropna() >= state.watermark).all():
+                    self._log(f"新しい回答 {len(delta_df)} 件を集計に追加しています...")
+                    state.byte_offset += len(appended_bytes)
+                    state.prefix_hash = prefix_hash
+                    state.day_month_evidence = evidence
+                    self._fold_into_state(state, delta_df)
+                    self._save_state(state)
+                    self._restore_state(state)
+                    return self.df
+                
+                self._log("取り込み済みの回答より古いタイムスタンプが追記されたため、全件を再集計します...")
+        
+        # 全件を読み込んで集計状態を作り直す
+        with open(source_path, 'rb') as f:
+            content = f.read()
+        self._reset_aggregates()
+        self.source_hash = hashlib.sha256(content).hexdigest()
+        self.df = self._parse_data(io.BytesIO(content))
+        self.build_likert_cubes()
+        self.process_cross_tables()
+        for key in MULTISELECT_SECTIONS:
+            self._count_multiselect(key)
+        
+        state = IncrementalState(
+            source_path, len(content), self.source_hash, self.df['タイムスタンプ'].max() if len(self.df) else None,
+            self.df.columns, len(self.df), self.timestamp_report.day_month_evidence,
+            self.processed_data['likert_cubes'], self.processed_data['cross_tables'],
+            self.processed_data['multiselect_counts']
+        )
+        self._save_state(state)
         return self.df
     
+    def _restore_state(self, state):
+        """保存済みの集計状態を処理対象として設定（self.df は None とする）"""
+        self._reset_aggregates()
+        self.source_hash = state.prefix_hash
+        self.df = None
+        self.streamed_rows = state.n_rows
+        self._set_schema(state.columns)
+        self.processed_data['likert_cubes'] = state.likert_cubes
+        self.processed_data['cross_tables'] = state.cross_tables
+        
+        # 年月・チームは集計済みのテンソルの軸から取得する
+        self.periods = sort_periods(sum((cube.months for cube in state.likert_cubes.values()), []))
+        self.processed_data['periods'] = self.periods
+        teams = sorted(set(sum((cube.teams for cube in state.likert_cubes.values()), [])))
+        self.processed_data['multiselect_counts'] = {
+            key: encode_count_index(counts, self.periods, teams) for key, counts in state.multiselect_counts.items()
+        }
+    
+    def _fold_into_state(self, state, delta_df):
+        """追記分の集計結果を保存済みの集計状態に加算（取り込み済みの行は読み込まない）"""
+        delta_schema = SurveySchema.from_columns(delta_df.columns)
+        delta_cubes = self._compute_likert_cubes(delta_df, delta_schema)
+        state.likert_cubes = {
+            section: cube.merge(delta_cubes[section]) for section, cube in state.likert_cubes.items()
+        }
+        
+        definitions = self._cross_tab_definitions(delta_schema)
+        state.cross_tables = {
+            process_type: cube.merge(CrossTabCube.from_frame(delta_df, *definitions[process_type]))
+            for process_type, cube in state.cross_tables.items()
+        }
+        
+        for key, counts in state.multiselect_counts.items():
+            delta_counts = self._compute_multiselect_counts(delta_df, delta_schema.column_index(key))
+            state.multiselect_counts[key] = (
+                pd.concat([counts, delta_counts])
+                .groupby(level=[0, 1, 2], sort=False, dropna=False, observed=True)
+                .sum()
+            )
+        
+        state.n_rows += len(delta_df)
+        # 追記分はすべてウォーターマーク以降のため、追記分の最新タイムスタンプが新しいウォーターマークになる
+        delta_watermark = delta_df['タイムスタンプ'].max()
+        if pd.notna(delta_watermark):
+            state.watermark = delta_watermark
+    
+    def _save_state(self, state):
+        """集計状態を保存"""
+        try:
+            state.save()
+        except OSError as e:
+            print(f"増分取り込みの状態を保存できませんでした: {e}")
+    
+    def load_streaming(self, chunk_rows=STREAM_CHUNK_ROWS):
+        """TSVを chunk_rows 行ずつ読み込んで集計結果に加算し、読み込んだ行はその都度破棄する
+        
+        全件のDataFrameを保持しないため、メモリ使用量はファイルの大きさによらずほぼ一定になる。
+        self.df は None のままで、回答数テンソル・クロス集計・複数選択の件数のみを保持する
+        （以降の process_* はこれらから集計する）。結果は load_data で全件を読み込んだ場合と同じ。
+        月/日と日/月の解釈がチャンクによって異なった場合のみ、データ全体で揃えるためにもう一度読み込む。
+        """
+        self._reset_aggregates()
+        self.df = None
+        paths = resolve_source_files(self.data_path)
+        self.source_hash = compute_sources_hash(paths)
+        columns, reference = survey_columns(paths)
+        self._set_schema(columns)
+        schema = self.schema
+        cross_definitions = self._cross_tab_definitions(schema)
+        
+        likert_cubes, cross_tables, multiselect_counts, report, decisions = self._aggregate_chunks(
+            paths, columns, reference, chunk_rows
+        )
+        if any(decision != day_month_decision(report.day_month_evidence) for decision in decisions):
+            # 月と日の解釈はデータ全体の根拠から決める。チャンク単独の根拠では解釈が異なるチャンクがあった場合は、
+            # 全体の根拠を使って集計し直す（全件を一度に解析した場合と同じ結果にする）
+            self._log("月/日と日/月の解釈をデータ全体で揃えるため、もう一度集計しています...")
+            likert_cubes, cross_tables, multiselect_counts, report, _ = self._aggregate_chunks(
+                paths, columns, reference, chunk_rows, report.day_month_evidence
+            )
+        
+        if likert_cubes is None:
+            # 回答が1件もない場合は空のデータから集計する
+            empty, _ = prepare_survey_frame(pd.DataFrame(columns=columns))
+            likert_cubes = self._compute_likert_cubes(empty, schema)
+            cross_tables = {
+                process_type: CrossTabCube.from_frame(empty, item_positions, row_levels, column_levels)
+                for process_type, (item_positions, row_levels, column_levels) in cross_definitions.items()
+            }
+            multiselect_counts = {
+                key: self._compute_multiselect_counts(empty, schema.column_index(key))
+                for key in MULTISELECT_SECTIONS if schema.column_index(key) is not None
+            }
+        
+        self._set_timestamp_report(report)
+        self.periods = sort_periods(sum((cube.months for cube in likert_cubes.values()), []))
+        self.processed_data['periods'] = self.periods
+        self.processed_data['likert_cubes'] = likert_cubes
+        self.processed_data['cross_tables'] = cross_tables
+        teams = sorted(set(sum((cube.teams for cube in likert_cubes.values()), [])))
+        self.processed_data['multiselect_counts'] = {
+            key: encode_count_index(counts, self.periods, teams) for key, counts in multiselect_counts.items()
+        }
+    
+    def _aggregate_chunks(self, paths, columns, reference, chunk_rows, day_month_evidence=None):
+        """全ファイルを chunk_rows 行ずつ解析して回答数テンソル・クロス集計・複数選択の件数に加算（load_streaming 用）
+        
+        day_month_evidence は元データ全体の月と日の解釈の根拠（省略した場合はチャンクごとに判断する）。
+        回答がない場合の回答数テンソルとクロス集計は None。(回答数テンソル, クロス集計, 複数選択の件数,
+        タイムスタンプの解析結果の報告, チャンク単独の根拠から決まる月と日の解釈の集合) を返す。
+        """
+        schema = self.schema
+        cross_definitions = self._cross_tab_definitions(schema)
+        likert_cubes = cross_tables = None
+        multiselect_counts = {}
+        report = TimestampReport()
+        decisions = set()
+        self.streamed_rows = 0
+        for path in paths:
+            for chunk, chunk_report in iter_survey_chunks(path, chunk_rows, day_month_evidence):
+                report = report.merge(chunk_report)
+                decisions.add(day_month_decision(chunk_report.day_month_evidence))
+                # 列名を最初のファイルの表記に揃え、他のファイルにしかない列は欠損値として補う
+                chunk.columns = align_columns(chunk.columns, reference)
+                if list(chunk.columns) != columns:
+                    chunk = chunk.reindex(columns=columns)
+                
+                cubes = self._compute_likert_cubes(chunk, schema)
+                tables = {
+                    process_type: CrossTabCube.from_frame(chunk, item_positions, row_levels, column_levels)
+                    for process_type, (item_positions, row_levels, column_levels) in cross_definitions.items()
+                }
+                if likert_cubes is None:
+                    likert_cubes, cross_tables = cubes, tables
+                else:
+                    likert_cubes = {section: likert_cubes[section].merge(cube) for section, cube in cubes.items()}
+                    cross_tables = {key: cross_tables[key].merge(table) for key, table in tables.items()}
+                
+                for key in MULTISELECT_SECTIONS:
+                    position = schema.column_index(key)
+                    if position is None:
+                        continue
+                    counts = self._compute_multiselect_counts(chunk, position)
+                    if key in multiselect_counts:
+                        # 初出の順序を保ったまま合算する（全件を一度に集計した場合と同じ順序になる）
+                        counts = (
+                            pd.concat([multiselect_counts[key], counts])
+                            .groupby(level=[0, 1, 2], sort=False, dropna=False, observed=True)
+                            .sum()
+                        )
+                    multiselect_counts[key] = counts
+                self.streamed_rows += len(chunk)
+        
+        return likert_cubes, cross_tables, multiselect_counts, report, decisions
+    
+    def get_schema(self):
+        """読み込んだデータのヘッダーを設問定義と照合したスキーマを取得（初回のみ照合）"""
+        if self.schema is None:
+            self._set_schema(self.df.columns)
+        return self.schema
+    
+    def _set_schema(self, columns):
+        """集計用の列名を設問定義と照合し、見つからない設問があれば警告する"""
+        self.schema = SurveySchema.from_columns(columns)
+        self.processed_data['schema'] = self.schema
+        # 自由記述の設問は集計用のDataFrameに読み込まないため対象外
+        missing = [(section, item) for section, item in self.schema.missing if section not in FREE_TEXT_SECTIONS]
+        if missing:
+            missing = ', '.join(f"{section}[{item}]" if item else section for section, item in missing)
+            print(f"データに見つからない設問があります: {missing}")
+    
+    def discover_periods(self):
+        """データに含まれる年月を日付順に取得（初回のみ計算）"""
+        if self.periods is None:
+            self.periods = sort_periods(self.df['年月'])
+            self.processed_data['periods'] = self.periods
+        return self.periods
+    
+    def _compute_likert_cubes(self, df, schema, months=None, teams=None):
+        """指定したデータからリッカート設問ごとの回答数テンソルを構築"""
+        if months is None:
+            months = sort_periods(df['年月'])
+        if teams is None:
+            teams = sorted(df[TEAM_COLUMN].dropna().unique())
+        
+        cubes = {}
+        for section, value_map in LIKERT_SECTIONS.items():
+            cubes[section] = LikertCube.from_frame(
+                df, schema.item_positions(section), value_map, months, teams
+            )
+        return cubes
+    
+    def build_likert_cubes(self):
+        """リッカート設問ごとに、年月×チーム×項目×回答レベルの回答数テンソルを構築"""
+        cubes = self._compute_likert_cubes(self.df, self.get_schema(), months=self.discover_periods())
+        self.processed_data['likert_cubes'] = cubes
+        return cubes
+    
+    def get_likert_cubes(self):
+        """リッカート設問の回答数テンソルを取得（増分取り込み等で構築済みでなければ構築）"""
+        cubes = self.processed_data.get('likert_cubes')
+        if cubes is None:
+            cubes = self.build_likert_cubes()
+        return cubes
+    
+    def _get_likert_means(self, section):
+        """リッカート設問の平均を回答数テンソルから取得（設問ごとに初回のみ計算）
+        
+        設問ごとに別の処理から呼ばれるため、並行して実行されても同じ設問を重複して計算しない。
+        """
+        if section not in self._likert_means:
+            cube = self.get_likert_cubes()[section]
+            schema = self.get_schema()
+            self._likert_means[section] = {
+                item: cube.item_frame(item, schema.column_name(section, item)) for item in cube.items
+            }
+        return self._likert_means[section]
+    
     def process_frequency_data(self):
         """利用頻度データを処理"""
-        # 上流工程のツール利用頻度
-        upstream_freq = {}
-        for tool in UPSTREAM_TOOLS:
-            col_name = f'先月で、上流工程の作業において、以下のAIツールをどのくらいの頻度で利用しましたか？ [{tool}]'
-            if col_name in self.df.columns:
-                freq_data = self.df.groupby(['年月', 'あなたが所属するチームはどちらですか？'])[col_name].apply(
-                    lambda x: x.map(FREQUENCY_MAP).mean()
-                ).reset_index()
-                upstream_freq[tool] = freq_data
-        
-        # 開発工程のツール利用頻度
-        dev_freq = {}
-        for tool in DEVELOPMENT_TOOLS:
-            col_name = f'先月、開発工程の作業において、以下のAIツールをどのくらいの頻度で利用しましたか？ [{tool}]'
-            if col_name in self.df.columns:
-                freq_data = self.df.groupby(['年月', 'あなたが所属するチームはどちらですか？'])[col_name].apply(
-                    lambda x: x.map(FREQUENCY_MAP).mean()
-                ).reset_index()
-                dev_freq[tool] = freq_data
-        
-        self.processed_data['upstream_frequency'] = upstream_freq
-        self.processed_data['development_frequency'] = dev_freq
+        self.processed_data['upstream_frequency'] = self._get_likert_means('upstream_frequency')
+        self.processed_data['development_frequency'] = self._get_likert_means('development_frequency')
         
     def process_contribution_data(self):
         """貢献度データを処理"""
-        # 上流工程の貢献度
-        upstream_contrib = {}
-        for tool in UPSTREAM_TOOLS:
-            col_name = f'上流工程の作業において、それぞれのAIツールは担当された作業の生産性向上にどの程度貢献したと感じますか？ [{tool}]'
-            if col_name in self.df.columns:
-                contrib_data = self.df.groupby(['年月', 'あなたが所属するチームはどちらですか？'])[col_name].apply(
-                    lambda x: x.map(CONTRIBUTION_MAP).mean()
-                ).reset_index()
-                upstream_contrib[tool] = contrib_data
-        
-        # 開発工程の貢献度
-        dev_contrib = {}
-        for tool in DEVELOPMENT_TOOLS:
-            col_name = f'開発工程の作業において、それぞれのAIツールは担当された作業の生産性向上にどの程度貢献したと感じますか？ [{tool}]'
-            if col_name in self.df.columns:
-                contrib_data = self.df.groupby(['年月', 'あなたが所属するチームはどちらですか？'])[col_name].apply(
-                    lambda x: x.map(CONTRIBUTION_MAP).mean()
-                ).reset_index()
-                dev_contrib[tool] = contrib_data
-        
-        self.processed_data['upstream_contribution'] = upstream_contrib
-        self.processed_data['development_contribution'] = dev_contrib
+        self.processed_data['upstream_contribution'] = self._get_likert_means('upstream_contribution')
+        self.processed_data['development_contribution'] = self._get_likert_means('development_contribution')
     
     def process_time_reduction_data(self):
         """時間削減効果データを処理"""
-        # 上流工程の時間削減効果
-        upstream_tasks = [
-            '企画・提案の骨子検討',
-            '提案資料作成',
-            '仕様・要件整理（UI含む）',
-            '概要設計・システム構成検討',
-            'プレゼン・説明内容の整理',
-            '事務作業',
-            'その他'
-        ]
-        
-        upstream_time = {}
-        for task in upstream_tasks:
-            col_name = f'上流工程において、AIツールを活用することで、担当作業について、おおよそどの程度の時間や労力が削減できたと感じますか？ [{task}]'
-            if col_name in self.df.columns:
-                time_data = self.df.groupby(['年月', 'あなたが所属するチームはどちらですか？'])[col_name].apply(
-                    lambda x: x.map(TIME_REDUCTION_MAP).mean()
-                ).reset_index()
-                upstream_time[task] = time_data
-        
-        # 開発工程の時間削減効果
-        dev_tasks = [
-            '技術的な調査、問題解決のための情報収集',
-            '設計作業（検討・整理含む）',
-            'コーディング作業',
-            '単体テスト作業（テストケース作成・実行）',
-            'レビュー（コードや設計）',
-            'その他'
-        ]
-        
-        dev_time = {}
-        for task in dev_tasks:
-            col_name = f'開発工程において、AIツールを活用することで、おおよそどの程度の時間や労力が削減できたと感じますか？（可能な範囲で、具体的な作業とともにご記入ください） [{task}]'
-            if col_name in self.df.columns:
-                time_data = self.df.groupby(['年月', 'あなたが所属するチームはどちらですか？'])[col_name].apply(
-                    lambda x: x.map(TIME_REDUCTION_MAP).mean()
-                ).reset_index()
-                dev_time[task] = time_data
-        
-        self.processed_data['upstream_time_reduction'] = upstream_time
-        self.processed_data['development_time_reduction'] = dev_time
+        self.processed_data['upstream_time_reduction'] = self._get_likert_means('upstream_time_reduction')
+        self.processed_data['development_time_reduction'] = self._get_likert_means('development_time_reduction')
+    
+    @staticmethod
+    def _cross_tab_definitions(schema):
+        """クロス集計の {工程: ({ツール: (行の設問の列の位置, 列の設問の列の位置)}, 行の回答レベル, 列の回答レベル)}"""
+        definitions = {}
+        for process_type, (row_section, column_section) in CROSS_TAB_SECTIONS.items():
+            item_positions = {}
+            for tool in QUESTION_ITEMS[row_section]:
+                row_position = schema.column_index(row_section, tool)
+                column_position = schema.column_index(column_section, tool)
+                if row_position is not None and column_position is not None:
+                    item_positions[tool] = (row_position, column_position)
+            definitions[process_type] = (
+                item_positions, list(LIKERT_SECTIONS[row_section]), list(LIKERT_SECTIONS[column_section])
+            )
+        return definitions
+    
+    def process_cross_tables(self):
+        """利用頻度×貢献度のクロス集計を、年月×チーム×ツールごとの回答数として一括で処理"""
+        if 'cross_tables' in self.processed_data:
+            # 年月ごとの分割集計（aggregate_shards）・増分取り込み・ストリーミングで集計済み
+            return
+        
+        cross_tables = {}
+        definitions = self._cross_tab_definitions(self.get_schema())
+        for process_type, (item_positions, row_levels, column_levels) in definitions.items():
+            cross_tables[process_type] = CrossTabCube.from_frame(
+                self.df, item_positions, row_levels, column_levels, months=self.discover_periods()
+            )
+        
+        self.processed_data['cross_tables'] = cross_tables
+    
+    def aggregate_shards(self):
+        """リッカート設問・クロス集計・複数選択の件数を、年月ごとに分割した複数プロセスで一括で集計
+        
+        shard_workers が2以上の場合のみ実行し、それ以外は各処理が1プロセスで集計する。
+        増分取り込みで復元した回答数など、集計済みのものは対象外。
+        """
+        if self.shard_workers is None or self.shard_workers < 2:
+            return
+        
+        schema = self.get_schema()
+        likert = {}
+        if 'likert_cubes' not in self.processed_data:
+            likert = {
+                section: (schema.item_positions(section), value_map) for section, value_map in LIKERT_SECTIONS.items()
+            }
+        cross = {} if 'cross_tables' in self.processed_data else self._cross_tab_definitions(schema)
+        multiselect_counts = self.processed_data.setdefault('multiselect_counts', {})
+        multiselect = {}
+        for key in MULTISELECT_SECTIONS:
+            position = schema.column_index(key)
+            if key not in multiselect_counts and position is not None:
+                multiselect[key] = position
+        if not (likert or cross or multiselect):
+            return
+        
+        teams = sorted(self.df[TEAM_COLUMN].dropna().unique())
+        aggregates = ShardedAggregation(
+            self.df, self.discover_periods(), teams, likert, cross, multiselect
+        ).run(self.shard_workers)
+        if likert:
+            self.processed_data['likert_cubes'] = aggregates['likert_cubes']
+        if cross:
+            self.processed_data['cross_tables'] = aggregates['cross_tables']
+        multiselect_counts.update(aggregates['multiselect_counts'])
+    
+    @staticmethod
+    def _compute_multiselect_counts(df, position):
+        """複数選択の回答を分解し、年月×チーム×選択肢ごとの件数を一括で集計"""
+        # カンマ区切りの回答を行に展開し、前後の空白を除去
+        answers = pd.DataFrame({
+            '年月': df['年月'],
+            TEAM_COLUMN: df[TEAM_COLUMN],
+            '選択肢': df.iloc[:, position],
+        }).dropna(subset=['選択肢'])
+        answers['選択肢'] = answers['選択肢'].astype(str).str.split(',')
+        answers = answers.explode('選択肢')
+        answers['選択肢'] = answers['選択肢'].str.strip()
+        
+        return answers.groupby(['年月', TEAM_COLUMN, '選択肢'], sort=False, dropna=False, observed=True).size()
+    
+    def _count_multiselect(self, key):
+        """複数選択の設問の件数を取得（初回のみ計算）"""
+        multiselect_counts = self.processed_data.setdefault('multiselect_counts', {})
+        if key not in multiselect_counts:
+            position = self.get_schema().column_index(key)
+            if position is None:
+                return None
+            multiselect_counts[key] = self._compute_multiselect_counts(self.df, position)
+        return multiselect_counts[key]
+    
+    @staticmethod
+    def _sum_by_choice(counts, team=None):
+        """年月×チーム×選択肢の件数を選択肢ごとに合計し、件数の多い順に並べる"""
+        if team is not None:
+            counts = counts[counts.index.get_level_values(TEAM_COLUMN) == team]
+        if counts.empty:
+            return pd.Series(dtype=int)
+        
+        totals = counts.groupby(level='選択肢', sort=False, observed=True).sum()
+        return totals.sort_values(ascending=False).rename_axis(None).rename('count')
+    
+    def _monthly_sum_by_choice(self, counts, team=None):
+        """選択肢ごとの件数を全ての年月について1回の走査で集計"""
+        if team is not None:
+            counts = counts[counts.index.get_level_values(TEAM_COLUMN) == team]
+        
+        monthly_data = {month: pd.Series(dtype=int) for month in self.discover_periods()}
+        for month, month_counts in counts.groupby(level='年月', sort=False, observed=True):
+            if month in monthly_data:
+                monthly_data[month] = self._sum_by_choice(month_counts)
+        return monthly_data
     
     def process_challenges(self):
         """課題データを処理（月別分析付き）"""
-        # 上流工程の課題（全体）
-        upstream_challenges_col = '上流工程でAIツールを活用する上で、どのような課題を感じていますか？（複数選択可）'
-        if upstream_challenges_col in self.df.columns:
-            challenges = []
-            for idx, row in self.df.iterrows():
-                if pd.notna(row[upstream_challenges_col]):
-                    challenges.extend([c.strip() for c in str(row[upstream_challenges_col]).split(',')])
-            
-            challenge_counts = pd.Series(challenges).value_counts()
-            self.processed_data['upstream_challenges'] = challenge_counts
-        
-        # 開発工程の課題（全体）
-        dev_challenges_col = '開発工程でAIツールを活用する上で、どのような課題を感じていますか？（複数選択可）'
-        if dev_challenges_col in self.df.columns:
-            challenges = []
-            for idx, row in self.df.iterrows():
-                if pd.notna(row[dev_challenges_col]):
-                    challenges.extend([c.strip() for c in str(row[dev_challenges_col]).split(',')])
-            
-            challenge_counts = pd.Series(challenges).value_counts()
-            self.processed_data['development_challenges'] = challenge_counts
+        # 上流工程・開発工程の課題（全体）
+        for key in ['upstream_challenges', 'development_challenges']:
+            counts = self._count_multiselect(key)
+            if counts is not None:
+                self.processed_data[key] = self._sum_by_choice(counts)
         
         # 月別課題分析
         self._process_monthly_challenges()
     
     def _process_monthly_challenges(self):
         """月別課題データを処理"""
-        # 上流工程の月別課題
-        upstream_challenges_col = '上流工程でAIツールを活用する上で、どのような課題を感じていますか？（複数選択可）'
-        dev_challenges_col = '開発工程でAIツールを活用する上で、どのような課題を感じていますか？（複数選択可）'
+        upstream_counts = self._count_multiselect('upstream_challenges')
+        dev_counts = self._count_multiselect('development_challenges')
         
-        monthly_data = {}
+        monthly_data = {month: {} for month in self.discover_periods()}
         
-        for month in ['2025年5月', '2025年6月', '2025年7月']:
-            month_df = self.df[self.df['年月'] == month]
-            monthly_data[month] = {}
-            
-            # 上流工程の課題
-            if upstream_challenges_col in self.df.columns:
-                upstream_team_data = month_df[month_df['あなたが所属するチームはどちらですか？'] == 'ディレクターチーム']
-                challenges = []
-                for idx, row in upstream_team_data.iterrows():
-                    if pd.notna(row[upstream_challenges_col]):
-                        challenges.extend([c.strip() for c in str(row[upstream_challenges_col]).split(',')])
-                monthly_data[month]['upstream_challenges'] = pd.Series(challenges).value_counts() if challenges else pd.Series(dtype=int)
-            
-            # 開発工程の課題
-            if dev_challenges_col in self.df.columns:
-                dev_team_data = month_df[month_df['あなたが所属するチームはどちらですか？'] == 'エンジニアリングチーム']
-                challenges = []
-                for idx, row in dev_team_data.iterrows():
-                    if pd.notna(row[dev_challenges_col]):
-                        challenges.extend([c.strip() for c in str(row[dev_challenges_col]).split(',')])
-                monthly_data[month]['development_challenges'] = pd.Series(challenges).value_counts() if challenges else pd.Series(dtype=int)
+        # 上流工程の課題
+        if upstream_counts is not None:
+            for month, counts in self._monthly_sum_by_choice(upstream_counts, 'ディレクターチーム').items():
+                monthly_data[month]['upstream_challenges'] = counts
+        
+        # 開発工程の課題
+        if dev_counts is not None:
+            for month, counts in self._monthly_sum_by_choice(dev_counts, 'エンジニアリングチーム').items():
+                monthly_data[month]['development_challenges'] = counts
         
         self.processed_data['monthly_challenges'] = monthly_data
     
     def process_training_needs(self):
         """トレーニング・学習ニーズを処理（月別分析付き）"""
-        training_col = 'AIツールをより効果的に活用するために、どのようなトレーニングや情報共有があると役立ちますか？（複数選択可）'
-        if training_col in self.df.columns:
-            training_needs = []
-            for idx, row in self.df.iterrows():
-                if pd.notna(row[training_col]):
-                    training_needs.extend([t.strip() for t in str(row[training_col]).split(',')])
-            
-            training_counts = pd.Series(training_needs).value_counts()
-            self.processed_data['training_needs'] = training_counts
+        counts = self._count_multiselect('training_needs')
+        if counts is not None:
+            self.processed_data['training_needs'] = self._sum_by_choice(counts)
         
         # 月別トレーニングニーズ分析
         self._process_monthly_training_needs()
     
     def _process_monthly_training_needs(self):
         """月別トレーニングニーズを処理"""
-        training_col = 'AIツールをより効果的に活用するために、どのようなトレーニングや情報共有があると役立ちますか？（複数選択可）'
-        
-        monthly_data = {}
+        counts = self._count_multiselect('training_needs')
         
-        for month in ['2025年5月', '2025年6月', '2025年7月']:
-            month_df = self.df[self.df['年月'] == month]
-            
-            training_needs = []
-            for idx, row in month_df.iterrows():
-                if pd.notna(row[training_col]):
-                    training_needs.extend([t.strip() for t in str(row[training_col]).split(',')])
-            
-            monthly_data[month] = pd.Series(training_needs).value_counts() if training_needs else pd.Series(dtype=int)
+        if counts is not None:
+            monthly_data = self._monthly_sum_by_choice(counts)
+        else:
+            monthly_data = {month: pd.Series(dtype=int) for month in self.discover_periods()}
         
         self.processed_data['monthly_training_needs'] = monthly_data
     
     def process_text_feedback(self):
-        """自由記述のフィードバックを処理"""
-        feedback_cols = [
-            '上流工程でAIツールを活用したことで、特に効果を実感した作業や具体的なエピソードがあれば教えてください。',
-            'AIを活用した開発プロセス全体に関して、その他何か意見や要望があれば自由にご記入ください。'
-        ]
-        
+        """自由記述のフィードバックを処理（自由記述のストアから読み込む）"""
+        text_store = self.get_text_store()
         all_feedback = []
-        for col in feedback_cols:
-            if col in self.df.columns:
-                feedback = self.df[col].dropna().tolist()
-                all_feedback.extend(feedback)
+        for section in FEEDBACK_SECTIONS:
+            all_feedback.extend(text_store.fetch(section))
         
         self.processed_data['feedback'] = all_feedback
     
+    def get_text_store(self):
+        """読み込んだ元データの自由記述の回答のストア（初回の参照時に元データから作成）"""
+        if self._text_store is None:
+            self._text_store = FreeTextStore(
+                resolve_source_files(self.data_path), self.source_hash, path=self.text_store_path
+            )
+        return self._text_store
+    
     def save_processed_data(self):
-        """処理済みデータを保存"""
-        os.makedirs(PROCESSED_DATA_PATH, exist_ok=True)
-        
-        # DataFrameを保存
-        for key, data in self.processed_data.items():
-            if isinstance(data, dict):
-                for tool, df in data.items():
-                    if isinstance(df, pd.DataFrame):
-                        filename = f"{key}_{tool.replace('/', '_').replace(' ', '_')}.csv"
-                        df.to_csv(os.path.join(PROCESSED_DATA_PATH, filename), index=False)
-            elif isinstance(data, pd.Series):
-                filename = f"{key}.csv"
-                data.to_csv(os.path.join(PROCESSED_DATA_PATH, filename))
+        """処理済みデータを1つのSQLiteファイルに保存（キーの順序を揃えてから保存する）"""
+        self._order_processed_data()
+        try:
+            AggregateStore(self.store_path).save(self.processed_data, self.source_hash)
+        except (OSError, sqlite3.Error) as e:
+            print(f"処理済みデータを保存できませんでした: {e}")
     
-    def process_all(self):
-        """全ての処理を実行"""
-        print("データを読み込んでいます...")
-        self.load_data()
-        
-        print("利用頻度データを処理しています...")
-        self.process_frequency_data()
-        
-        print("貢献度データを処理しています...")
-        self.process_contribution_data()
-        
-        print("時間削減効果データを処理しています...")
-        self.process_time_reduction_data()
-        
-        print("課題データを処理しています...")
-        self.process_challenges()
-        
-        print("トレーニング・学習ニーズを処理しています...")
-        self.process_training_needs()
-        
-        print("フィードバックを処理しています...")
-        self.process_text_feedback()
-        
-        print("処理済みデータを保存しています...")
-        self.save_processed_data()
-        
-        print("データ処理が完了しました。")
+    def _load_stored_aggregates(self):
+        """元データと一致する保存済みの集計結果があれば processed_data として設定"""
+        with self.instrumentation.stage('load_stored_aggregates'):
+            stored = AggregateStore(self.store_path).load(self.source_hash)
+        if stored is None:
+            return False
+        
+        self.processed_data = stored
+        self.periods = stored['periods']
+        self.get_schema()
+        return True
+    
+    def load_processed_data(self):
+        """保存済みの集計結果が元データと一致すれば読み込み、一致しなければ全ての処理を実行"""
+        with self.instrumentation.stage('load_data'):
+            self.load_data()
+        if self._load_stored_aggregates():
+            return self.processed_data
+        return self.process_loaded_data()
+    
+    def load_lazy_processed_data(self):
+        """データを読み込み、各セクションを参照時に計算する processed_data を返す
+        
+        保存済みの集計結果が元データと一致する場合はそれを返す。
+        """
+        with self.instrumentation.stage('load_data'):
+            self.load_data()
+        if self._load_stored_aggregates():
+            return self.processed_data
+        return LazyProcessedData(self)
+    
+    def process_all(self, incremental=False, stream=False, chunk_rows=STREAM_CHUNK_ROWS):
+        """全ての処理を実行
+        
+        incremental=True の場合は前回以降の追記分のみを取り込み、stream=True の場合は
+        全件のDataFrameを保持せずに chunk_rows 行ずつ集計する。
+        """
+        self._log("データを読み込んでいます...")
+        if incremental:
+            with self.instrumentation.stage('load_incremental'):
+                self.load_incremental()
+        elif stream:
+            with self.instrumentation.stage('load_streaming'):
+                self.load_streaming(chunk_rows)
+        else:
+            with self.instrumentation.stage('load_data'):
+                self.load_data()
+        return self.process_loaded_data()
+    
+    def _run_step(self, step):
+        """1つの処理を実行し、実行時間等を instrumentation に記録"""
+        with self.instrumentation.stage(step):
+            getattr(self, step)()
+    
+    def process_loaded_data(self):
+        """読み込み済みのデータを集計し、結果を保存（各処理の実行時間等は instrumentation に記録）
+        
+        依存先の処理が完了した処理から、stage_workers 個のスレッドで並行して実行する。
+        tracemalloc でメモリを計測する場合は順に実行する（tracemalloc のピークと最大RSSはプロセス全体の
+        値のため、並行して実行すると他の処理の確保量がそのステージの値に含まれてしまう）。
+        """
+        # 複数選択の件数は処理ごとに別のキーに追加されるため、容器は先に用意しておく
+        self.processed_data.setdefault('multiselect_counts', {})
+        messages = dict(PIPELINE_STEPS)
+        run_stages(
+            [step for step, _ in PIPELINE_STEPS], PIPELINE_DEPENDENCIES, self._run_step,
+            max_workers=1 if self.instrumentation.trace_memory else self.stage_workers,
+            on_start=lambda step: self._log(messages[step])
+        )
+        
+        self._log("データ処理が完了しました。")
         return self.processed_data
+    
+    def _order_processed_data(self):
+        """processed_data のキーの順序を、並行して実行した処理の完了順によらず一定にする"""
+        keys = dict.fromkeys(list(SECTION_STEPS) + ['multiselect_counts'] + list(self.processed_data))
+        self.processed_data = {key: self.processed_data[key] for key in keys if key in self.processed_data}
+        counts = self.processed_data.get('multiselect_counts')
+        if counts:
+            self.processed_data['multiselect_counts'] = {
+                key: counts[key] for key in MULTISELECT_SECTIONS if key in counts
+            }
 
 
 if __name__ == "__main__":
-    processor = AIUsageSurveyProcessor()
-    processor.process_all()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="AI活用アンケートデータの集計")
+    parser.add_argument('--data', default=DATA_PATH, help="TSVファイル、TSVを置いたディレクトリ、またはglobパターン")
+    parser.add_argument('--workers', type=int, default=None, help="複数ファイルを解析するプロセス数")
+    parser.add_argument('--stage-workers', type=int, default=None,
+                        help="集計処理を並行して実行するスレッド数（省略時はCPUコア数、1で順に実行）")
+    parser.add_argument('--shard-workers', type=int, default=None,
+                        help="2以上を指定すると、年月ごとに分割してこの数のプロセスで集計する（大量の履歴向け）")
+    parser.add_argument('--incremental', action='store_true', help="前回の取り込み以降に追記された行のみを集計に加える")
+    parser.add_argument('--stream', action='store_true',
+                        help="全件を読み込まずに一定の行数ずつ集計する（メモリに収まらない大きなデータ向け）")
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS, help="--stream で一度に読み込む行数")
+    parser.add_argument('--timestamp-report',
+                        help="タイムスタンプを解析できなかった行・解釈が定まらない行などを保存するTSVファイル")
+    parser.add_argument('--metrics-json', help="処理ステージごとの計測結果を保存するJSONファイル")
+    parser.add_argument('--metrics-prom', help="処理ステージごとの計測結果を保存するPrometheusテキスト形式のファイル")
+    parser.add_argument('--trace-memory', action='store_true', help="tracemalloc でステージごとのメモリ確保量のピークも計測する（集計処理は順に実行され、処理は遅くなる）")
+    args = parser.parse_args()
+    
+    processor = AIUsageSurveyProcessor(args.data, max_workers=args.workers, stage_workers=args.stage_workers,
+                                       shard_workers=args.shard_workers)
+    processor.instrumentation.trace_memory = args.trace_memory
+    processor.process_all(incremental=args.incremental, stream=args.stream, chunk_rows=args.chunk_rows)
+    processor.instrumentation.write(args.metrics_json, args.metrics_prom)
+    if args.timestamp_report:
+        if processor.timestamp_report is None:
+            print("解析済みのキャッシュ・集計状態を使用したため、タイムスタンプの報告はありません")
+        else:
+            processor.timestamp_report.save(args.timestamp_report)
+            print(f"タイムスタンプの報告を保存しました: {args.timestamp_report}")
\ No newline at end of file
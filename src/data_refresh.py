@@ -0,0 +1,68 @@
+"""
+データの更新を検知して再読み込みするローダー
+
+データのバージョン（ファイルの更新日時・サイズ）が変わった場合、読み込み済みの結果を返しながら
+バックグラウンドのスレッドで再読み込みを行う（stale-while-revalidate）。
+初回の読み込み以外で、利用者が全件の再集計を待つことはない。
+"""
+
+import threading
+import traceback
+
+
+class StaleWhileRevalidateLoader:
+    """バージョンが変わったデータをバックグラウンドで再読み込みするローダー"""
+
+    def __init__(self, version_fn, load_fn):
+        self.version_fn = version_fn    # 現在のデータのバージョンを返す関数（軽量であること）
+        self.load_fn = load_fn          # データを読み込む関数
+        self._lock = threading.Lock()
+        self._initial_lock = threading.Lock()
+        self._version = None
+        self._value = None
+        self._refreshing_version = None
+
+    @property
+    def is_refreshing(self):
+        """バックグラウンドで再読み込み中かどうか"""
+        return self._refreshing_version is not None
+
+    def get(self):
+        """現在のデータを取得し、(値, 古いデータかどうか) を返す"""
+        version = self.version_fn()
+
+        with self._lock:
+            if self._value is not None:
+                if self._version == version:
+                    return self._value, False
+                # 古い結果を返しつつ、新しいバージョンの読み込みを開始
+                if self._refreshing_version != version:
+                    self._refreshing_version = version
+                    threading.Thread(target=self._refresh, args=(version,), daemon=True).start()
+                return self._value, True
+
+        # 初回のみ同期的に読み込む（同時に来たリクエストは読み込み完了を待つ）
+        with self._initial_lock:
+            with self._lock:
+                if self._value is not None:
+                    return self._value, self._version != version
+            value = self.load_fn()
+            with self._lock:
+                if self._value is None:
+                    self._version, self._value = version, value
+                return self._value, False
+
+    def _refresh(self, version):
+        """指定したバージョンのデータを読み込み、より新しい再読み込みが始まっていなければ置き換える"""
+        try:
+            value = self.load_fn()
+        except Exception:
+            # 失敗した場合は古い結果を使い続け、次のリクエストで再試行する
+            traceback.print_exc()
+            value = None
+
+        with self._lock:
+            if self._refreshing_version == version:
+                if value is not None:
+                    self._version, self._value = version, value
+                self._refreshing_version = None
@@ -0,0 +1,231 @@
+"""
+自由記述の回答のストア
+
+自由記述の列（具体的なエピソード・作業内容・その他意見）は集計には使わないため、
+集計用のDataFrameには読み込まず、必要になった時に元データからその列だけを読み込んで
+SQLiteファイルに保存する。回答は行ID（元データでの行の位置）で取得でき、件数を指定して
+ページ単位で読み込める。ストアは元データを一定の行数ずつ読み込んで作成するため、
+自由記述の回答を全てメモリに保持することはない。
+単一のTSVの末尾に回答が追記された場合は、取り込み済みの範囲が変更されていなければ追記分の行のみを追加する。
+"""
+
+import io
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+
+import pandas as pd
+
+from config import *
+from data_cache import read_appended
+from survey_schema import SurveySchema
+
+# ストアの形式を変更した場合はこの値を上げる（古いストアは作り直す）
+FREE_TEXT_FORMAT_VERSION = 2
+
+# 自由記述の設問（集計用のDataFrameには読み込まない）
+FREE_TEXT_SECTIONS = ['upstream_episodes', 'development_examples', 'general_feedback']
+
+# ストアの作成時に一度に読み込む行数
+FREE_TEXT_CHUNK_ROWS = 50_000
+
+FREE_TEXT_COLUMNS = ['row_id', 'section', 'team', 'text', 'blank']
+
+
+def read_header(source):
+    """TSVのヘッダー行の列名を取得（ファイルオブジェクトの場合は先頭に戻す）"""
+    columns = pd.read_csv(source, sep='\t', encoding='utf-8', nrows=0).columns.tolist()
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return columns
+
+
+def free_text_positions(columns):
+    """自由記述の設問の {設問キー: 列の位置}（見つかった設問のみ）"""
+    schema = SurveySchema.from_columns(columns)
+    positions = {section: schema.column_index(section) for section in FREE_TEXT_SECTIONS}
+    return {section: position for section, position in positions.items() if position is not None}
+
+
+def iter_free_text(sources, chunk_rows=FREE_TEXT_CHUNK_ROWS, offset=0):
+    """自由記述の列とチームの列だけを chunk_rows 行ずつ読み込み、(空でない回答を1行1件にしたDataFrame, 次の行ID) を順に返す
+
+    sources はファイルパスまたはファイルオブジェクト。行IDは offset から始まり、全ファイルをファイル順に結合した
+    集計用のDataFrameでの行の位置と一致する（追記分のみを読み込む場合は取り込み済みの行数を offset に指定する）。
+    """
+    for source in sources:
+        columns = read_header(source)
+        positions = free_text_positions(columns)
+        team_position = SurveySchema.from_columns(columns).column_index('team')
+        usecols = sorted(set(positions.values()) | ({team_position} if team_position is not None else set()))
+
+        with pd.read_csv(
+            source, sep='\t', encoding='utf-8', usecols=usecols, dtype=str, chunksize=chunk_rows
+        ) as reader:
+            # チャンクの行番号はファイルの先頭からの位置
+            n_rows = 0
+            for df in reader:
+                sections = []
+                for section, position in positions.items():
+                    texts = df[columns[position]]
+                    answered = texts.notna().to_numpy()
+                    sections.append(pd.DataFrame({
+                        'row_id': offset + df.index[answered],
+                        'section': section,
+                        'team': df[columns[team_position]][answered] if team_position is not None else None,
+                        'text': texts[answered],
+                        # 空白のみの回答（事例の表示では除く）
+                        'blank': texts[answered].str.strip() == '',
+                    }))
+                n_rows += len(df)
+                texts = pd.concat(sections, ignore_index=True) if sections else pd.DataFrame(columns=FREE_TEXT_COLUMNS)
+                yield texts, offset + n_rows
+        offset += n_rows
+
+
+def _insert_texts(conn, texts):
+    """回答を追加（pandas の to_sql は呼び出しごとにコミットするため使わない）"""
+    rows = texts[FREE_TEXT_COLUMNS].astype(object)
+    conn.executemany(
+        "INSERT INTO free_text VALUES (?, ?, ?, ?, ?)",
+        rows.where(rows.notna(), None).itertuples(index=False, name=None)
+    )
+
+
+class FreeTextStore:
+    """自由記述の回答を行ID・ページ単位で読み込むストア
+
+    初回の参照時に、元データの内容ハッシュと一致するストアがなければ作成する。
+    単一のTSVで、ストアの作成時に読み込んだ範囲が変更されていない場合は、追記された行のみを追加する。
+    """
+
+    def __init__(self, paths, source_hash, path=FREE_TEXT_STORE_PATH):
+        self.paths = list(paths)
+        self.source_hash = source_hash
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _read_meta(self):
+        """保存済みのストアのメタ情報（ストアがない・形式が古い場合はNone）"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with closing(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)) as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.Error:
+            return None
+        return meta if meta.get('version') == str(FREE_TEXT_FORMAT_VERSION) else None
+
+    def _build(self):
+        """元データから自由記述の列を一定の行数ずつ読み込んでストアを作成（一時ファイルに書き出してから置き換える）"""
+        # 追記分のみの取り込みに使う、読み込んだ範囲のバイト数（単一のTSVの場合のみ）
+        source_path = os.path.abspath(self.paths[0]) if len(self.paths) == 1 else ''
+        byte_offset = os.path.getsize(source_path) if source_path else None
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp-{uuid.uuid4().hex}'
+        try:
+            with closing(sqlite3.connect(tmp_path)) as conn:
+                conn.execute(
+                    "CREATE TABLE free_text (row_id INTEGER, section TEXT, team TEXT, text TEXT, blank INTEGER)"
+                )
+                next_row_id = 0
+                for texts, next_row_id in iter_free_text(self.paths):
+                    _insert_texts(conn, texts)
+                conn.execute("CREATE INDEX idx_free_text ON free_text (section, team, row_id)")
+
+                # 読み込み中に追記された場合は読み込んだ範囲が不明なため、次回は追記分のみの取り込みを行わない
+                if source_path and os.path.getsize(source_path) != byte_offset:
+                    source_path, byte_offset = '', None
+                pd.DataFrame({
+                    'key': ['version', 'source_hash', 'source_path', 'byte_offset', 'next_row_id'],
+                    'value': [
+                        str(FREE_TEXT_FORMAT_VERSION), self.source_hash, source_path,
+                        '' if byte_offset is None else str(byte_offset), str(next_row_id),
+                    ],
+                }).to_sql('meta', conn, index=False)
+                conn.commit()
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _append(self, meta):
+        """ストアの作成時に読み込んだ範囲が変更されていなければ追記された行のみを追加（追加できない場合はFalse）"""
+        if len(self.paths) != 1 or not meta.get('byte_offset'):
+            return False
+        source_path = os.path.abspath(self.paths[0])
+        if meta.get('source_path') != source_path:
+            return False
+
+        appended = read_appended(source_path, int(meta['byte_offset']), meta['source_hash'])
+        if appended is None:
+            return False
+        header, appended_bytes, source_hash = appended
+
+        # 追加とメタ情報の更新は1つのトランザクションで行う（途中で失敗した場合は追加前の状態に戻る）
+        next_row_id = int(meta['next_row_id'])
+        with closing(sqlite3.connect(self.path)) as conn:
+            for texts, next_row_id in iter_free_text([io.BytesIO(header + appended_bytes)], offset=next_row_id):
+                _insert_texts(conn, texts)
+            conn.executemany("UPDATE meta SET value = ? WHERE key = ?", [
+                (source_hash, 'source_hash'),
+                (str(int(meta['byte_offset']) + len(appended_bytes)), 'byte_offset'),
+                (str(next_row_id), 'next_row_id'),
+            ])
+            conn.commit()
+        return True
+
+    def _connect(self):
+        """元データと一致するストアに読み取り専用で接続（なければ作成）"""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    meta = self._read_meta()
+                    if meta is None or (meta['source_hash'] != self.source_hash and not self._append(meta)):
+                        self._build()
+                    self._ready = True
+        return closing(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True))
+
+    @staticmethod
+    def _conditions(section, team, skip_blank):
+        clauses, params = ["section = ?"], [section]
+        if team is not None:
+            clauses.append("team = ?")
+            params.append(team)
+        if skip_blank:
+            clauses.append("blank = 0")
+        return ' AND '.join(clauses), params
+
+    def count(self, section, team=None, skip_blank=False):
+        """回答の件数"""
+        where, params = self._conditions(section, team, skip_blank)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM free_text WHERE {where}", params).fetchone()[0]
+
+    def fetch(self, section, team=None, limit=None, offset=0, skip_blank=False):
+        """回答を行ID順に取得（limit・offset でページ単位に読み込める）"""
+        where, params = self._conditions(section, team, skip_blank)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT text FROM free_text WHERE {where} ORDER BY row_id LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+        return [text for text, in rows]
+
+    def fetch_rows(self, section, row_ids):
+        """指定した行IDの回答を {行ID: 回答} で取得（未回答の行は含まない）"""
+        row_ids = [int(row_id) for row_id in row_ids]
+        if not row_ids:
+            return {}
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE requested (row_id INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO requested VALUES (?)", [(row_id,) for row_id in row_ids])
+            rows = conn.execute(
+                "SELECT free_text.row_id, text FROM free_text JOIN requested USING (row_id) WHERE section = ?",
+                [section]
+            ).fetchall()
+        return dict(rows)
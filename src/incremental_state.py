@@ -0,0 +1,150 @@
+"""
+増分取り込み用の集計状態の保存・読み込み
+
+取り込み済みのバイト位置とその範囲のハッシュ、タイムスタンプのウォーターマーク、
+集計用の列名と行数、月/日と日/月の解釈の根拠、回答数テンソル・クロス集計・複数選択の件数を保存する。
+回答の行そのものは保存しないため、追記分の取り込みにかかる時間は追記分の行数にのみ比例する。
+"""
+
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from data_cache import read_appended
+from survey_cube import CrossTabCube, LikertCube
+
+# 状態の保存形式を変更した場合はこの値を上げる（古い状態は破棄して全件再構築する）
+STATE_FORMAT_VERSION = 7
+
+META_FILENAME = 'meta.json'
+MULTISELECT_INDEX = ['年月', TEAM_COLUMN, '選択肢']
+
+
+class IncrementalState:
+    """増分取り込みの状態（取り込み済みの範囲と集計結果）"""
+
+    def __init__(self, source_path, byte_offset, prefix_hash, watermark, columns, n_rows, day_month_evidence,
+                 likert_cubes, cross_tables, multiselect_counts):
+        self.source_path = os.path.abspath(source_path)
+        self.byte_offset = byte_offset        # 取り込み済みのバイト数（ヘッダー行を含む）
+        self.prefix_hash = prefix_hash        # 取り込み済み範囲の内容ハッシュ
+        self.watermark = watermark            # 取り込み済みの最新タイムスタンプ
+        self.columns = list(columns)          # 集計用の列名（スキーマの照合に使う）
+        self.n_rows = n_rows                  # 取り込み済みの回答数
+        self.day_month_evidence = day_month_evidence    # 取り込み済みの回答の月と日の解釈の根拠
+        self.likert_cubes = likert_cubes
+        self.cross_tables = cross_tables
+        self.multiselect_counts = multiselect_counts
+
+    def read_appended(self, source_path):
+        """取り込み済みの範囲が変更されていなければ、(ヘッダー行, 追記分, 更新後のハッシュ) を返す
+
+        取り込み済みの範囲が変更されている場合はNoneを返す。
+        """
+        if os.path.abspath(source_path) != self.source_path:
+            return None
+        return read_appended(source_path, self.byte_offset, self.prefix_hash)
+
+    @classmethod
+    def load(cls, state_dir=INCREMENTAL_STATE_PATH):
+        """保存済みの状態を読み込む（存在しない・無効な場合はNone）"""
+        meta_path = os.path.join(state_dir, META_FILENAME)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != STATE_FORMAT_VERSION:
+                return None
+
+            likert_cubes = {}
+            for section, axes in meta['likert_cubes'].items():
+                arrays = np.load(os.path.join(state_dir, f'cube_{section}.npz'))
+                likert_cubes[section] = LikertCube(
+                    arrays['counts'], arrays['group_sizes'], axes['months'], axes['teams'],
+                    axes['items'], axes['levels'], arrays['scores']
+                )
+
+            cross_tables = {}
+            for process_type, axes in meta['cross_tables'].items():
+                arrays = np.load(os.path.join(state_dir, f'cross_{process_type}.npz'))
+                cross_tables[process_type] = CrossTabCube(
+                    arrays['counts'], axes['months'], axes['teams'], axes['items'],
+                    axes['row_levels'], axes['column_levels']
+                )
+
+            multiselect_counts = {}
+            for key, records in meta['multiselect_counts'].items():
+                counts = pd.DataFrame(records, columns=MULTISELECT_INDEX + ['count'])
+                multiselect_counts[key] = counts.set_index(MULTISELECT_INDEX)['count'].rename(None)
+
+            watermark = pd.Timestamp(meta['watermark']) if meta['watermark'] else None
+            return cls(
+                meta['source_path'], meta['byte_offset'], meta['prefix_hash'], watermark, meta['columns'],
+                meta['n_rows'], meta['day_month_evidence'], likert_cubes, cross_tables, multiselect_counts
+            )
+        except (OSError, ValueError, KeyError):
+            # 破損した状態は無視して全件再構築させる
+            return None
+
+    def save(self, state_dir=INCREMENTAL_STATE_PATH):
+        """状態を保存（一時ディレクトリに書き出してから置き換える）"""
+        parent_dir = os.path.dirname(os.path.abspath(state_dir))
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_dir = os.path.join(parent_dir, f'.tmp-{uuid.uuid4().hex}')
+
+        try:
+            os.makedirs(tmp_dir)
+            cube_axes = {}
+            for section, cube in self.likert_cubes.items():
+                np.savez(
+                    os.path.join(tmp_dir, f'cube_{section}.npz'),
+                    counts=cube.counts, group_sizes=cube.group_sizes, scores=cube.scores
+                )
+                cube_axes[section] = {
+                    'months': cube.months, 'teams': cube.teams,
+                    'items': cube.items, 'levels': cube.levels,
+                }
+
+            cross_axes = {}
+            for process_type, cube in self.cross_tables.items():
+                np.savez(os.path.join(tmp_dir, f'cross_{process_type}.npz'), counts=cube.counts)
+                cross_axes[process_type] = {
+                    'months': cube.months, 'teams': cube.teams, 'items': cube.items,
+                    'row_levels': cube.row_levels, 'column_levels': cube.column_levels,
+                }
+
+            multiselect_records = {
+                key: [
+                    [None if pd.isna(v) else v for v in key_values] + [int(count)]
+                    for key_values, count in counts.items()
+                ]
+                for key, counts in self.multiselect_counts.items()
+            }
+
+            meta = {
+                'version': STATE_FORMAT_VERSION,
+                'source_path': self.source_path,
+                'byte_offset': self.byte_offset,
+                'prefix_hash': self.prefix_hash,
+                'watermark': self.watermark.isoformat() if self.watermark is not None else None,
+                'columns': self.columns,
+                'n_rows': self.n_rows,
+                'day_month_evidence': self.day_month_evidence,
+                'likert_cubes': cube_axes,
+                'cross_tables': cross_axes,
+                'multiselect_counts': multiselect_records,
+            }
+            with open(os.path.join(tmp_dir, META_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            shutil.rmtree(state_dir, ignore_errors=True)
+            os.replace(tmp_dir, state_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
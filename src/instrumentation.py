@@ -0,0 +1,117 @@
+"""
+処理ステージごとの計測（実行時間・CPU時間・メモリ・行数）
+
+各ステージの計測結果をJSONとPrometheusのテキスト形式で出力できる。
+"""
+
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Windows では resource モジュールがないため、最大RSSは記録しない
+    resource = None
+
+METRIC_PREFIX = 'survey_stage'
+
+# Prometheus 形式で出力する指標（記録のキー, 指標名, 説明）
+PROMETHEUS_METRICS = [
+    ('wall_seconds', 'wall_seconds', '処理ステージの実行時間（秒）'),
+    ('cpu_seconds', 'cpu_seconds', '処理ステージのCPU時間（ステージを実行したスレッドのみ、秒）'),
+    ('peak_rss_bytes', 'peak_rss_bytes', 'ステージ終了時点のプロセスの最大RSS（バイト）'),
+    ('tracemalloc_peak_bytes', 'tracemalloc_peak_bytes', 'ステージ中のPythonのメモリ確保量のピーク（バイト）'),
+    ('rows', 'rows', 'ステージ終了時点のデータの行数'),
+]
+
+
+def get_peak_rss():
+    """プロセスの最大RSS（バイト）。取得できない環境ではNone"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux はキロバイト、macOS はバイト単位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageRecorder:
+    """処理ステージごとの計測結果を記録する"""
+
+    def __init__(self, row_counter=None, trace_memory=False):
+        self.row_counter = row_counter      # ステージ終了時点の行数を返す関数
+        self.trace_memory = trace_memory    # True の場合は tracemalloc でメモリ確保量のピークも記録
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """with ブロック内の処理を1つのステージとして計測"""
+        tracing = self.trace_memory
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        started_at = datetime.now().isoformat(timespec='milliseconds')
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'started_at': started_at,
+                'wall_seconds': time.perf_counter() - wall_start,
+                'cpu_seconds': time.thread_time() - cpu_start,
+                'peak_rss_bytes': get_peak_rss(),
+                'tracemalloc_peak_bytes': tracemalloc.get_traced_memory()[1] if tracing else None,
+                'rows': self.row_counter() if self.row_counter is not None else None,
+            }
+            with self._lock:
+                self.records.append(record)
+
+    def latest(self):
+        """ステージごとの最新の計測結果（記録順）"""
+        with self._lock:
+            records = list(self.records)
+        latest = {}
+        for record in records:
+            latest.pop(record['stage'], None)
+            latest[record['stage']] = record
+        return list(latest.values())
+
+    def to_json(self):
+        """全ての計測結果をJSON文字列として出力"""
+        with self._lock:
+            records = list(self.records)
+        return json.dumps({'stages': records}, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """ステージごとの最新の計測結果をPrometheusのテキスト形式で出力"""
+        latest = self.latest()
+        lines = []
+        for key, metric, description in PROMETHEUS_METRICS:
+            samples = [record for record in latest if record[key] is not None]
+            if not samples:
+                continue
+            name = f'{METRIC_PREFIX}_{metric}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            for record in samples:
+                stage = record['stage'].replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{stage="{stage}"}} {record[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path=None, prometheus_path=None):
+        """計測結果をファイルに保存"""
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_json())
+        if prometheus_path:
+            with open(prometheus_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
@@ -0,0 +1,173 @@
+"""
+ダッシュボードの描画プロファイリング
+
+URLに ?profile=1（または環境変数 SURVEY_DASHBOARD_PROFILE=1）を指定した場合のみ有効になり、
+main() のセクションごとの処理時間、create_* 関数の計算時間、Plotlyの図のシリアライズ時間と
+送信サイズを計測してサイドバーに表示する。?profile=cprofile の場合は再実行ごとに
+cProfile の結果を PROFILE_PATH に保存する。
+"""
+
+import cProfile
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+from config import *
+
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_ENV_VAR = 'SURVEY_DASHBOARD_PROFILE'
+
+# 再実行中のセッションのプロファイラ（Streamlitはセッションごとに別スレッドでスクリプトを実行する）
+_current = threading.local()
+
+
+def get_profile_mode():
+    """プロファイリングの指定（'1' / 'cprofile'）。指定がない場合はNone"""
+    mode = st.query_params.get(PROFILE_QUERY_PARAM) or os.environ.get(PROFILE_ENV_VAR)
+    if mode in ('1', 'true', 'cprofile'):
+        return mode
+    return None
+
+
+def profiled(func):
+    """create_* 関数の計算時間を、プロファイリング中のみ記録するデコレーター"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = getattr(_current, 'profiler', None)
+        if profiler is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.builds.append({
+                'function': func.__name__,
+                'seconds': time.perf_counter() - start,
+            })
+    return wrapper
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart と同じ。プロファイリング中はシリアライズ時間と送信サイズも記録する"""
+    profiler = getattr(_current, 'profiler', None)
+    if profiler is None:
+        return st.plotly_chart(fig, **kwargs)
+
+    # Streamlit と同じ方法でシリアライズし、送信されるJSONのサイズを測る
+    start = time.perf_counter()
+    payload = pio.to_json(fig, validate=False)
+    serialize_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = st.plotly_chart(fig, **kwargs)
+    profiler.charts.append({
+        # 同じタイトルの図（上流工程と開発工程など）を区別するため描画順の番号を付ける
+        'chart': f"{len(profiler.charts) + 1}. {fig.layout.title.text or '（タイトルなし）'}",
+        'serialize_seconds': serialize_seconds,
+        'render_seconds': time.perf_counter() - start,
+        'payload_kb': len(payload.encode('utf-8')) / 1024,
+    })
+    return result
+
+
+def profile_section(name):
+    """プロファイリング中であれば、直前のセクションを終了して新しいセクションの計測を開始"""
+    profiler = getattr(_current, 'profiler', None)
+    if profiler is not None:
+        profiler.section(name)
+
+
+class RenderProfiler:
+    """1回の再実行の計測結果（セクション・create_* 関数・図）"""
+
+    def __init__(self, use_cprofile=False):
+        self.sections = []
+        self.builds = []
+        self.charts = []
+        self.dump_path = None
+        self._section = None
+        self._section_start = None
+        self._started = None
+        self.total_seconds = None
+        self._cprofile = cProfile.Profile() if use_cprofile else None
+
+    def start(self):
+        """このスレッドでの計測を開始"""
+        _current.profiler = self
+        if self._cprofile is not None:
+            try:
+                self._cprofile.enable()
+            except ValueError:
+                # 他のセッションで cProfile が動作中の場合は時間の計測のみ行う
+                print("警告: 他のプロファイラが動作中のため、cProfile の記録を省略します")
+                self._cprofile = None
+        self._started = time.perf_counter()
+
+    def section(self, name):
+        """直前のセクションを終了し、新しいセクションの計測を開始"""
+        now = time.perf_counter()
+        if self._section is not None:
+            self.sections.append({'section': self._section, 'seconds': now - self._section_start})
+        self._section = name
+        self._section_start = now
+
+    def finish(self):
+        """計測を終了（cProfile の結果はファイルに保存）"""
+        self.section(None)
+        self.total_seconds = time.perf_counter() - self._started
+        _current.profiler = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            os.makedirs(PROFILE_PATH, exist_ok=True)
+            self.dump_path = os.path.join(
+                PROFILE_PATH, f"rerun-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.prof"
+            )
+            self._cprofile.dump_stats(self.dump_path)
+
+    def render_sidebar(self):
+        """計測結果をサイドバーに表示"""
+        with st.sidebar.expander("⏱️ 描画プロファイル", expanded=True):
+            st.markdown(f"**再実行の合計**: {self.total_seconds * 1000:.0f} ms")
+
+            if self.sections:
+                sections = pd.DataFrame(self.sections).set_index('section')
+                sections['ms'] = sections.pop('seconds') * 1000
+                st.markdown("**セクション別**")
+                st.dataframe(sections.round(1), use_container_width=True)
+
+            if self.builds:
+                builds = pd.DataFrame(self.builds).groupby('function')['seconds'].agg(['count', 'sum'])
+                builds = builds.rename(columns={'count': '回数', 'sum': 'ms'})
+                builds['ms'] *= 1000
+                st.markdown("**create_* 関数（計算）**")
+                st.dataframe(builds.sort_values('ms', ascending=False).round(1), use_container_width=True)
+            else:
+                st.caption("create_* 関数の計算はありません（全て計算済みの結果を再利用）")
+
+            if self.charts:
+                charts = pd.DataFrame(self.charts).set_index('chart')
+                charts['シリアライズ ms'] = charts.pop('serialize_seconds') * 1000
+                charts['描画 ms'] = charts.pop('render_seconds') * 1000
+                charts['サイズ KB'] = charts.pop('payload_kb')
+                st.markdown("**図（シリアライズ・送信サイズ）**")
+                st.dataframe(charts.sort_values('サイズ KB', ascending=False).round(1), use_container_width=True)
+                st.caption(f"送信サイズの合計: {charts['サイズ KB'].sum():.1f} KB")
+
+            if self.dump_path:
+                st.caption(f"cProfile: `{self.dump_path}`")
+
+
+def start_render_profiler():
+    """プロファイリングが指定されていれば計測を開始し、プロファイラを返す（指定がない場合はNone）"""
+    mode = get_profile_mode()
+    if mode is None:
+        return None
+    profiler = RenderProfiler(use_cprofile=(mode == 'cprofile'))
+    profiler.start()
+    return profiler
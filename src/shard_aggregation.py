@@ -0,0 +1,355 @@
+"""
+年月ごとに分割した複数プロセスでの集計
+
+型変換済みのDataFrameを年月順に並べ替え、集計に使う列を整数コードの配列として共有メモリに
+書き出す（DataFrameはpickleしない）。ワーカープロセスは共有メモリの配列を参照して、年月ごとの
+区間（行数の多い年月はさらに分割）ごとにリッカート設問・クロス集計の回答数と複数選択の件数を
+部分集計し、親プロセスで合算する。部分集計の合算は加算（初出の位置は最小値）のみのため、
+区間の分け方や完了順によらず1プロセスでの集計と同じ結果になる。
+"""
+
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from survey_cube import CrossTabCube, LikertCube
+
+# 1つの区間の最小行数（これより細かく分割してもプロセス間の受け渡しの負担が増えるだけのため）
+SHARD_MIN_ROWS = 10_000
+
+# ワーカーあたりの区間数の目安（区間の大きさの偏りを均すため、ワーカー数より多めに分割する）
+SHARDS_PER_WORKER = 4
+
+# ワーカープロセスが参照する共有メモリの配列と集計の定義（initializer で設定）
+_worker = {}
+
+
+def own_codes(series):
+    """列の値の整数コード（欠損は -1）とカテゴリ一覧。カテゴリ型の列はコードをそのまま使う"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, list(uniques)
+
+
+def code_lookup(categories, axis):
+    """列のコードを axis 内の位置（該当なし・欠損は -1）に変換する配列（末尾がコード -1 用）
+
+    category_codes と同じ変換を、ワーカーでコードの付け替えだけで行うために使う。
+    """
+    return np.append(pd.Index(axis).get_indexer(categories), -1).astype(np.int64)
+
+
+def code_dtype(n_categories):
+    """カテゴリ数 n_categories のコード（欠損の -1 を含む）を保持できる最小の整数型"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def decode(codes, categories, dtype):
+    """整数コード（欠損は -1）を元の列と同じ型の値に戻す"""
+    lookup = np.empty(len(categories) + 1, dtype=object)
+    lookup[:-1] = categories
+    lookup[-1] = np.nan
+    return pd.Series(lookup[codes], dtype=object).astype(dtype)
+
+
+def split_choices(answers):
+    """複数選択の回答（カンマ区切り）ごとの選択肢を、選択肢の一覧と (開始位置, 個数, 選択肢の番号) に展開"""
+    vocabulary = {}
+    lengths = np.empty(len(answers), dtype=np.int64)
+    choice_ids = []
+    for i, answer in enumerate(answers):
+        choices = [choice.strip() for choice in str(answer).split(',')]
+        lengths[i] = len(choices)
+        choice_ids.extend(vocabulary.setdefault(choice, len(vocabulary)) for choice in choices)
+    offsets = np.cumsum(lengths) - lengths
+    return list(vocabulary), offsets, lengths, np.array(choice_ids, dtype=np.int64)
+
+
+def shard_bounds(month_codes, n_workers):
+    """年月順に並べたコードを、年月ごと（行数の多い年月はさらに分割）の (開始, 終了) の区間に分割"""
+    n_rows = len(month_codes)
+    shard_rows = max(SHARD_MIN_ROWS, math.ceil(n_rows / (n_workers * SHARDS_PER_WORKER)))
+    # 年月が変わる位置
+    edges = np.flatnonzero(np.diff(month_codes)) + 1
+    bounds = []
+    for start, stop in zip(np.r_[0, edges], np.r_[edges, n_rows]):
+        n_pieces = max(1, math.ceil((stop - start) / shard_rows))
+        cuts = np.linspace(start, stop, n_pieces + 1).round().astype(np.int64)
+        bounds.extend((int(a), int(b)) for a, b in zip(cuts[:-1], cuts[1:]))
+    return bounds
+
+
+class SharedArrays:
+    """共有メモリ上の配列（名前・形状・型をワーカーに渡し、ワーカーはコピーせずに参照する）"""
+
+    def __init__(self):
+        self.spec = {}
+        self._blocks = []
+
+    def create(self, key, shape, dtype):
+        """共有メモリ上に配列を確保"""
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self._blocks.append(block)
+        self.spec[key] = (block.name, tuple(shape), dtype.str)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def close(self):
+        """共有メモリを解放"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_shared_arrays(spec):
+    """共有メモリ上の配列を参照する（ブロックは参照中に解放されないよう配列と一緒に返す）"""
+    blocks, arrays = [], {}
+    for key, (name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+def _init_worker(spec, layout):
+    """ワーカープロセスの初期化（共有メモリの配列と集計の定義を保持）"""
+    _worker['blocks'], _worker['arrays'] = attach_shared_arrays(spec)
+    _worker['layout'] = layout
+
+
+def _remapped(key, start, stop):
+    """区間のコードを集計の軸での位置に付け替えた (行, 項目) の行列"""
+    codes = _worker['arrays'][key][:, start:stop]
+    lookups = _worker['layout']['lookups'][key]
+    return np.column_stack([lookup[column] for lookup, column in zip(lookups, codes)])
+
+
+def aggregate_shard(bounds):
+    """1つの区間の部分集計（ワーカープロセスで実行）"""
+    start, stop = bounds
+    arrays, layout = _worker['arrays'], _worker['layout']
+    month_codes = arrays['month'][start:stop]
+    team_codes = arrays['team'][start:stop]
+    months = layout['month_lookup'][month_codes]
+    teams = layout['team_lookup'][team_codes]
+
+    result = {'likert': {}, 'cross': {}, 'multiselect': {}}
+    for section, (items, value_map) in layout['likert'].items():
+        level_codes = _remapped(f'likert:{section}', start, stop) if items else None
+        cube = LikertCube.from_codes(
+            months, teams, level_codes, layout['months'], layout['teams'], items, value_map
+        )
+        result['likert'][section] = (cube.counts, cube.group_sizes)
+
+    for process_type, (items, row_levels, column_levels) in layout['cross'].items():
+        row_codes = column_codes = None
+        if items:
+            row_codes = _remapped(f'cross_row:{process_type}', start, stop)
+            column_codes = _remapped(f'cross_column:{process_type}', start, stop)
+        cube = CrossTabCube.from_codes(
+            months, teams, row_codes, column_codes, layout['months'], layout['teams'], items,
+            row_levels, column_levels
+        )
+        result['cross'][process_type] = cube.counts
+
+    row_ids = arrays['row'][start:stop]
+    for key, (offsets, lengths, choice_ids, n_choices, max_length) in layout['multiselect'].items():
+        result['multiselect'][key] = _count_choices(
+            arrays[f'multiselect:{key}'][start:stop], row_ids, month_codes, team_codes,
+            offsets, lengths, choice_ids, n_choices, max_length, layout['n_team_codes']
+        )
+    return result
+
+
+def _count_choices(codes, row_ids, month_codes, team_codes, offsets, lengths, choice_ids, n_choices,
+                   max_length, n_team_codes):
+    """区間の複数選択の回答を選択肢に展開し、(年月, チーム, 選択肢) ごとの件数と初出の位置を集計
+
+    キーは (年月のコード+1, チームのコード+1, 選択肢の番号) を1つの整数にまとめたもの。
+    初出の位置は (元の行の位置, 回答内での選択肢の順番) を1つの整数にまとめたもの。
+    """
+    answered = np.flatnonzero(codes >= 0)
+    answer_codes = codes[answered].astype(np.int64)
+    n_choices_per_row = lengths[answer_codes]
+    rows = np.repeat(answered, n_choices_per_row)
+    row_starts = np.cumsum(n_choices_per_row) - n_choices_per_row
+    order_in_row = np.arange(len(rows)) - np.repeat(row_starts, n_choices_per_row)
+    choices = choice_ids[np.repeat(offsets[answer_codes], n_choices_per_row) + order_in_row]
+
+    group = (month_codes[rows].astype(np.int64) + 1) * (n_team_codes + 1) + (team_codes[rows].astype(np.int64) + 1)
+    keys = group * n_choices + choices
+    # 区間内の行は元の順序のままのため、最初に現れた位置がそのキーの初出の位置
+    positions = row_ids[rows] * max_length + order_in_row
+    unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return unique_keys, np.bincount(inverse, minlength=len(unique_keys)), positions[first_index]
+
+
+class ShardedAggregation:
+    """年月ごとに分割した区間を複数プロセスで部分集計し、合算する
+
+    likert は {設問キー: (項目の列の位置の辞書, 回答ラベルのマッピング)}、
+    cross は {工程: (項目の列の位置の辞書, 行の回答レベル, 列の回答レベル)}、
+    multiselect は {設問キー: 列の位置} で、集計する内容を指定する。
+    """
+
+    def __init__(self, df, months, teams, likert=None, cross=None, multiselect=None):
+        self.df = df
+        self.months = list(months)
+        self.teams = list(teams)
+        self.likert = likert or {}
+        self.cross = cross or {}
+        self.multiselect = multiselect or {}
+
+    def _share_columns(self, shared, order, key, positions, axis):
+        """列のコードを年月順に並べて (項目, 行) の共有配列に書き出し、軸への付け替え表を返す"""
+        columns = [own_codes(self.df.iloc[:, position]) for position in positions]
+        n_categories = max([len(categories) for _, categories in columns], default=0)
+        array = shared.create(key, (len(columns), len(order)), code_dtype(n_categories))
+        for i, (codes, _) in enumerate(columns):
+            np.take(codes, order, out=array[i])
+        return [code_lookup(categories, axis) for _, categories in columns]
+
+    def _prepare(self, shared):
+        """集計に使う列を年月順に共有メモリへ書き出し、ワーカーに渡す集計の定義を作成
+
+        (集計の定義, 複数選択の選択肢の一覧, 年月順に並べた年月のコード, 年月とチームのカテゴリ一覧) を返す。
+        """
+        month_codes, month_categories = own_codes(self.df['年月'])
+        team_codes, team_categories = own_codes(self.df[TEAM_COLUMN])
+        # 年月順（欠損は先頭）に並べ替える。同じ年月の中では元の行の順序を保つ
+        order = np.argsort(month_codes, kind='stable')
+
+        shared.create('row', (len(order),), np.int64)[:] = order
+        sorted_months = shared.create('month', (len(order),), code_dtype(len(month_categories)))
+        np.take(month_codes, order, out=sorted_months)
+        np.take(team_codes, order, out=shared.create('team', (len(order),), code_dtype(len(team_categories))))
+
+        layout = {
+            'months': self.months,
+            'teams': self.teams,
+            'month_lookup': code_lookup(month_categories, self.months),
+            'team_lookup': code_lookup(team_categories, self.teams),
+            'n_team_codes': len(team_categories),
+            'lookups': {},
+            'likert': {},
+            'cross': {},
+            'multiselect': {},
+        }
+        for section, (item_positions, value_map) in self.likert.items():
+            key = f'likert:{section}'
+            layout['lookups'][key] = self._share_columns(
+                shared, order, key, list(item_positions.values()), list(value_map)
+            )
+            layout['likert'][section] = (list(item_positions), value_map)
+
+        for process_type, (item_positions, row_levels, column_levels) in self.cross.items():
+            for side, positions, levels in (
+                ('row', [row for row, _ in item_positions.values()], row_levels),
+                ('column', [column for _, column in item_positions.values()], column_levels),
+            ):
+                key = f'cross_{side}:{process_type}'
+                layout['lookups'][key] = self._share_columns(shared, order, key, positions, levels)
+            layout['cross'][process_type] = (list(item_positions), list(row_levels), list(column_levels))
+
+        vocabularies = {}
+        for key, position in self.multiselect.items():
+            codes, answers = own_codes(self.df.iloc[:, position])
+            vocabulary, offsets, lengths, choice_ids = split_choices(answers)
+            array = shared.create(f'multiselect:{key}', (len(order),), code_dtype(len(answers)))
+            np.take(codes, order, out=array)
+            max_length = int(lengths.max()) if len(lengths) else 1
+            layout['multiselect'][key] = (offsets, lengths, choice_ids, max(1, len(vocabulary)), max_length)
+            vocabularies[key] = vocabulary
+
+        return layout, vocabularies, sorted_months, (month_categories, team_categories)
+
+    def run(self, n_workers):
+        """n_workers 個のプロセスで部分集計して合算する
+
+        {'likert_cubes': {設問キー: LikertCube}, 'cross_tables': {工程: CrossTabCube},
+        'multiselect_counts': {設問キー: 年月×チーム×選択肢の件数}} を返す。
+        """
+        with SharedArrays() as shared:
+            layout, vocabularies, sorted_months, categories = self._prepare(shared)
+            bounds = shard_bounds(sorted_months, n_workers)
+            # 集計処理は複数のスレッドから呼ばれるため、fork ではなく spawn でワーカーを起動する
+            with ProcessPoolExecutor(
+                max_workers=min(n_workers, len(bounds)), mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(shared.spec, layout)
+            ) as executor:
+                partials = list(executor.map(aggregate_shard, bounds))
+
+        return {
+            'likert_cubes': self._merge_likert(partials),
+            'cross_tables': self._merge_cross(partials),
+            'multiselect_counts': {
+                key: self._merge_multiselect(partials, key, vocabularies[key], layout, *categories)
+                for key in self.multiselect
+            },
+        }
+
+    def _merge_likert(self, partials):
+        """リッカート設問の部分集計を合算"""
+        cubes = {}
+        for section, (item_positions, value_map) in self.likert.items():
+            cube = LikertCube.from_codes([], [], None, self.months, self.teams, list(item_positions), value_map)
+            cube.counts = sum((partial['likert'][section][0] for partial in partials), cube.counts)
+            cube.group_sizes = sum((partial['likert'][section][1] for partial in partials), cube.group_sizes)
+            cubes[section] = cube
+        return cubes
+
+    def _merge_cross(self, partials):
+        """クロス集計の部分集計を合算"""
+        cubes = {}
+        for process_type, (item_positions, row_levels, column_levels) in self.cross.items():
+            cube = CrossTabCube.from_codes(
+                [], [], None, None, self.months, self.teams, list(item_positions), row_levels, column_levels
+            )
+            cube.counts = sum((partial['cross'][process_type] for partial in partials), cube.counts)
+            cubes[process_type] = cube
+        return cubes
+
+    def _merge_multiselect(self, partials, key, vocabulary, layout, month_categories, team_categories):
+        """複数選択の部分集計を合算し、1プロセスでの集計と同じ形式・順序の件数にする
+
+        件数は合計、初出の位置は最小値で合算し、初出の順に並べる（groupby(sort=False) と同じ順序）。
+        """
+        keys, counts, positions = (
+            np.concatenate([partial['multiselect'][key][i] for partial in partials]) for i in range(3)
+        )
+        merged = (
+            pd.DataFrame({'key': keys, 'count': counts, 'position': positions})
+            .groupby('key', sort=False)
+            .agg(count=('count', 'sum'), position=('position', 'min'))
+            .sort_values('position')
+        )
+
+        n_choices = layout['multiselect'][key][3]
+        group, choices = np.divmod(merged.index.to_numpy(), n_choices)
+        month_codes, team_codes = np.divmod(group, layout['n_team_codes'] + 1)
+        answers = pd.DataFrame({
+            '年月': decode(month_codes - 1, month_categories, self.df['年月'].dtype),
+            TEAM_COLUMN: decode(team_codes - 1, team_categories, self.df[TEAM_COLUMN].dtype),
+            '選択肢': np.array(vocabulary, dtype=object)[choices],
+            'count': merged['count'].to_numpy(),
+        })
+        counts = answers.groupby(['年月', TEAM_COLUMN, '選択肢'], sort=False, dropna=False, observed=True)['count']
+        return counts.sum().rename(None)
+
@@ -0,0 +1,78 @@
+"""
+依存関係を考慮した処理ステージの並行実行
+
+各ステージは、依存先のステージが全て完了した時点でスレッドプールに投入される。
+同時に実行可能になったステージは、steps に指定した順に投入する。
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def resolve_stage_workers(max_workers, n_steps):
+    """ステージを並行して実行するスレッド数（None の場合はCPUコア数。ステージ数を上限とする）"""
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers < 1:
+        raise ValueError("ステージの並行数は1以上を指定してください")
+    return max(1, min(max_workers, n_steps))
+
+
+def topological_order(steps, dependencies):
+    """依存関係を満たすステージの実行順（依存関係で決まらない順序は steps の順）
+
+    dependencies は {ステージ: 先に完了している必要があるステージのリスト}。
+    """
+    steps = list(steps)
+    unknown = {dep for step in steps for dep in dependencies.get(step, ()) if dep not in steps}
+    if unknown:
+        raise ValueError(f"依存先のステージが見つかりません: {', '.join(sorted(unknown))}")
+
+    order, done = [], set()
+    pending = list(steps)
+    while pending:
+        ready = [step for step in pending if set(dependencies.get(step, ())) <= done]
+        if not ready:
+            raise ValueError(f"ステージの依存関係が循環しています: {', '.join(pending)}")
+        step = ready[0]
+        order.append(step)
+        done.add(step)
+        pending.remove(step)
+    return order
+
+
+def run_stages(steps, dependencies, run, max_workers=None, on_start=None):
+    """ステージを依存関係に従って実行（max_workers が1の場合は呼び出し元のスレッドで順に実行）
+
+    run(step) で各ステージを実行し、on_start(step) は投入時に呼び出し元のスレッドで呼ばれる。
+    いずれかのステージで例外が発生した場合は、実行中のステージの完了を待ってから
+    （未投入のステージは実行せずに）その例外を送出する。
+    """
+    order = topological_order(steps, dependencies)
+    max_workers = resolve_stage_workers(max_workers, len(order))
+    if max_workers == 1:
+        for step in order:
+            if on_start is not None:
+                on_start(step)
+            run(step)
+        return order
+
+    rank = {step: i for i, step in enumerate(order)}
+    done = set()
+    pending = list(order)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stage') as executor:
+        while pending or running:
+            for step in [step for step in pending if set(dependencies.get(step, ())) <= done]:
+                pending.remove(step)
+                if on_start is not None:
+                    on_start(step)
+                running[executor.submit(run, step)] = step
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            # 同時に完了したステージは実行順に確認する（例外の送出を決定的にするため）
+            for future in sorted(finished, key=lambda future: rank[running[future]]):
+                step = running.pop(future)
+                future.result()
+                done.add(step)
+    return order
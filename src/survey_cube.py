@@ -0,0 +1,284 @@
+"""
+リッカート尺度設問の回答数テンソル（年月×チーム×項目×回答レベル）
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import *
+
+
+def sort_periods(periods):
+    """「2025年5月」形式の年月ラベルを実際の日付順に並べる（解釈できないラベルは末尾）"""
+    labels = pd.Series(pd.unique(pd.Series(periods).dropna()), dtype=object)
+    dates = pd.to_datetime(labels, format='%Y年%m月', errors='coerce')
+    order = pd.DataFrame({'label': labels, 'date': dates}).sort_values(['date', 'label'], na_position='last')
+    return order['label'].tolist()
+
+
+def category_codes(values, categories):
+    """値を categories 内の位置（該当なしは -1）の int64 配列に変換
+
+    カテゴリ型の列は文字列を比較せず、整数コードの付け替えだけで変換する。
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # 末尾の -1 により、欠損値のコード -1 はそのまま -1 になる
+        lookup = np.append(pd.Index(categories).get_indexer(values.cat.categories), -1)
+        return lookup[values.cat.codes.to_numpy()]
+    return pd.Categorical(values, categories=categories).codes.astype(np.int64)
+
+
+def encode_count_index(counts, months, teams):
+    """年月×チーム×選択肢の件数の年月・チームを、全件のDataFrameから集計した場合と同じカテゴリ型にする
+
+    行の順序は保つ。months・teams はカテゴリの一覧（年月は日付順、チームは名前順）。
+    """
+    frame = counts.rename('count').reset_index()
+    frame['年月'] = frame['年月'].astype(object).astype(pd.CategoricalDtype(months))
+    frame[TEAM_COLUMN] = frame[TEAM_COLUMN].astype(object).astype(pd.CategoricalDtype(teams))
+    grouped = frame.groupby(['年月', TEAM_COLUMN, '選択肢'], sort=False, dropna=False, observed=True)['count']
+    return grouped.sum().rename(None)
+
+
+class LikertCube:
+    """年月×チーム×項目×回答レベルの回答数を保持する集計テンソル
+
+    平均・分布・回答数はすべてこのテンソルの配列演算で求める。
+    """
+
+    def __init__(self, counts, group_sizes, months, teams, items, levels, scores):
+        self.counts = counts              # (年月, チーム, 項目, 回答レベル) の回答数
+        self.group_sizes = group_sizes    # (年月, チーム) の回答者数（未回答の項目も含む）
+        self.months = list(months)
+        self.teams = list(teams)
+        self.items = list(items)
+        self.levels = list(levels)
+        self.scores = scores              # 回答レベルごとのスコア（スコアなしはNaN）
+
+    @classmethod
+    def from_frame(cls, df, item_positions, value_map, months=None, teams=None):
+        """回答データからテンソルを構築
+
+        item_positions は {項目名: 列の位置} の辞書、value_map は回答ラベルからスコアへのマッピング。
+        """
+        if months is None:
+            months = sort_periods(df['年月'])
+        if teams is None:
+            teams = sorted(df[TEAM_COLUMN].dropna().unique())
+        levels = list(value_map)
+
+        # 全項目の回答レベルを (行, 項目) の整数コード行列に変換
+        level_codes = None
+        if item_positions and len(df) > 0:
+            level_codes = np.column_stack([
+                category_codes(df.iloc[:, position], levels)
+                for position in item_positions.values()
+            ])
+        return cls.from_codes(
+            category_codes(df['年月'], months), category_codes(df[TEAM_COLUMN], teams), level_codes,
+            months, teams, list(item_positions), value_map
+        )
+
+    @classmethod
+    def from_codes(cls, month_codes, team_codes, level_codes, months, teams, items, value_map):
+        """年月・チーム・回答レベルの整数コード（該当なしは -1）からテンソルを構築
+
+        level_codes は (行, 項目) の行列（項目または行がない場合はNone）。
+        """
+        items = list(items)
+        levels = list(value_map)
+        scores = np.array([np.nan if v is None else v for v in value_map.values()], dtype=float)
+
+        month_codes = np.asarray(month_codes, dtype=np.int64)
+        team_codes = np.asarray(team_codes, dtype=np.int64)
+        group_valid = (month_codes >= 0) & (team_codes >= 0)
+
+        n_months, n_teams, n_items, n_levels = len(months), len(teams), len(items), len(levels)
+        group_codes = month_codes * n_teams + team_codes
+
+        # 回答者数（年月×チーム）
+        group_sizes = np.bincount(
+            group_codes[group_valid], minlength=n_months * n_teams
+        ).reshape(n_months, n_teams)
+
+        # (行, 項目) の回答レベルを1回のbincountで集計
+        counts = np.zeros(n_months * n_teams * n_items * n_levels, dtype=np.int64)
+        if n_items > 0 and len(month_codes) > 0:
+            flat = (group_codes[:, None] * n_items + np.arange(n_items)) * n_levels + level_codes
+            valid = group_valid[:, None] & (level_codes >= 0)
+            counts = np.bincount(flat[valid], minlength=counts.size)
+
+        counts = counts.reshape(n_months, n_teams, n_items, n_levels)
+        return cls(counts, group_sizes, months, teams, items, levels, scores)
+
+    def merge(self, other):
+        """別のテンソルと回答数を合算（年月・チームの軸は和集合）"""
+        if self.items != other.items or self.levels != other.levels:
+            raise ValueError("項目または回答レベルが異なるテンソルは合算できません")
+
+        months = sort_periods(self.months + other.months)
+        teams = sorted(set(self.teams) | set(other.teams))
+        counts = np.zeros((len(months), len(teams)) + self.counts.shape[2:], dtype=np.int64)
+        group_sizes = np.zeros((len(months), len(teams)), dtype=np.int64)
+
+        for cube in (self, other):
+            index = np.ix_([months.index(m) for m in cube.months], [teams.index(t) for t in cube.teams])
+            counts[index] += cube.counts
+            group_sizes[index] += cube.group_sizes
+
+        return LikertCube(counts, group_sizes, months, teams, self.items, self.levels, self.scores)
+
+    def month_index(self, month):
+        return self.months.index(month) if month in self.months else None
+
+    def team_index(self, team):
+        return self.teams.index(team) if team in self.teams else None
+
+    def item_index(self, item):
+        return self.items.index(item) if item in self.items else None
+
+    def response_counts(self):
+        """スコアを持つ回答の件数 (年月, チーム, 項目)"""
+        scored = ~np.isnan(self.scores)
+        return self.counts[..., scored].sum(axis=-1)
+
+    def score_sums(self):
+        """スコアの合計 (年月, チーム, 項目)"""
+        scored = ~np.isnan(self.scores)
+        return self.counts[..., scored] @ self.scores[scored]
+
+    def means(self):
+        """平均スコア (年月, チーム, 項目)。回答がないセルはNaN"""
+        n = self.response_counts()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 0, self.score_sums() / np.maximum(n, 1), np.nan)
+
+    def monthly_means(self, item, team):
+        """指定した項目・チームの月別平均スコア（回答者のいる月のみ）"""
+        i, t = self.item_index(item), self.team_index(team)
+        if i is None or t is None:
+            return {}
+        means = self.means()[:, t, i]
+        return {
+            month: means[m]
+            for m, month in enumerate(self.months)
+            if self.group_sizes[m, t] > 0
+        }
+
+    def distribution(self, item, team=None, months=None):
+        """指定した項目の回答レベル別件数（チーム・年月で絞り込み可能）"""
+        i = self.item_index(item)
+        if i is None:
+            return pd.Series(0, index=self.levels, dtype=np.int64)
+
+        counts = self.counts[:, :, i, :]
+        if months is not None:
+            counts = counts[[self.months.index(m) for m in months if m in self.months]]
+        if team is not None:
+            t = self.team_index(team)
+            counts = counts[:, [t]] if t is not None else counts[:, :0]
+        return pd.Series(counts.sum(axis=(0, 1)), index=self.levels)
+
+    def item_frame(self, item, value_name):
+        """従来の集計と同じ形式（年月, チーム, 平均スコア）のDataFrameを作成"""
+        i = self.item_index(item)
+        m_idx, t_idx = np.nonzero(self.group_sizes > 0)
+        return pd.DataFrame({
+            '年月': [self.months[m] for m in m_idx],
+            TEAM_COLUMN: [self.teams[t] for t in t_idx],
+            value_name: self.means()[m_idx, t_idx, i],
+        })
+
+
+class CrossTabCube:
+    """年月×チーム×項目×行の回答レベル×列の回答レベルの回答数を保持するクロス集計テンソル
+
+    同じ項目に対する2つの設問（利用頻度と貢献度など）の回答の組み合わせを数える。
+    """
+
+    def __init__(self, counts, months, teams, items, row_levels, column_levels):
+        self.counts = counts    # (年月, チーム, 項目, 行の回答レベル, 列の回答レベル) の回答数
+        self.months = list(months)
+        self.teams = list(teams)
+        self.items = list(items)
+        self.row_levels = list(row_levels)
+        self.column_levels = list(column_levels)
+
+    @classmethod
+    def from_frame(cls, df, item_positions, row_levels, column_levels, months=None, teams=None):
+        """回答データからテンソルを構築
+
+        item_positions は {項目名: (行の設問の列の位置, 列の設問の列の位置)} の辞書。
+        両方の設問に回答した行のみを数える。
+        """
+        if months is None:
+            months = sort_periods(df['年月'])
+        if teams is None:
+            teams = sorted(df[TEAM_COLUMN].dropna().unique())
+
+        row_codes = column_codes = None
+        if item_positions and len(df) > 0:
+            row_codes = np.column_stack([
+                category_codes(df.iloc[:, row_position], row_levels)
+                for row_position, _ in item_positions.values()
+            ])
+            column_codes = np.column_stack([
+                category_codes(df.iloc[:, column_position], column_levels)
+                for _, column_position in item_positions.values()
+            ])
+        return cls.from_codes(
+            category_codes(df['年月'], months), category_codes(df[TEAM_COLUMN], teams), row_codes, column_codes,
+            months, teams, list(item_positions), row_levels, column_levels
+        )
+
+    @classmethod
+    def from_codes(cls, month_codes, team_codes, row_codes, column_codes, months, teams, items,
+                   row_levels, column_levels):
+        """年月・チーム・行と列の回答レベルの整数コード（該当なしは -1）からテンソルを構築
+
+        row_codes・column_codes は (行, 項目) の行列（項目または行がない場合はNone）。
+        """
+        items = list(items)
+        month_codes = np.asarray(month_codes, dtype=np.int64)
+        team_codes = np.asarray(team_codes, dtype=np.int64)
+        group_valid = (month_codes >= 0) & (team_codes >= 0)
+
+        shape = (len(months), len(teams), len(items), len(row_levels), len(column_levels))
+        counts = np.zeros(int(np.prod(shape)), dtype=np.int64)
+        if items and len(month_codes) > 0:
+            group_codes = (month_codes * len(teams) + team_codes)[:, None] * len(items) + np.arange(len(items))
+            flat = (group_codes * len(row_levels) + row_codes) * len(column_levels) + column_codes
+            valid = group_valid[:, None] & (row_codes >= 0) & (column_codes >= 0)
+            counts = np.bincount(flat[valid], minlength=counts.size)
+
+        return cls(counts.reshape(shape), months, teams, items, row_levels, column_levels)
+
+    def merge(self, other):
+        """別のテンソルと回答数を合算（年月・チームの軸は和集合）"""
+        if (self.items, self.row_levels, self.column_levels) != (other.items, other.row_levels, other.column_levels):
+            raise ValueError("項目または回答レベルが異なるテンソルは合算できません")
+
+        months = sort_periods(self.months + other.months)
+        teams = sorted(set(self.teams) | set(other.teams))
+        counts = np.zeros((len(months), len(teams)) + self.counts.shape[2:], dtype=np.int64)
+
+        for cube in (self, other):
+            index = np.ix_([months.index(m) for m in cube.months], [teams.index(t) for t in cube.teams])
+            counts[index] += cube.counts
+
+        return CrossTabCube(counts, months, teams, self.items, self.row_levels, self.column_levels)
+
+    def table(self, item, team=None, months=None):
+        """指定した項目の (行の回答レベル, 列の回答レベル) の回答数（チーム・年月で絞り込み可能）
+
+        項目がない場合はNoneを返す。
+        """
+        if item not in self.items:
+            return None
+
+        counts = self.counts[:, :, self.items.index(item)]
+        if months is not None:
+            counts = counts[[self.months.index(m) for m in months if m in self.months]]
+        if team is not None:
+            counts = counts[:, [self.teams.index(team)]] if team in self.teams else counts[:, :0]
+        return counts.sum(axis=(0, 1))
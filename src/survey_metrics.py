@@ -0,0 +1,200 @@
+"""
+ダッシュボードの指標計算
+
+回答数テンソルのみから計算する指標をまとめ、Streamlitに依存せずに事前計算できるようにする。
+"""
+
+import pandas as pd
+
+from config import *
+
+
+def average_monthly_score(cube, item, team, months=None):
+    """回答数テンソルから月別平均スコアの平均を計算（データがない場合は0）"""
+    monthly_scores = cube.monthly_means(item, team)
+    if months is not None:
+        monthly_scores = {m: v for m, v in monthly_scores.items() if m in months}
+    valid_scores = [v for v in monthly_scores.values() if pd.notna(v)]
+    return sum(valid_scores) / len(valid_scores) if valid_scores else 0
+
+
+def calculate_time_reduction_metrics(cube, process_type, baseline=None, comparison=None):
+    """工程別の時間削減効果指標を計算"""
+    # 比較期間の指定がない場合は最初と最後の月を比較
+    baseline = baseline or (cube.months[0] if cube.months else None)
+    comparison = comparison or (cube.months[-1] if cube.months else None)
+    
+    if process_type == 'upstream':
+        target_team = 'ディレクターチーム'
+    else:
+        target_team = 'エンジニアリングチーム'
+    
+    # 各作業の月別削減率を回答数テンソルから取得
+    task_scores = {}
+    for task in cube.items:
+        monthly_scores = cube.monthly_means(task, target_team)
+        if monthly_scores:
+            task_scores[task] = monthly_scores
+    
+    # 1. 最高削減効果作業（全期間の平均）
+    overall_avg = {}
+    for task, scores in task_scores.items():
+        if scores:
+            valid_scores = [v for v in scores.values() if pd.notna(v)]
+            if valid_scores:
+                overall_avg[task] = sum(valid_scores) / len(valid_scores)
+    
+    best_task = max(overall_avg, key=overall_avg.get) if overall_avg else None
+    best_score = overall_avg.get(best_task, 0) if best_task else 0
+    
+    # 2. 比較元から比較先で最も改善した作業
+    # 3. 平均削減効果
+    improvements = {}
+    all_scores = []
+    
+    for task, scores in task_scores.items():
+        if baseline in scores and comparison in scores:
+            baseline_score = scores[baseline]
+            comparison_score = scores[comparison]
+            if pd.notna(baseline_score) and pd.notna(comparison_score):
+                improvement = comparison_score - baseline_score
+                improvements[task] = {
+                    'improvement': improvement,
+                    'baseline_score': baseline_score,
+                    'comparison_score': comparison_score
+                }
+        
+        # 全スコアを収集（平均計算用）
+        for score in scores.values():
+            if pd.notna(score):
+                all_scores.append(score)
+    
+    # 最高改善作業
+    improved_task = None
+    max_improvement = 0
+    for task, improvement_data in improvements.items():
+        if improvement_data['improvement'] > max_improvement:
+            max_improvement = improvement_data['improvement']
+            improved_task = task
+    
+    # 平均削減効果
+    avg_reduction = sum(all_scores) / len(all_scores) if all_scores else 0
+    
+    # 4. 効果的作業割合（削減効果 > 0の作業数）
+    effective_tasks = sum(1 for avg in overall_avg.values() if avg > 0)
+    total_tasks = len(overall_avg)
+    effective_ratio = (effective_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    
+    return {
+        'best_task': best_task,
+        'best_score': best_score,
+        'improved_task': improved_task,
+        'improvement': max_improvement,
+        'avg_reduction': avg_reduction,
+        'effective_ratio': effective_ratio,
+        'effective_count': effective_tasks,
+        'total_count': total_tasks
+    }
+
+
+def calculate_tool_metrics(frequency_cube, contribution_cube, process_type, baseline=None, comparison=None):
+    """工程別のAIツール指標を計算"""
+    # 比較期間の指定がない場合は最初と最後の月を比較
+    baseline = baseline or (frequency_cube.months[0] if frequency_cube.months else None)
+    comparison = comparison or (frequency_cube.months[-1] if frequency_cube.months else None)
+    
+    if process_type == 'upstream':
+        target_team = 'ディレクターチーム'
+        tools = UPSTREAM_TOOLS
+    else:
+        target_team = 'エンジニアリングチーム'
+        tools = DEVELOPMENT_TOOLS
+    
+    # 利用頻度・貢献度の月別スコアを回答数テンソルから取得
+    freq_tool_scores = {}
+    contrib_tool_scores = {}
+    for tool in tools:
+        freq_scores = frequency_cube.monthly_means(tool, target_team)
+        if freq_scores:
+            freq_tool_scores[tool] = freq_scores
+        
+        contrib_scores = contribution_cube.monthly_means(tool, target_team)
+        if contrib_scores:
+            contrib_tool_scores[tool] = contrib_scores
+    
+    # 1. 最高利用ツール（利用頻度平均が最高）
+    freq_overall_avg = {}
+    for tool, scores in freq_tool_scores.items():
+        if scores:
+            valid_scores = [v for v in scores.values() if pd.notna(v)]
+            if valid_scores:
+                freq_overall_avg[tool] = sum(valid_scores) / len(valid_scores)
+    
+    most_used_tool = max(freq_overall_avg, key=freq_overall_avg.get) if freq_overall_avg else None
+    most_used_score = freq_overall_avg.get(most_used_tool, 0) if most_used_tool else 0
+    
+    # 2. 最高貢献ツール（貢献度平均が最高）
+    contrib_overall_avg = {}
+    for tool, scores in contrib_tool_scores.items():
+        if scores:
+            valid_scores = [v for v in scores.values() if pd.notna(v)]
+            if valid_scores:
+                contrib_overall_avg[tool] = sum(valid_scores) / len(valid_scores)
+    
+    best_contrib_tool = max(contrib_overall_avg, key=contrib_overall_avg.get) if contrib_overall_avg else None
+    best_contrib_score = contrib_overall_avg.get(best_contrib_tool, 0) if best_contrib_tool else 0
+    
+    # 3. 総合評価最高（利用頻度×貢献度が最高）
+    combined_scores = {}
+    for tool in tools:
+        freq_avg = freq_overall_avg.get(tool, 0)
+        contrib_avg = contrib_overall_avg.get(tool, 0)
+        if freq_avg > 0 and contrib_avg > 0:
+            combined_scores[tool] = freq_avg * contrib_avg
+    
+    best_combined_tool = max(combined_scores, key=combined_scores.get) if combined_scores else None
+    best_combined_score = combined_scores.get(best_combined_tool, 0) if best_combined_tool else 0
+    
+    # 4. 最高改善ツール（比較元→比較先で利用頻度が最も向上）
+    improvements = {}
+    for tool, scores in freq_tool_scores.items():
+        if baseline in scores and comparison in scores:
+            baseline_score = scores[baseline]
+            comparison_score = scores[comparison]
+            if pd.notna(baseline_score) and pd.notna(comparison_score) and baseline_score > 0:
+                improvement = comparison_score - baseline_score
+                improvements[tool] = improvement
+    
+    improved_tool = max(improvements, key=improvements.get) if improvements else None
+    improvement_value = improvements.get(improved_tool, 0) if improved_tool else 0
+    
+    return {
+        'most_used_tool': most_used_tool,
+        'most_used_score': most_used_score,
+        'best_contrib_tool': best_contrib_tool,
+        'best_contrib_score': best_contrib_score,
+        'best_combined_tool': best_combined_tool,
+        'best_combined_score': best_combined_score,
+        'improved_tool': improved_tool,
+        'improvement_value': improvement_value
+    }
+
+
+def compute_period_metrics(likert_cubes, baseline=None, comparison=None):
+    """比較期間ごとのサマリー指標（ツール指標・時間削減効果指標）を工程別にまとめて計算"""
+    return {
+        'upstream_tool': calculate_tool_metrics(
+            likert_cubes['upstream_frequency'], likert_cubes['upstream_contribution'],
+            'upstream', baseline, comparison
+        ),
+        'development_tool': calculate_tool_metrics(
+            likert_cubes['development_frequency'], likert_cubes['development_contribution'],
+            'development', baseline, comparison
+        ),
+        'upstream_time': calculate_time_reduction_metrics(
+            likert_cubes['upstream_time_reduction'], 'upstream', baseline, comparison
+        ),
+        'development_time': calculate_time_reduction_metrics(
+            likert_cubes['development_time_reduction'], 'development', baseline, comparison
+        ),
+    }
@@ -0,0 +1,54 @@
+"""
+全セッションで共有する読み取り専用の集計モデル
+
+データのバージョンごとに1つだけ作成し、サマリー指標・比較表・グラフなどの派生結果を
+初回に計算した後は全セッションで共有する。共有された結果は変更せずに参照すること。
+"""
+
+import threading
+from types import MappingProxyType
+
+from survey_metrics import compute_period_metrics
+
+
+class SurveyModel:
+    """読み込み済みのデータと集計結果、およびそこから導出した結果のメモ"""
+
+    def __init__(self, df, processed_data, instrumentation=None, text_store=None):
+        self.df = df
+        # 参照時に計算される processed_data（LazyProcessedData）も展開せずにそのまま包む
+        self.processed_data = MappingProxyType(processed_data)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._memo = {}
+        # 読み込み・集計の処理ステージごとの計測結果（StageRecorder）
+        self.instrumentation = instrumentation
+        # 自由記述の回答（FreeTextStore）。df には自由記述の列を含まない
+        self.text_store = text_store
+
+    def memoize(self, key, compute):
+        """key に対応する派生結果を取得（初回のみ compute を呼び出す）
+
+        同じ key を同時に要求したセッションは、最初の計算が終わるのを待って同じ結果を受け取る。
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+    def period_metrics(self, baseline, comparison):
+        """比較期間のサマリー指標を取得（スナップショットで事前計算済みの場合はそれを利用）"""
+        precomputed = self.processed_data.get('period_metrics', {})
+        if (baseline, comparison) in precomputed:
+            return precomputed[(baseline, comparison)]
+        return self.memoize(
+            ('period_metrics', baseline, comparison),
+            lambda: compute_period_metrics(self.processed_data['likert_cubes'], baseline, comparison)
+        )
@@ -0,0 +1,120 @@
+"""
+アンケートの列スキーマ
+
+config.py の設問定義とTSVのヘッダーを照合し、(設問, 項目) を列の位置に一度だけ解決する。
+ヘッダーの表記ゆれ（全角半角・大文字小文字・空白の有無）は正規化して吸収する。
+"""
+
+import difflib
+import re
+import unicodedata
+
+from config import *
+
+# 正規化後の項目名がこの類似度以上であれば同じ項目とみなす
+FUZZY_MATCH_CUTOFF = 0.85
+
+HEADER_PATTERN = re.compile(r'^(?P<question>.*?)\s*\[(?P<item>[^\[\]]*)\]\s*$')
+
+
+def normalize_label(text):
+    """列名照合用に表記ゆれを正規化（全角半角・大文字小文字・空白の違いを無視）"""
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    return re.sub(r'\s+', '', text)
+
+
+def split_header(header):
+    """「設問 [項目]」形式の列名を (設問, 項目) に分割（項目がない場合は None）"""
+    match = HEADER_PATTERN.match(str(header))
+    if match:
+        return match.group('question'), match.group('item')
+    return str(header), None
+
+
+class SurveySchema:
+    """(設問, 項目) から列の位置を引く照合済みのスキーマ"""
+
+    def __init__(self, columns, positions, missing, question_items=QUESTION_ITEMS):
+        self.columns = list(columns)
+        self.positions = positions    # {(設問キー, 項目): 列の位置}
+        self.missing = missing        # ヘッダーに見つからなかった (設問キー, 項目)
+        self.question_items = question_items
+
+    @classmethod
+    def from_columns(cls, columns, questions=QUESTIONS, question_items=QUESTION_ITEMS):
+        """ヘッダーを設問定義と照合してスキーマを構築"""
+        columns = list(columns)
+
+        # 正規化した (設問, 項目) → 列の位置
+        header_index = {}
+        for position, header in enumerate(columns):
+            question, item = split_header(header)
+            key = (normalize_label(question), normalize_label(item) if item is not None else None)
+            header_index.setdefault(key, position)
+
+        positions = {}
+        missing = []
+        for section, question in questions.items():
+            normalized_question = normalize_label(question)
+
+            if section not in question_items:
+                position = header_index.get((normalized_question, None))
+                if position is None:
+                    missing.append((section, None))
+                else:
+                    positions[(section, None)] = position
+                continue
+
+            # 同じ設問の項目候補（完全一致しない場合のあいまい照合用）
+            candidates = {
+                item: position for (q, item), position in header_index.items()
+                if q == normalized_question and item is not None
+            }
+            # 完全一致する項目を先に割り当て、残りの列だけをあいまい照合の対象にする
+            unmatched = []
+            for item in question_items[section]:
+                position = candidates.pop(normalize_label(item), None)
+                if position is None:
+                    unmatched.append(item)
+                else:
+                    positions[(section, item)] = position
+
+            for item in unmatched:
+                close = difflib.get_close_matches(normalize_label(item), candidates, n=1, cutoff=FUZZY_MATCH_CUTOFF)
+                if close:
+                    positions[(section, item)] = candidates.pop(close[0])
+                else:
+                    missing.append((section, item))
+
+        return cls(columns, positions, missing, question_items)
+
+    def column_index(self, section, item=None):
+        """列の位置を取得（見つからない場合はNone）"""
+        return self.positions.get((section, item))
+
+    def column_name(self, section, item=None):
+        """実際の列名を取得（見つからない場合はNone）"""
+        position = self.column_index(section, item)
+        return self.columns[position] if position is not None else None
+
+    def item_positions(self, section):
+        """設問の {項目: 列の位置} を config.py の項目順で取得（見つかった項目のみ）"""
+        return {
+            item: self.positions[(section, item)]
+            for item in self.question_items.get(section, [])
+            if (section, item) in self.positions
+        }
+
+
+def align_columns(columns, reference):
+    """列名を基準スキーマの列名に揃える（同じ設問・項目の列は基準と同じ名前にする）
+
+    基準に対応する列がない列は元の名前のまま残す。
+    """
+    schema = SurveySchema.from_columns(columns)
+    aligned = list(schema.columns)
+    for key, position in schema.positions.items():
+        reference_position = reference.positions.get(key)
+        if reference_position is not None:
+            aligned[position] = reference.columns[reference_position]
+    return aligned
@@ -0,0 +1,390 @@
+"""
+回答のタイムスタンプの解析
+
+形式を推定する pd.to_datetime は大量の行で遅く、月/日と日/月の回答が混在すると
+黙って誤った日付に解釈する。ここでは候補の形式を明示し、形式ごとに正規表現で年・月・日・
+時・分・秒を一括で取り出して（pyarrow があれば Arrow の正規表現で）、numpy の配列演算で
+日時を組み立てる。存在しない日付（2月30日など）は解析できない行として扱う。
+
+年月（アンケートの実施月）・回答日・回答週は解析したタイムスタンプから同じ処理で求める。
+解析できなかった行・月と日の解釈が定まらない行・元データの年月と異なる行は TimestampReport に記録する。
+
+月/日と日/月のどちらで解釈するかは元データ全体で1回だけ決める。チャンク・ファイルごとに数えた根拠
+（day_month_evidence）は足し合わせられるため、分割して解析する場合は全体の根拠を parse_timestamps に渡す。
+"""
+
+import os
+import re
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import *
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    # pyarrow がない環境では pandas の正規表現で取り出す（低速）
+    pa = pc = None
+
+# タイムスタンプの形式の候補（先に一致した形式を優先する）
+TIMESTAMP_FORMATS = [
+    '%m/%d/%Y %H:%M:%S',    # Googleフォーム（英語）
+    '%Y/%m/%d %H:%M:%S',    # Googleフォーム（日本語）
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',    # 日を先に書く地域
+]
+
+# 月と日を入れ替えると同じ文字列に一致する形式の組（先の形式, 後の形式）
+DAY_MONTH_SWAPS = [('%m/%d/%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S')]
+
+# タイムスタンプから求める列（年月は元データの列より優先する）
+DERIVED_TIME_COLUMNS = ['年月', '回答日', '回答週']
+
+# 報告に記録する行数の上限（問題の種類ごと。件数は全件を数える）
+REPORT_MAX_ROWS = 1000
+
+TIMESTAMP_PROBLEMS = {
+    'failed': "解析できない",
+    'missing': "空欄",
+    'ambiguous': "月と日の解釈が定まらない",
+    'period_mismatch': "元データの年月と異なる",
+}
+
+REPORT_COLUMNS = ['source', 'row', 'problem', 'value', 'parsed', 'note']
+
+_DIRECTIVES = {
+    '%Y': r'(?P<year>\d{4})',
+    '%m': r'(?P<month>\d{1,2})',
+    '%d': r'(?P<day>\d{1,2})',
+    '%H': r'(?P<hour>\d{1,2})',
+    '%M': r'(?P<minute>\d{1,2})',
+    '%S': r'(?P<second>\d{1,2})',
+}
+_FIELDS = ['year', 'month', 'day', 'hour', 'minute', 'second']
+
+
+def format_pattern(fmt):
+    """strptime 形式の文字列を、各フィールドを名前付きグループで取り出す正規表現に変換（前後の空白は無視）"""
+    parts = re.split(r'(%[A-Za-z])', fmt)
+    unknown = [part for part in parts if part.startswith('%') and part not in _DIRECTIVES]
+    if unknown:
+        raise ValueError(f"対応していない書式指定です: {', '.join(unknown)}")
+    body = ''.join(_DIRECTIVES.get(part) or re.escape(part).replace('\\ ', ' ') for part in parts)
+    return rf'^\s*{body}\s*$'
+
+
+def _extract_fields(values, pattern):
+    """正規表現に一致した各行のフィールドを {フィールド名: int64 配列} で返す（一致しない行は -1）"""
+    names = [name for name in _FIELDS if f'(?P<{name}>' in pattern]
+    if pc is not None:
+        matched = pc.extract_regex(pa.array(values, type=pa.string()), pattern)
+        return {
+            name: pc.cast(pc.struct_field(matched, name), pa.int64()).fill_null(-1).to_numpy(zero_copy_only=False)
+            for name in names
+        }
+    matched = pd.Series(values, dtype=object).str.extract(pattern)
+    return {name: pd.to_numeric(matched[name]).fillna(-1).to_numpy(np.int64) for name in names}
+
+
+def _compose(year, month, day, clock):
+    """年・月・日と0時からの秒数から datetime64[ns] を組み立てる（存在しない日付の行は NaT）
+
+    (日時, 有効な行の bool 配列) を返す。
+    """
+    valid = (
+        (month >= 1) & (month <= 12) & (day >= 1) & (clock >= 0)
+        & (year > pd.Timestamp.min.year) & (year < pd.Timestamp.max.year)
+    )
+    month_start = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    first_day = month_start.astype('datetime64[D]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - first_day).astype(np.int64)
+    valid &= day <= days_in_month
+
+    seconds = (first_day + (day - 1)).astype('datetime64[s]') + clock
+    return np.where(valid, seconds.astype('datetime64[ns]'), np.datetime64('NaT', 'ns')), valid
+
+
+def _clock(fields):
+    """時・分・秒のフィールドから0時からの秒数（範囲外の行は -1）"""
+    n = len(fields['year'])
+    hour, minute, second = (fields.get(name, np.zeros(n, dtype=np.int64)) for name in ('hour', 'minute', 'second'))
+    valid = (hour >= 0) & (hour < 24) & (minute >= 0) & (minute < 60) & (second >= 0) & (second < 60)
+    return np.where(valid, hour * 3600 + minute * 60 + second, -1)
+
+
+def _match_formats(values, formats):
+    """各行を、それより前の形式で解析できなかった行だけに次の形式を適用して解析
+
+    (日時, 各行の形式の番号（解析できない・空欄の行は -1）, 各行の年・月・日・0時からの秒数) を返す。
+    """
+    n = len(values)
+    missing = values.isna().to_numpy()
+    text = values.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(text, skipna=True) not in ('string', 'empty'):
+        text = np.where(missing, None, values.astype(str).to_numpy(dtype=object))
+
+    result = np.full(n, np.datetime64('NaT', 'ns'))
+    format_codes = np.full(n, -1, dtype=np.int64)
+    fields = {name: np.full(n, -1, dtype=np.int64) for name in ('year', 'month', 'day', 'clock')}
+    remaining = np.flatnonzero(~missing)
+    for code, fmt in enumerate(formats):
+        if remaining.size == 0:
+            break
+        extracted = _extract_fields(text[remaining], format_pattern(fmt))
+        clock = _clock(extracted)
+        parsed, valid = _compose(extracted['year'], extracted['month'], extracted['day'], clock)
+        rows = remaining[valid]
+        result[rows] = parsed[valid]
+        format_codes[rows] = code
+        for name, field in (('year', extracted['year']), ('month', extracted['month']),
+                            ('day', extracted['day']), ('clock', clock)):
+            fields[name][rows] = field[valid]
+        remaining = remaining[~valid]
+    return result, format_codes, fields
+
+
+def _count_day_month(format_codes, fields, formats):
+    """DAY_MONTH_SWAPS の組ごとに [先の形式でしか解釈できない行数, 後の形式でしか解釈できない行数] を数える"""
+    evidence = []
+    for first, second in DAY_MONTH_SWAPS:
+        if first not in formats or second not in formats:
+            evidence.append([0, 0])
+            continue
+        first_rows = format_codes == formats.index(first)
+        evidence.append([
+            int(np.count_nonzero(first_rows & (fields['day'] > 12))),
+            int(np.count_nonzero(format_codes == formats.index(second))),
+        ])
+    return evidence
+
+
+def day_month_evidence(values, formats=TIMESTAMP_FORMATS):
+    """月と日の解釈を決める根拠（DAY_MONTH_SWAPS の組ごとの、どちらか一方の形式でしか解釈できない行数）
+
+    チャンク・ファイルごとの値は add_day_month_evidence で足し合わせられる。
+    """
+    _, format_codes, fields = _match_formats(pd.Series(values, copy=False), formats)
+    return _count_day_month(format_codes, fields, formats)
+
+
+def add_day_month_evidence(evidence, other):
+    """2つの根拠を足し合わせる"""
+    return [[a + b for a, b in zip(counts, other_counts)] for counts, other_counts in zip(evidence, other)]
+
+
+def day_month_decision(evidence):
+    """根拠から決まる、DAY_MONTH_SWAPS の組ごとの解釈
+
+    後の形式でしか解釈できない行がなければ None（月と日を入れ替えられる行も先の形式で解釈する）、
+    あれば後の形式で解釈するかどうか。同じ解釈になる根拠からは同じ解析結果が得られる。
+    """
+    return tuple(None if second_count == 0 else second_count > first_count for first_count, second_count in evidence)
+
+
+def parse_timestamps(values, formats=TIMESTAMP_FORMATS, expected_periods=None, evidence=None):
+    """タイムスタンプの文字列を候補の形式で順に解析
+
+    各形式は、それより前の形式で解析できなかった行だけに適用する。月と日を入れ替えられる形式の組
+    （DAY_MONTH_SWAPS）で後の形式に一致した行（日が13以上で、先の形式では解析できない行）がある場合、
+    先の形式で解析した行のうち月と日を入れ替えても有効な行は解釈が定まらない。expected_periods
+    （元データの年月）があれば、年月が一致する方の解釈を選ぶ。それでも定まらない行は、日が13以上の
+    行が多い方の形式で解釈し、解釈が定まらない行とする。
+
+    evidence は元データ全体の day_month_evidence。省略した場合は values の行だけで判断するため、
+    元データを分割して解析する場合は全体の値を渡す。
+
+    (datetime64[ns] の Series, 各行の形式の番号（解析できない・空欄の行は -1）,
+    解釈が定まらない行の bool 配列, 解釈が定まらない行のもう一方の解釈の日時, values の行の根拠) を返す。
+    """
+    values = pd.Series(values, copy=False)
+    n = len(values)
+    result, format_codes, fields = _match_formats(values, formats)
+    own_evidence = _count_day_month(format_codes, fields, formats)
+    decisions = day_month_decision(own_evidence if evidence is None else evidence)
+
+    ambiguous = np.zeros(n, dtype=bool)
+    alternative = np.full(n, np.datetime64('NaT', 'ns'))
+    for (first, second), decision in zip(DAY_MONTH_SWAPS, decisions):
+        if first not in formats or second not in formats or decision is None:
+            continue
+        second_code = formats.index(second)
+        rows = np.flatnonzero(
+            (format_codes == formats.index(first)) & (fields['day'] <= 12) & (fields['day'] != fields['month'])
+        )
+        if rows.size == 0:
+            continue
+
+        current = result[rows]
+        swapped, _ = _compose(fields['year'][rows], fields['day'][rows], fields['month'][rows], fields['clock'][rows])
+        use_swapped = np.full(rows.size, decision)
+        undecided = np.ones(rows.size, dtype=bool)
+        if expected_periods is not None:
+            expected = np.asarray(expected_periods, dtype=object)[rows]
+            current_matches = survey_periods(current) == expected
+            swapped_matches = survey_periods(swapped) == expected
+            undecided = current_matches == swapped_matches
+            use_swapped[~undecided] = swapped_matches[~undecided]
+
+        result[rows[use_swapped]] = swapped[use_swapped]
+        format_codes[rows[use_swapped]] = second_code
+        ambiguous[rows[undecided]] = True
+        alternative[rows[undecided]] = np.where(use_swapped, current, swapped)[undecided]
+
+    return pd.Series(result, index=values.index), format_codes, ambiguous, alternative, own_evidence
+
+
+def survey_periods(timestamps, cutoff_day=SURVEY_PERIOD_CUTOFF_DAY):
+    """タイムスタンプが属するアンケートの年月ラベル（「2025年5月」形式。解析できない行は None）
+
+    cutoff_day より前の日の回答は前月分とする。
+    """
+    values = np.asarray(timestamps, dtype='datetime64[ns]')
+    valid = ~np.isnat(values)
+    months = values.astype('datetime64[M]')
+    day = (values.astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64) + 1
+    month_codes = (months - (day < cutoff_day)).astype(np.int64)
+
+    # ラベルは年月ごとに1回だけ作る
+    uniques, inverse = np.unique(month_codes[valid], return_inverse=True)
+    labels = np.array([f"{code // 12 + 1970}年{code % 12 + 1}月" for code in uniques], dtype=object)
+    periods = np.full(len(values), None, dtype=object)
+    periods[valid] = labels[inverse]
+    return periods
+
+
+def week_starts(timestamps):
+    """タイムスタンプの週の初め（月曜日）の日付（解析できない行は NaT）"""
+    days = np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[D]')
+    # 1970-01-01 は木曜日
+    weekday = (days.astype(np.int64) + 3) % 7
+    return np.where(np.isnat(days), days, days - weekday).astype('datetime64[ns]')
+
+
+def parse_survey_timestamps(df, source=None, formats=TIMESTAMP_FORMATS, evidence=None):
+    """タイムスタンプの列を解析し、年月・回答日・回答週の列をタイムスタンプから求める（df を直接変更する）
+
+    月と日の解釈が定まらない行は元データの年月と一致する方の解釈を選び、
+    タイムスタンプを解析できない行の年月は元データの列の値を使う。
+    source は報告に記録する元データの名前、evidence は元データ全体の月と日の解釈の根拠
+    （parse_timestamps を参照）。TimestampReport を返す。
+    """
+    raw = df['タイムスタンプ']
+    original = df['年月'].to_numpy(dtype=object) if '年月' in df.columns else None
+    timestamps, format_codes, ambiguous, alternative, own_evidence = parse_timestamps(raw, formats, original, evidence)
+    parsed = timestamps.to_numpy()
+    missing = raw.isna().to_numpy()
+    failed = np.isnat(parsed) & ~missing
+
+    periods = survey_periods(parsed)
+    mismatch = np.zeros(len(df), dtype=bool)
+    if original is not None:
+        unparsed = np.isnat(parsed)
+        periods[unparsed] = original[unparsed]
+        mismatch = ~unparsed & df['年月'].notna().to_numpy() & (original != periods)
+
+    df['タイムスタンプ'] = timestamps
+    df['年月'] = periods
+    df['回答日'] = parsed.astype('datetime64[D]').astype('datetime64[ns]')
+    df['回答週'] = week_starts(parsed)
+
+    format_counts = np.bincount(format_codes + 1, minlength=len(formats) + 1)[1:]
+    report = TimestampReport(
+        n_rows=len(df),
+        format_counts={fmt: int(count) for fmt, count in zip(formats, format_counts) if count},
+        day_month_evidence=own_evidence,
+    )
+    raw_values = raw.to_numpy(dtype=object)
+    for problem, mask in (('failed', failed), ('missing', missing), ('ambiguous', ambiguous),
+                          ('period_mismatch', mismatch)):
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            continue
+        report.problem_counts[problem] = int(rows.size)
+        rows = rows[:REPORT_MAX_ROWS]
+        if problem == 'ambiguous':
+            notes = [f"{value} とも解釈できる" for value in pd.DatetimeIndex(alternative[rows]).astype(str)]
+        elif problem == 'period_mismatch':
+            notes = [f"元データの年月: {original[row]} → {periods[row]}" for row in rows]
+        elif problem == 'failed' and original is not None:
+            notes = [f"元データの年月を使用: {original[row]}" if pd.notna(original[row]) else None for row in rows]
+        else:
+            notes = [None] * len(rows)
+        report.rows.append(pd.DataFrame({
+            'source': source,
+            'row': df.index[rows],
+            'problem': problem,
+            'value': raw_values[rows],
+            'parsed': parsed[rows],
+            'note': notes,
+        }, columns=REPORT_COLUMNS))
+    return report
+
+
+class TimestampReport:
+    """タイムスタンプの解析結果の報告（行数・形式ごとの件数・問題のあった行）
+
+    問題のあった行は、問題の種類ごとに REPORT_MAX_ROWS 件まで記録する（件数は全件を数える）。
+    行はファイルのデータ行（ヘッダーを除く）の位置で、0から数える。
+    """
+
+    def __init__(self, n_rows=0, format_counts=None, problem_counts=None, rows=None, day_month_evidence=None):
+        self.n_rows = n_rows
+        self.format_counts = dict(format_counts or {})     # {形式: 解析した行数}
+        self.problem_counts = dict(problem_counts or {})   # {問題の種類: 行数}
+        self.rows = list(rows or [])                        # 問題のあった行のDataFrameのリスト
+        # 解析した行の月と日の解釈の根拠（合算すると元データ全体の根拠になる）
+        self.day_month_evidence = day_month_evidence or [[0, 0] for _ in DAY_MONTH_SWAPS]
+
+    @property
+    def has_problems(self):
+        return any(self.problem_counts.values())
+
+    def merge(self, other):
+        """別の報告と合算した報告"""
+        format_counts = dict(self.format_counts)
+        for fmt, count in other.format_counts.items():
+            format_counts[fmt] = format_counts.get(fmt, 0) + count
+        problem_counts = dict(self.problem_counts)
+        for problem, count in other.problem_counts.items():
+            problem_counts[problem] = problem_counts.get(problem, 0) + count
+
+        rows = []
+        for problem in TIMESTAMP_PROBLEMS:
+            kept = 0
+            for frame in self.rows + other.rows:
+                frame = frame[frame['problem'] == problem].head(REPORT_MAX_ROWS - kept)
+                if len(frame):
+                    rows.append(frame)
+                    kept += len(frame)
+        evidence = add_day_month_evidence(self.day_month_evidence, other.day_month_evidence)
+        return TimestampReport(self.n_rows + other.n_rows, format_counts, problem_counts, rows, evidence)
+
+    def to_frame(self):
+        """問題のあった行を1行1件のDataFrameで返す"""
+        if not self.rows:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+        return pd.concat(self.rows, ignore_index=True)
+
+    def summary(self):
+        """解析結果の要約（表示用）"""
+        formats = ', '.join(f"{fmt}: {count:,}行" for fmt, count in self.format_counts.items())
+        lines = [f"タイムスタンプの解析: {self.n_rows:,}行（{formats or '解析できた行なし'}）"]
+        for problem, label in TIMESTAMP_PROBLEMS.items():
+            count = self.problem_counts.get(problem, 0)
+            if count:
+                lines.append(f"  {label}: {count:,}行")
+        return '\n'.join(lines)
+
+    def save(self, path):
+        """問題のあった行をTSVに保存（一時ファイルに書き出してから置き換える）"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+        try:
+            self.to_frame().to_csv(tmp_path, sep='\t', index=False, encoding='utf-8')
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
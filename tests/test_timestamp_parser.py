@@ -0,0 +1,126 @@
+"""
+タイムスタンプの月/日と日/月の解釈を、分割して解析しても元データ全体で1回だけ決めることのテスト
+
+使い方:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from config import *
+from data_processor import AIUsageSurveyProcessor
+from timestamp_parser import add_day_month_evidence, day_month_decision, day_month_evidence, parse_timestamps
+
+# 日/月で書かれたタイムスタンプ。日が13以上で日/月でしか解釈できない行は末尾の2行だけ
+DAY_FIRST_TIMESTAMPS = [
+    '2/6/2025 9:22:04',
+    '3/6/2025 9:27:45',
+    '10/6/2025 10:05:51',
+    '1/7/2025 10:25:39',
+    '4/7/2025 12:26:07',
+    '7/7/2025 15:34:51',
+    '4/8/2025 10:23:24',
+    '5/8/2025 9:47:38',
+    '30/5/2025 12:29:07',
+    '31/5/2025 8:00:00',
+]
+
+
+def _split(values, size):
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+def test_evidence_adds_up_across_chunks():
+    whole = day_month_evidence(DAY_FIRST_TIMESTAMPS)
+    evidence = [[0, 0]]
+    for chunk in _split(DAY_FIRST_TIMESTAMPS, 3):
+        evidence = add_day_month_evidence(evidence, day_month_evidence(chunk))
+    assert evidence == whole == [[0, 2]]
+
+
+def test_chunked_parse_matches_whole_parse():
+    whole, _, _, _, evidence = parse_timestamps(DAY_FIRST_TIMESTAMPS)
+    assert whole.iloc[0] == pd.Timestamp('2025-06-02 09:22:04')
+
+    # 先頭のチャンクには日/月でしか解釈できない行がないため、チャンク単独では月/日と解釈してしまう
+    first_chunk = _split(DAY_FIRST_TIMESTAMPS, 4)[0]
+    alone, _, _, _, _ = parse_timestamps(first_chunk)
+    assert alone.iloc[0] == pd.Timestamp('2025-02-06 09:22:04')
+
+    for size in (1, 3, 4, 9):
+        parsed = [parse_timestamps(chunk, evidence=evidence)[0] for chunk in _split(DAY_FIRST_TIMESTAMPS, size)]
+        np.testing.assert_array_equal(pd.concat(parsed).to_numpy(), whole.to_numpy())
+
+
+def test_decision_without_second_format_rows():
+    # 後の形式でしか解釈できない行がなければ、月と日を入れ替えられる行も先の形式で解釈する
+    assert day_month_decision([[0, 0]]) == (None,)
+    assert day_month_decision([[3, 2]]) == (False,)
+    assert day_month_decision([[1, 2]]) == (True,)
+
+
+def _write_survey(path, timestamps, start=0):
+    """元データの start 行目からの回答に、指定したタイムスタンプを付けたTSVを書き出す
+
+    年月の列は空欄にして、月と日の解釈の手がかりにしない。
+    """
+    raw = pd.read_csv(DATA_PATH, sep='\t', dtype=str, keep_default_na=False)
+    raw = raw.iloc[(start + np.arange(len(timestamps))) % len(raw)].reset_index(drop=True)
+    raw['タイムスタンプ'] = timestamps
+    raw['年月'] = ''
+    raw.to_csv(path, sep='\t', index=False)
+
+
+def _processor(data_path, tmp_path, name):
+    return AIUsageSurveyProcessor(
+        str(data_path), use_cache=False, verbose=False,
+        store_path=str(tmp_path / f'{name}.sqlite'), text_store_path=str(tmp_path / f'{name}_text.sqlite'),
+    )
+
+
+def _assert_same_cubes(expected, actual):
+    assert expected.processed_data['periods'] == actual.processed_data['periods']
+    for section, cube in expected.processed_data['likert_cubes'].items():
+        other = actual.processed_data['likert_cubes'][section]
+        assert cube.months == other.months
+        np.testing.assert_array_equal(cube.counts, other.counts)
+    assert expected.timestamp_report.problem_counts == actual.timestamp_report.problem_counts
+    assert expected.timestamp_report.format_counts == actual.timestamp_report.format_counts
+
+
+def test_streaming_matches_load_data(tmp_path):
+    data_path = tmp_path / 'survey.tsv'
+    _write_survey(data_path, DAY_FIRST_TIMESTAMPS)
+
+    full = _processor(data_path, tmp_path, 'full')
+    full.load_data()
+    full.build_likert_cubes()
+    assert full.periods == ['2025年5月', '2025年6月', '2025年7月']
+
+    for chunk_rows in (1, 4):
+        streamed = _processor(data_path, tmp_path, f'stream_{chunk_rows}')
+        streamed.load_streaming(chunk_rows=chunk_rows)
+        _assert_same_cubes(full, streamed)
+
+
+def test_multiple_files_match_single_file(tmp_path):
+    single_path = tmp_path / 'single.tsv'
+    _write_survey(single_path, DAY_FIRST_TIMESTAMPS)
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    for i, timestamps in enumerate(_split(DAY_FIRST_TIMESTAMPS, 4)):
+        _write_survey(export_dir / f'survey_{i}.tsv', timestamps, start=i * 4)
+
+    single = _processor(single_path, tmp_path, 'single')
+    single.load_data()
+    single.build_likert_cubes()
+    multi = _processor(export_dir, tmp_path, 'multi')
+    multi.load_data()
+    multi.build_likert_cubes()
+    _assert_same_cubes(single, multi)